@@ -0,0 +1,245 @@
+"""Concurrent three-stage batch runner.
+
+Items flow through a process pool (CPU-bound decode/encode), a bounded pool
+of threads (blocking LLM calls) and a single writer running on the calling
+thread. Stages are joined by bounded queues, so a slow LLM stage stops the
+decoders from running arbitrarily far ahead.
+"""
+
+from __future__ import annotations
+
+import os
+import queue
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from dataclasses import dataclass, field
+from typing import Any, Callable, Generic, Optional, Sequence, TypeVar
+
+TPayload = TypeVar("TPayload")
+TResult = TypeVar("TResult")
+
+_DONE = object()
+
+
+@dataclass(frozen=True, slots=True)
+class BatchSettings:
+    """Concurrency limits for the batch runner.
+
+    ``from_env`` defaults to one decode worker and one request in flight,
+    i.e. sequential processing; raise ``PROCESS_DECODE_WORKERS`` and
+    ``PROCESS_MAX_IN_FLIGHT`` to opt into concurrency.
+    """
+
+    decode_workers: int = 1
+    max_in_flight: int = 1
+    queue_size: int = 8
+
+    @classmethod
+    def from_env(cls) -> "BatchSettings":
+        """Build settings from environment variables."""
+        defaults = cls()
+        return cls(
+            decode_workers=int(
+                os.getenv("PROCESS_DECODE_WORKERS", defaults.decode_workers)
+            ),
+            max_in_flight=int(
+                os.getenv("PROCESS_MAX_IN_FLIGHT", defaults.max_in_flight)
+            ),
+            queue_size=int(os.getenv("PROCESS_QUEUE_SIZE", defaults.queue_size)),
+        )
+
+    @property
+    def is_sequential(self) -> bool:
+        return self.decode_workers <= 1 and self.max_in_flight <= 1
+
+
+@dataclass(slots=True)
+class StageTimings:
+    """Thread-safe accumulator of busy seconds per pipeline stage."""
+
+    totals: dict[str, float] = field(default_factory=dict)
+    counts: dict[str, int] = field(default_factory=dict)
+    _lock: threading.Lock = field(default_factory=threading.Lock)
+
+    def add(self, stage: str, seconds: float) -> None:
+        with self._lock:
+            self.totals[stage] = self.totals.get(stage, 0.0) + seconds
+            self.counts[stage] = self.counts.get(stage, 0) + 1
+
+    def summary_lines(self) -> list[str]:
+        """Human-readable total and average time for every stage."""
+        lines = []
+        for stage, total in self.totals.items():
+            average = total / self.counts[stage]
+            lines.append(f"{stage}: {total:.1f}s total, {average:.2f}s avg")
+        return lines
+
+
+@dataclass(slots=True)
+class BatchReport:
+    """Outcome of a batch run."""
+
+    successful: int = 0
+    failed: int = 0
+    errors: dict[str, Exception] = field(default_factory=dict)
+    wall_seconds: float = 0.0
+    timings: StageTimings = field(default_factory=StageTimings)
+
+
+def _timed_call(fn: Callable[[str], Any], item: str) -> tuple[Any, float]:
+    """Run ``fn(item)`` in a worker process and return its duration."""
+    started = time.perf_counter()
+    result = fn(item)
+    return result, time.perf_counter() - started
+
+
+@dataclass(slots=True)
+class BatchRunner(Generic[TPayload, TResult]):
+    """Run ``decode`` -> ``analyze`` -> ``write`` over many items concurrently.
+
+    ``decode`` runs in worker processes and must be a picklable, module-level
+    callable. ``analyze`` runs on ``max_in_flight`` threads, ``write`` on the
+    thread that called ``run``. ``on_decoded`` (if set) is called from the
+    feeder thread with the decode error, or None, as each decode finishes.
+    """
+
+    decode: Callable[[str], TPayload]
+    analyze: Callable[[str, TPayload], TResult]
+    write: Callable[[str, TResult], None]
+    settings: BatchSettings = field(default_factory=BatchSettings)
+    on_decoded: Optional[Callable[[str, Optional[Exception]], None]] = None
+
+    def run(self, items: Sequence[str]) -> BatchReport:
+        report = BatchReport()
+        decoded: queue.Queue = queue.Queue(maxsize=self.settings.queue_size)
+        analyzed: queue.Queue = queue.Queue(maxsize=self.settings.queue_size)
+        analyzers = max(1, self.settings.max_in_flight)
+        started = time.perf_counter()
+
+        feeder = threading.Thread(
+            target=self._feed, args=(items, decoded, analyzers, report), daemon=True
+        )
+        feeder.start()
+        workers = [
+            threading.Thread(
+                target=self._analyze_loop, args=(decoded, analyzed, report), daemon=True
+            )
+            for _ in range(analyzers)
+        ]
+        for worker in workers:
+            worker.start()
+
+        finished = 0
+        while finished < analyzers:
+            entry = analyzed.get()
+            if entry is _DONE:
+                finished += 1
+                continue
+            self._write_entry(entry, report)
+
+        feeder.join()
+        for worker in workers:
+            worker.join()
+        report.wall_seconds = time.perf_counter() - started
+        return report
+
+    def _feed(
+        self,
+        items: Sequence[str],
+        decoded: queue.Queue,
+        analyzers: int,
+        report: BatchReport,
+    ) -> None:
+        """Submit decode jobs, keeping at most ``decode_workers`` x 2 pending.
+
+        If the pool breaks (a worker process died), every item not decoded yet
+        fails with that error. The analyzers are always told to stop.
+        """
+        window = max(1, self.settings.decode_workers) * 2
+        pending: dict[Future, str] = {}
+        remaining = iter(items)
+        submitting: Optional[str] = None
+
+        try:
+            with ProcessPoolExecutor(max_workers=self.settings.decode_workers) as pool:
+                while True:
+                    while len(pending) < window:
+                        submitting = next(remaining, None)
+                        if submitting is None:
+                            break
+                        future = pool.submit(_timed_call, self.decode, submitting)
+                        pending[future] = submitting
+                        submitting = None
+
+                    if not pending:
+                        break
+                    done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        item = pending.pop(future)
+                        try:
+                            payload, seconds = future.result()
+                        except Exception as exc:
+                            self._decode_failed(item, exc, decoded)
+                            continue
+                        if self.on_decoded is not None:
+                            self.on_decoded(item, None)
+                        report.timings.add("decode", seconds)
+                        # Blocks while the LLM stage is saturated (backpressure)
+                        decoded.put((item, payload, None))
+        except Exception as exc:
+            # Typically BrokenProcessPool: a worker was killed (OOM, segfault)
+            print(f"Decode pool failed: {exc!r}")
+            unsubmitted = [submitting] if submitting is not None else []
+            for item in [*pending.values(), *unsubmitted, *remaining]:
+                self._decode_failed(item, exc, decoded)
+        finally:
+            for _ in range(analyzers):
+                decoded.put(_DONE)
+
+    def _decode_failed(
+        self, item: str, error: Exception, decoded: queue.Queue
+    ) -> None:
+        if self.on_decoded is not None:
+            self.on_decoded(item, error)
+        decoded.put((item, None, error))
+
+    def _analyze_loop(
+        self, decoded: queue.Queue, analyzed: queue.Queue, report: BatchReport
+    ) -> None:
+        while True:
+            entry = decoded.get()
+            if entry is _DONE:
+                analyzed.put(_DONE)
+                return
+
+            item, payload, error = entry
+            result: Optional[TResult] = None
+            if error is None:
+                started = time.perf_counter()
+                try:
+                    result = self.analyze(item, payload)
+                except Exception as exc:
+                    error = exc
+                report.timings.add("llm", time.perf_counter() - started)
+            analyzed.put((item, result, error))
+
+    def _write_entry(
+        self, entry: tuple[str, Optional[TResult], Optional[Exception]], report: BatchReport
+    ) -> None:
+        item, result, error = entry
+        if error is None:
+            started = time.perf_counter()
+            try:
+                self.write(item, result)  # type: ignore[arg-type]
+            except Exception as exc:
+                error = exc
+            report.timings.add("write", time.perf_counter() - started)
+
+        if error is None:
+            report.successful += 1
+            print(f"✓ {item}")
+        else:
+            report.failed += 1
+            report.errors[item] = error
+            print(f"✗ {item}: {error}")
@@ -0,0 +1,92 @@
+"""Benchmark per-frame vs mosaic image packing for video analysis.
+
+Sends the same frames to the video LLM once as separate images and once as a
+single mosaic, then prints prompt/completion tokens and latency per video.
+
+Usage:
+    python -m scripts.benchmark_mosaic [video.mp4 ...]
+"""
+
+from __future__ import annotations
+
+import sys
+
+from dotenv import load_dotenv
+
+from scripts.process_videos import (
+    NUM_FRAMES,
+    VIDEOS_DIR,
+    VideoAnalysisResult,
+    analysis_prompt,
+    analysis_token_budget,
+    extract_frames_from_video,
+    get_video_files,
+)
+from src.llm import LLMUsage, VideoLLMClient
+
+
+def run_mode(
+    client: VideoLLMClient, video_filename: str, mosaic: bool
+) -> tuple[int, LLMUsage]:
+    """Analyze one video in the given mode and return image count and usage."""
+    frame_data_uris = extract_frames_from_video(
+        VIDEOS_DIR / video_filename,
+        num_frames=NUM_FRAMES,
+        save_frames=False,
+        mosaic=mosaic,
+    )
+    _, usage = client.invoke_with_media_and_usage(
+        text=analysis_prompt(mosaic=mosaic),
+        image_blobs=frame_data_uris,
+        output_model=VideoAnalysisResult,
+        # Same output limit as the real analysis, so costs are comparable
+        max_tokens=analysis_token_budget(frame_data_uris, mosaic),
+    )
+    return len(frame_data_uris), usage
+
+
+def main() -> None:
+    load_dotenv()
+    client = VideoLLMClient.from_env()
+
+    video_files = sys.argv[1:] or get_video_files()
+    if not video_files:
+        print("No video files found in the videos directory.")
+        return
+
+    rows = []
+    totals = {False: LLMUsage(), True: LLMUsage()}
+    for video_file in video_files:
+        for mosaic in (False, True):
+            try:
+                images, usage = run_mode(client, video_file, mosaic)
+            except Exception as e:
+                print(f"✗ {video_file} ({'mosaic' if mosaic else 'frames'}): {e}")
+                continue
+            rows.append((video_file, mosaic, images, usage))
+            total = totals[mosaic]
+            total.prompt_tokens += usage.prompt_tokens
+            total.completion_tokens += usage.completion_tokens
+            total.latency_seconds += usage.latency_seconds
+
+    print(f"\nModel: {client.config.model}")
+    print(f"{'video':<60} {'mode':<7} {'images':>6} {'prompt':>8} {'output':>8} {'latency':>8}")
+    for video_file, mosaic, images, usage in rows:
+        print(
+            f"{video_file[:60]:<60} {'mosaic' if mosaic else 'frames':<7} "
+            f"{images:>6} {usage.prompt_tokens:>8} {usage.completion_tokens:>8} "
+            f"{usage.latency_seconds:>7.1f}s"
+        )
+
+    print("\nTotals:")
+    for mosaic, total in totals.items():
+        print(
+            f"  {'mosaic' if mosaic else 'frames'}: "
+            f"{total.prompt_tokens} prompt tokens, "
+            f"{total.completion_tokens} output tokens, "
+            f"{total.latency_seconds:.1f}s"
+        )
+
+
+if __name__ == "__main__":
+    main()
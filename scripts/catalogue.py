@@ -0,0 +1,405 @@
+"""SQLite video catalogue and resumable job journal.
+
+One row per video holds its content hash and a cheap container probe
+(duration, fps, resolution, frame count). A second table journals every
+pipeline stage per video with status, timestamps, attempt count and last
+error, so an interrupted run resumes exactly where it stopped and "what is
+left" is an indexed query instead of a directory rescan. Completed stages
+also record a fingerprint of their input, so a changed input re-runs only
+the stage that consumes it.
+"""
+
+from __future__ import annotations
+
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass, field
+from enum import Enum
+from pathlib import Path
+from typing import Iterable, Optional
+
+import cv2
+
+from scripts.result_cache import sha256_file
+
+MAX_ATTEMPTS = 3
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS videos (
+    filename TEXT PRIMARY KEY,
+    content_hash TEXT,
+    size INTEGER,
+    mtime_ns INTEGER,
+    duration REAL,
+    fps REAL,
+    width INTEGER,
+    height INTEGER,
+    frame_count INTEGER,
+    added_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS stages (
+    filename TEXT NOT NULL REFERENCES videos(filename) ON DELETE CASCADE,
+    stage TEXT NOT NULL,
+    status TEXT NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    last_error TEXT,
+    input_hash TEXT,
+    started_at REAL,
+    finished_at REAL,
+    PRIMARY KEY (filename, stage)
+);
+CREATE INDEX IF NOT EXISTS stages_by_status ON stages (stage, status, attempts);
+"""
+
+
+class PipelineStage(str, Enum):
+    """Processing stages tracked per video, in pipeline order."""
+
+    FRAMES = "frames"
+    ANALYSIS = "analysis"
+    META = "meta"
+
+
+class StageStatus(str, Enum):
+    PENDING = "pending"
+    RUNNING = "running"
+    DONE = "done"
+    FAILED = "failed"
+
+
+_STAGE_ORDER = list(PipelineStage)
+
+
+@dataclass(frozen=True, slots=True)
+class VideoProbe:
+    """Container-level facts read without decoding frames."""
+
+    duration: float
+    fps: float
+    width: int
+    height: int
+    frame_count: int
+
+
+def probe_video(path: Path) -> VideoProbe:
+    """Read duration, fps, resolution and frame count from the container."""
+    cap = cv2.VideoCapture(str(path))
+    try:
+        fps = cap.get(cv2.CAP_PROP_FPS) or 0.0
+        frame_count = max(0, int(cap.get(cv2.CAP_PROP_FRAME_COUNT)))
+        return VideoProbe(
+            duration=frame_count / fps if fps else 0.0,
+            fps=fps,
+            width=int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)),
+            height=int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT)),
+            frame_count=frame_count,
+        )
+    finally:
+        cap.release()
+
+
+@dataclass(slots=True)
+class VideoCatalogue:
+    """Catalogue of videos and their per-stage processing state.
+
+    Safe to share between threads of one process; every statement runs under
+    a lock on a single connection.
+    """
+
+    db_path: Path
+    _conn: sqlite3.Connection = field(init=False)
+    _lock: threading.Lock = field(default_factory=threading.Lock)
+
+    def __post_init__(self) -> None:
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA foreign_keys=ON")
+            self._conn.executescript(_SCHEMA)
+            self._migrate()
+            self._conn.commit()
+
+    def _migrate(self) -> None:
+        """Add columns introduced after a catalogue was created (lock held)."""
+        columns = {
+            row["name"] for row in self._conn.execute("PRAGMA table_info(stages)")
+        }
+        if "input_hash" not in columns:
+            self._conn.execute("ALTER TABLE stages ADD COLUMN input_hash TEXT")
+
+    def close(self) -> None:
+        self._conn.close()
+
+    def sync_videos(self, videos_dir: Path, pattern: str = "*.mp4") -> int:
+        """Add new videos and refresh changed ones.
+
+        Unchanged files (same size and mtime) cost one ``stat``. New or
+        changed files are hashed and probed, and all their stages are reset.
+
+        Returns:
+            Number of new or changed videos
+        """
+        with self._lock:
+            known = {
+                row["filename"]: (row["size"], row["mtime_ns"])
+                for row in self._conn.execute(
+                    "SELECT filename, size, mtime_ns FROM videos"
+                )
+            }
+
+        changed = 0
+        for path in sorted(videos_dir.glob(pattern)):
+            stat = path.stat()
+            if known.get(path.name) == (stat.st_size, stat.st_mtime_ns):
+                continue
+            self._upsert_video(path, stat.st_size, stat.st_mtime_ns)
+            changed += 1
+        return changed
+
+    def _upsert_video(self, path: Path, size: int, mtime_ns: int) -> None:
+        probe = probe_video(path)
+        content_hash = sha256_file(path)
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.execute(
+                """
+                INSERT INTO videos (filename, content_hash, size, mtime_ns,
+                    duration, fps, width, height, frame_count, added_at, updated_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT (filename) DO UPDATE SET
+                    content_hash = excluded.content_hash,
+                    size = excluded.size,
+                    mtime_ns = excluded.mtime_ns,
+                    duration = excluded.duration,
+                    fps = excluded.fps,
+                    width = excluded.width,
+                    height = excluded.height,
+                    frame_count = excluded.frame_count,
+                    updated_at = excluded.updated_at
+                """,
+                (
+                    path.name,
+                    content_hash,
+                    size,
+                    mtime_ns,
+                    probe.duration,
+                    probe.fps,
+                    probe.width,
+                    probe.height,
+                    probe.frame_count,
+                    now,
+                    now,
+                ),
+            )
+            self._reset_stages(path.name, _STAGE_ORDER)
+
+    def register(
+        self, filename: str, done_stages: Iterable[PipelineStage] = ()
+    ) -> None:
+        """Ensure a row exists for ``filename`` without probing it.
+
+        Used for videos known only through their output files. Stages in
+        ``done_stages`` are recorded as done only for a video the catalogue
+        has never seen; a known video keeps its state, since a pending stage
+        there may have been reset by ``sync_videos`` or ``invalidate_changed``.
+        """
+        now = time.time()
+        with self._lock, self._conn:
+            inserted = self._conn.execute(
+                "INSERT OR IGNORE INTO videos (filename, added_at, updated_at) "
+                "VALUES (?, ?, ?)",
+                (filename, now, now),
+            ).rowcount
+            if not inserted:
+                return
+            self._reset_stages(filename, _STAGE_ORDER)
+            for stage in done_stages:
+                self._conn.execute(
+                    "UPDATE stages SET status = ?, finished_at = ? "
+                    "WHERE filename = ? AND stage = ?",
+                    (StageStatus.DONE.value, now, filename, stage.value),
+                )
+
+    def _reset_stages(self, filename: str, stages: Iterable[PipelineStage]) -> None:
+        """Mark ``stages`` pending with a fresh attempt count (lock held).
+
+        The input fingerprint of the last completed run is kept, so a stage
+        with no fingerprint is one that never completed with tracking.
+        """
+        for stage in stages:
+            self._conn.execute(
+                """
+                INSERT INTO stages (filename, stage, status, attempts)
+                VALUES (?, ?, ?, 0)
+                ON CONFLICT (filename, stage) DO UPDATE SET
+                    status = excluded.status, attempts = 0, last_error = NULL,
+                    started_at = NULL, finished_at = NULL
+                """,
+                (filename, stage.value, StageStatus.PENDING.value),
+            )
+
+    def recover_interrupted(self) -> int:
+        """Return stages left RUNNING by a crashed run to PENDING."""
+        with self._lock, self._conn:
+            return self._conn.execute(
+                "UPDATE stages SET status = ? WHERE status = ?",
+                (StageStatus.PENDING.value, StageStatus.RUNNING.value),
+            ).rowcount
+
+    def pending(
+        self,
+        stage: PipelineStage,
+        after: Optional[PipelineStage] = None,
+        max_attempts: int = MAX_ATTEMPTS,
+    ) -> list[str]:
+        """Videos whose ``stage`` still has to run, oldest first.
+
+        Args:
+            stage: Stage to look up
+            after: Only include videos where this stage is already done
+            max_attempts: Failed stages are retried until this many attempts
+
+        Returns:
+            Filenames in the order they were added to the catalogue
+        """
+        query = """
+            SELECT s.filename FROM stages s
+            JOIN videos v ON v.filename = s.filename
+            WHERE s.stage = ? AND s.status IN (?, ?) AND s.attempts < ?
+        """
+        params: list = [
+            stage.value,
+            StageStatus.PENDING.value,
+            StageStatus.FAILED.value,
+            max_attempts,
+        ]
+        if after is not None:
+            query += """
+                AND EXISTS (SELECT 1 FROM stages p WHERE p.filename = s.filename
+                            AND p.stage = ? AND p.status = ?)
+            """
+            params += [after.value, StageStatus.DONE.value]
+        query += " ORDER BY v.added_at, s.filename"
+
+        with self._lock:
+            return [row["filename"] for row in self._conn.execute(query, params)]
+
+    def mark_started(self, filename: str, stage: PipelineStage) -> None:
+        with self._lock, self._conn:
+            self._conn.execute(
+                "UPDATE stages SET status = ?, attempts = attempts + 1, "
+                "started_at = ?, finished_at = NULL WHERE filename = ? AND stage = ?",
+                (StageStatus.RUNNING.value, time.time(), filename, stage.value),
+            )
+
+    def mark_done(
+        self,
+        filename: str,
+        stage: PipelineStage,
+        input_hash: Optional[str] = None,
+    ) -> None:
+        """Record success; later stages that were done become stale.
+
+        ``input_hash`` fingerprints what the stage consumed (see
+        ``invalidate_changed``).
+        """
+        with self._lock, self._conn:
+            self._conn.execute(
+                "UPDATE stages SET status = ?, last_error = NULL, input_hash = ?, "
+                "finished_at = ? WHERE filename = ? AND stage = ?",
+                (
+                    StageStatus.DONE.value,
+                    input_hash,
+                    time.time(),
+                    filename,
+                    stage.value,
+                ),
+            )
+            for later in _STAGE_ORDER[_STAGE_ORDER.index(stage) + 1 :]:
+                self._conn.execute(
+                    "UPDATE stages SET status = ?, attempts = 0 "
+                    "WHERE filename = ? AND stage = ? AND status = ?",
+                    (
+                        StageStatus.PENDING.value,
+                        filename,
+                        later.value,
+                        StageStatus.DONE.value,
+                    ),
+                )
+
+    def mark_failed(
+        self, filename: str, stage: PipelineStage, error: BaseException | str
+    ) -> None:
+        with self._lock, self._conn:
+            self._conn.execute(
+                "UPDATE stages SET status = ?, last_error = ?, finished_at = ? "
+                "WHERE filename = ? AND stage = ?",
+                (
+                    StageStatus.FAILED.value,
+                    str(error),
+                    time.time(),
+                    filename,
+                    stage.value,
+                ),
+            )
+
+    def input_hash(self, filename: str, stage: PipelineStage) -> Optional[str]:
+        """Fingerprint recorded when ``stage`` last completed, if any."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT input_hash FROM stages WHERE filename = ? AND stage = ?",
+                (filename, stage.value),
+            ).fetchone()
+        return row["input_hash"] if row else None
+
+    def invalidate_changed(
+        self, stage: PipelineStage, fingerprints: dict[str, str]
+    ) -> int:
+        """Return done stages whose input no longer matches to pending.
+
+        Done stages without a recorded fingerprint (completed before
+        fingerprints were tracked) adopt the current one instead of re-running.
+        Videos missing from ``fingerprints`` are left alone.
+
+        Returns:
+            Number of stages invalidated
+        """
+        invalidated = 0
+        with self._lock, self._conn:
+            for filename, fingerprint in fingerprints.items():
+                params = (filename, stage.value, StageStatus.DONE.value)
+                invalidated += self._conn.execute(
+                    "UPDATE stages SET status = ?, attempts = 0 "
+                    "WHERE filename = ? AND stage = ? AND status = ? "
+                    "AND input_hash IS NOT NULL AND input_hash != ?",
+                    (StageStatus.PENDING.value, *params, fingerprint),
+                ).rowcount
+                self._conn.execute(
+                    "UPDATE stages SET input_hash = ? "
+                    "WHERE filename = ? AND stage = ? AND status = ? "
+                    "AND input_hash IS NULL",
+                    (fingerprint, *params),
+                )
+        return invalidated
+
+    def summary(self) -> dict[str, dict[str, int]]:
+        """Count of videos per stage and status."""
+        result: dict[str, dict[str, int]] = {}
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT stage, status, COUNT(*) AS n FROM stages GROUP BY stage, status"
+            ).fetchall()
+        for row in rows:
+            result.setdefault(row["stage"], {})[row["status"]] = row["n"]
+        return result
+
+    def video(self, filename: str) -> Optional[sqlite3.Row]:
+        """Catalogue row of a single video."""
+        with self._lock:
+            return self._conn.execute(
+                "SELECT * FROM videos WHERE filename = ?", (filename,)
+            ).fetchone()
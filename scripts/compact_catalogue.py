@@ -0,0 +1,163 @@
+"""Token-compact encoding of the clip catalogue sent to the matching model.
+
+Instead of one labelled line per clip with its full filename, the catalogue
+is a table: a legend and header once, then one ``|``-separated row per clip
+keyed by a short integer id. The model answers with ids, which are mapped
+back to filenames. Within a row a tag is listed once even if it appears in
+several tag fields, columns that are empty for every clip are left out,
+free text is cut to its leading sentences (``MAX_TEXT_CHARS``) and
+``spatial_tags`` (where in the frame things are) are not sent at all since
+they rarely decide a match.
+
+Ids are positions in the list of records encoded, starting at 1, so a
+catalogue encoded in a fixed order keeps its ids and its prompt text.
+
+Usage:
+    python -m scripts.compact_catalogue    # catalogue tokens per clip, before and after
+"""
+
+from __future__ import annotations
+
+import json
+import re
+from dataclasses import dataclass
+from typing import Callable, Optional
+
+from scripts.meta_batches import estimate_tokens
+from scripts.meta_store import open_store
+from scripts.paths import JSON_DIR, META_STORE_DIR
+from scripts.result_cache import sha256_text
+
+# Record field and column label, in row order
+COLUMNS = (
+    ("summary_text", "summary"),
+    ("themes", "themes"),
+    ("actions", "actions"),
+    ("semantic_tags", "tags"),
+    ("currencies", "currencies"),
+    ("motion_summary", "motion"),
+)
+TAG_COLUMNS = frozenset(("themes", "actions", "semantic_tags", "currencies"))
+# Free text is cut to its leading sentences within these many characters;
+# the opening sentences say what is shown, later ones mostly interpret it
+MAX_TEXT_CHARS = {"summary_text": 320, "motion_summary": 120}
+LEGEND = (
+    "One clip per row, columns separated by '|', tags by ','; "
+    "trailing empty columns are omitted."
+)
+# Changes whenever the encoding does, so results cached under an older
+# encoding are not reused
+ENCODING_VERSION = sha256_text(
+    json.dumps([COLUMNS, sorted(TAG_COLUMNS), MAX_TEXT_CHARS, LEGEND])
+)[:16]
+
+_WHITESPACE_RE = re.compile(r"\s+")
+_SENTENCE_END_RE = re.compile(r"(?<=[.!?])\s+")
+
+
+@dataclass(frozen=True, slots=True)
+class CompactCatalogue:
+    """Encoded catalogue text and the filename behind every clip id."""
+
+    text: str
+    filenames: list[str]
+
+    def filename(self, clip_id: int) -> Optional[str]:
+        if 1 <= clip_id <= len(self.filenames):
+            return self.filenames[clip_id - 1]
+        return None
+
+
+def _cell(text: str) -> str:
+    return _WHITESPACE_RE.sub(" ", text).replace("|", "/").strip()
+
+
+def _leading_sentences(text: str, max_chars: int) -> str:
+    if len(text) <= max_chars:
+        return text
+    kept = ""
+    for sentence in _SENTENCE_END_RE.split(text):
+        if kept and len(kept) + 1 + len(sentence) > max_chars:
+            break
+        kept = f"{kept} {sentence}" if kept else sentence
+    return kept if len(kept) <= max_chars else kept[:max_chars].rsplit(" ", 1)[0]
+
+
+def _tag(tag: str) -> str:
+    return _cell(tag.replace("_", " ")).lower()
+
+
+def _row(clip_id: int, meta: dict, columns: list[tuple[str, str]]) -> str:
+    seen: set[str] = set()
+    cells = [str(clip_id)]
+    for field, _ in columns:
+        if field not in TAG_COLUMNS:
+            text = _cell(meta.get(field) or "")
+            cells.append(_leading_sentences(text, MAX_TEXT_CHARS[field]))
+            continue
+        tags = []
+        for tag in meta.get(field) or []:
+            tag = _tag(tag)
+            if tag and tag not in seen:
+                seen.add(tag)
+                tags.append(tag)
+        cells.append(",".join(tags))
+    return "|".join(cells).rstrip("|")
+
+
+def encode_catalogue(video_metas: list[dict]) -> CompactCatalogue:
+    """Encode ``video_metas`` as a table with clip ids 1..n in list order."""
+    columns = [
+        (field, label)
+        for field, label in COLUMNS
+        if any(meta.get(field) for meta in video_metas)
+    ]
+    header = "|".join(["id", *(label for _, label in columns)])
+    rows = [_row(i, meta, columns) for i, meta in enumerate(video_metas, start=1)]
+    text = "\n".join(
+        [LEGEND, header, *rows]
+    )
+    return CompactCatalogue(text, [meta["filename"] for meta in video_metas])
+
+
+def row_tokens(meta: dict) -> int:
+    """Estimated tokens of the row of ``meta`` in an encoded catalogue."""
+    return estimate_tokens(_row(0, meta, list(COLUMNS)))
+
+
+def verbose_line(meta: dict) -> str:
+    """The previous catalogue line of a clip, for comparison."""
+    return f"- {meta['filename']}: Summary: {meta.get('summary_text', '')} | Themes: {', '.join(meta.get('themes', []))} | Actions: {', '.join(meta.get('actions', []))} | Currencies: {', '.join(meta.get('currencies', []))} | Spatial Tags: {', '.join(meta.get('spatial_tags', []))} | Motion: {meta.get('motion_summary', '')} | Semantic Tags: {', '.join(meta.get('semantic_tags', []))}"
+
+
+def token_counter() -> tuple[str, Callable[[str], int]]:
+    """A tokenizer-backed counter when ``tiktoken`` is installed, else the
+    character estimate used for batching.
+    """
+    try:
+        import tiktoken
+    except ImportError:
+        return "estimate", estimate_tokens
+    encoding = tiktoken.get_encoding("o200k_base")
+    return "o200k_base", lambda text: len(encoding.encode(text))
+
+
+def main() -> None:
+    store = open_store(META_STORE_DIR, JSON_DIR)
+    video_metas = sorted(store.records(), key=lambda meta: meta["filename"])
+    if not video_metas:
+        print("No video metadata found.")
+        return
+
+    name, count = token_counter()
+    before = count("\n".join(verbose_line(meta) for meta in video_metas))
+    after = count(encode_catalogue(video_metas).text)
+    clips = len(video_metas)
+    print(f"{clips} clips, tokens counted with {name}")
+    print(f"Before: {before} tokens, {before / clips:.1f} per clip")
+    print(f"After:  {after} tokens, {after / clips:.1f} per clip")
+    print(f"Saved {1 - after / before:.0%}, {before / after:.2f}x the clips per call")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,9 @@
 from __future__ import annotations
 
+import asyncio
 import json
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
 from enum import Enum
 from pathlib import Path
 from typing import List, Optional, Literal
@@ -9,8 +12,49 @@ from dotenv import load_dotenv
 from pydantic import BaseModel, Field
 from jinja2 import Environment, FileSystemLoader, StrictUndefined
 
+from scripts.catalogue import PipelineStage, VideoCatalogue
+from scripts.meta_batches import (
+    Note,
+    estimate_tokens,
+    pack_batches,
+    run_batches,
+    run_batches_async,
+    split_note,
+)
+from scripts.meta_rules import LocalMeta, extract_local_meta
+from scripts.meta_store import MetaStore, open_store
+from scripts.paths import ANALYSIS_DIR, CATALOGUE_PATH, JSON_DIR, META_STORE_DIR
+from scripts.rate_limit import RateLimiter, call_with_backoff
+from scripts.result_cache import sha256_file
+from src.llm.async_client import AsyncLLMClient
 from src.llm.client import LLMClient
 
+# Batch mode packs several notes into one request, up to BATCH_INPUT_TOKENS
+# of note text and BATCH_MAX_ITEMS notes, with META_OUTPUT_TOKENS of output
+# allowed per note.
+BATCH_MODE = True
+BATCH_INPUT_TOKENS = 24_000
+BATCH_MAX_ITEMS = 12
+META_OUTPUT_TOKENS = 600
+# Notes over MAX_NOTE_TOKENS are split on section boundaries into chunks
+# extracted in parallel, each in its own request, and merged afterwards.
+# Without async mode up to SYNC_WORKERS requests run at once.
+MAX_NOTE_TOKENS = 8_000
+SYNC_WORKERS = 4
+# Async mode keeps up to MAX_CONCURRENT_REQUESTS requests in flight within
+# REQUESTS_PER_MINUTE and TOKENS_PER_MINUTE (input estimate plus output
+# allowance). HTTP 429 pauses all requests for the Retry-After delay.
+ASYNC_MODE = True
+MAX_CONCURRENT_REQUESTS = 8
+REQUESTS_PER_MINUTE = 60
+TOKENS_PER_MINUTE = 400_000
+MAX_RATE_LIMIT_RETRIES = 6
+# Local rules fill metadata without a request when their confidence reaches
+# LOCAL_CONFIDENCE_THRESHOLD and the note has its own synthesis and motion
+# sections; otherwise their tags are merged into the LLM result.
+LOCAL_RULES = True
+LOCAL_CONFIDENCE_THRESHOLD = 0.75
+
 
 class VideoTheme(str, Enum):
     """Themes for video content matching, used to suggest best matching text/scripts."""
@@ -67,6 +111,49 @@ class VideoAnalysisMeta(BaseModel):
     )
 
 
+class KeyedVideoMeta(VideoAnalysisMeta):
+    """Metadata of one note in a batched extraction."""
+
+    filename: str = Field(
+        ..., description="Filename of the note this metadata was extracted from."
+    )
+
+
+class VideoMetaBatch(BaseModel):
+    """Structured output of a batched extraction, one item per note."""
+
+    items: List[KeyedVideoMeta] = Field(
+        default_factory=list,
+        description="Metadata for every note, each tagged with the note's filename.",
+    )
+
+
+def meta_prompt(raw_text: str) -> str:
+    """Prompt extracting metadata from a single analysis note."""
+    return f"""
+        Analyze the following video analysis notes and extract structured metadata including actions, currencies, spatial tags, motion summary, semantic tags, and a summary text.
+        The input is raw text analysis of a video clip.
+        
+        
+        Raw text:
+        {raw_text}
+        """
+
+
+def batch_meta_prompt(notes: List[Note]) -> str:
+    """Prompt extracting metadata from several notes in one request."""
+    sections = "\n\n".join(
+        f"### NOTE filename={note.key}\n{note.text.strip()}" for note in notes
+    )
+    return f"""
+Analyze each of the following video analysis notes and extract structured metadata including actions, currencies, spatial tags, motion summary, semantic tags, and a summary text.
+Each input is the raw text analysis of a separate video clip. Treat the notes independently and never mix details between them.
+Return exactly one item per note, with `filename` set exactly to the filename given in that note's header.
+
+{sections}
+"""
+
+
 def extract_video_meta_from_file(
     file_path: Path,
     llm_client: LLMClient,
@@ -84,48 +171,350 @@ def extract_video_meta_from_file(
         print(f"Error reading file {file_path}: {e}")
         return None
 
-    # Load and render the Jinja template
-    prompt = f"""
-        Analyze the following video analysis notes and extract structured metadata including actions, currencies, spatial tags, motion summary, semantic tags, and a summary text.
-        The input is raw text analysis of a video clip.
-        
-        
-        Raw text:
-        {raw_text}
-        """
-
-    # Call LLM
+    # Call LLM, once per chunk for oversized notes
+    chunks = split_note(Note(key=file_path.name, text=raw_text), MAX_NOTE_TOKENS)
     try:
-        extracted_data = llm_client.invoke(
-            prompt=prompt, output_model=VideoAnalysisMeta
-        )
+        with ThreadPoolExecutor(max_workers=len(chunks)) as pool:
+            parts = list(
+                pool.map(
+                    lambda chunk: llm_client.invoke(
+                        prompt=meta_prompt(chunk.text), output_model=VideoAnalysisMeta
+                    ),
+                    chunks,
+                )
+            )
     except Exception as e:
         print(f"Error calling LLM: {e}")
         return None
 
-    return extracted_data
+    return merge_video_metas(*parts)
+
+
+def _batch_request(notes: List[Note]) -> tuple[str, type[BaseModel], Optional[int]]:
+    """Prompt, output model and output limit for extracting ``notes``."""
+    if len(notes) == 1:
+        return meta_prompt(notes[0].text), VideoAnalysisMeta, None
+    return (
+        batch_meta_prompt(notes),
+        VideoMetaBatch,
+        META_OUTPUT_TOKENS * len(notes),
+    )
+
+
+def _batch_results(
+    notes: List[Note], result: BaseModel
+) -> dict[str, VideoAnalysisMeta]:
+    """Metadata per note key from a response to ``_batch_request``."""
+    if isinstance(result, VideoAnalysisMeta):
+        return {notes[0].key: result}
+    keys = {note.key for note in notes}
+    return {
+        item.filename: VideoAnalysisMeta.model_validate(
+            item.model_dump(exclude={"filename"})
+        )
+        for item in result.items  # type: ignore[attr-defined]
+        if item.filename in keys
+    }
+
+
+def extract_video_metas(
+    notes: List[Note], llm_client: LLMClient
+) -> dict[str, VideoAnalysisMeta]:
+    """Extract metadata for a batch of notes in a single request.
+
+    Raises:
+        LLMCallError: If the request fails or the response fails validation
+
+    Returns:
+        Metadata per note key; notes the model skipped are absent
+    """
+    prompt, output_model, max_output_tokens = _batch_request(notes)
+    result = llm_client.invoke(
+        prompt=prompt, output_model=output_model, max_output_tokens=max_output_tokens
+    )
+    return _batch_results(notes, result)
+
+
+async def extract_video_metas_async(
+    notes: List[Note], client: AsyncLLMClient, limiter: RateLimiter
+) -> dict[str, VideoAnalysisMeta]:
+    """``extract_video_metas`` within the rate limits, retrying on HTTP 429."""
+    prompt, output_model, max_output_tokens = _batch_request(notes)
+    tokens = estimate_tokens(prompt) + (
+        max_output_tokens or client.config.max_output_tokens
+    )
+    result = await call_with_backoff(
+        limiter,
+        tokens,
+        lambda: client.invoke(
+            prompt=prompt,
+            output_model=output_model,
+            max_output_tokens=max_output_tokens,
+        ),
+        max_retries=MAX_RATE_LIMIT_RETRIES,
+    )
+    return _batch_results(notes, result)
+
+
+def local_video_meta(local: LocalMeta) -> VideoAnalysisMeta:
+    """``VideoAnalysisMeta`` from rule-based fields, dropping unknown themes."""
+    themes = {theme.value for theme in VideoTheme}
+    return VideoAnalysisMeta(
+        actions=local.actions,
+        currencies=local.currencies,
+        spatial_tags=local.spatial_tags,
+        motion_summary=local.motion_summary or "",
+        semantic_tags=local.semantic_tags,
+        summary_text=local.summary_text or "",
+        themes=[VideoTheme(theme) for theme in local.themes if theme in themes],
+    )
+
+
+def merge_video_metas(*metas: VideoAnalysisMeta) -> VideoAnalysisMeta:
+    """Merge metadata of one video: list fields are unioned in order without
+    duplicates, free-text fields come from the first meta that has them.
+    """
+    merged: dict[str, object] = {}
+    for name in VideoAnalysisMeta.model_fields:
+        values = [getattr(meta, name) for meta in metas]
+        if isinstance(values[0], list):
+            merged[name] = list(dict.fromkeys(v for value in values for v in value))
+        else:
+            merged[name] = next((value for value in values if value), values[0])
+    return VideoAnalysisMeta.model_validate(merged)
+
+
+def analysis_fingerprints(analysis_dir: Path = ANALYSIS_DIR) -> dict[str, str]:
+    """SHA-256 of every analysis note, keyed by its video filename."""
+    return {
+        txt_file.with_suffix(".mp4").name: sha256_file(txt_file)
+        for txt_file in analysis_dir.glob("*.txt")
+    }
+
+
+@dataclass(slots=True)
+class MetaRun:
+    """Notes to extract in one run, and what happened to them."""
+
+    catalogue: VideoCatalogue
+    store: MetaStore
+    notes: List[Note] = field(default_factory=list)
+    fingerprints: dict[str, str] = field(default_factory=dict)
+    hints: dict[str, VideoAnalysisMeta] = field(default_factory=dict)
+    # Chunk keys of split notes, the chunks extracted so far and the split
+    # notes given up on after a chunk failed
+    chunks: dict[str, List[str]] = field(default_factory=dict)
+    parts: dict[str, VideoAnalysisMeta] = field(default_factory=dict)
+    rejected: set[str] = field(default_factory=set)
+    built: int = 0
+    failed: int = 0
+    local: int = 0
+
+    @property
+    def batches(self) -> List[List[Note]]:
+        # Chunks get a request each and go first, as the largest notes
+        chunk_keys = {key for keys in self.chunks.values() for key in keys}
+        whole = [note for note in self.notes if note.key not in chunk_keys]
+        chunks = [[note] for note in self.notes if note.key in chunk_keys]
+        if BATCH_MODE:
+            return chunks + pack_batches(whole, BATCH_INPUT_TOKENS, BATCH_MAX_ITEMS)
+        return chunks + [[note] for note in whole]
+
+    def add(self, video_file: str, raw_text: str) -> None:
+        """Queue a note for extraction, split into chunks if oversized."""
+        notes = split_note(Note(key=video_file, text=raw_text), MAX_NOTE_TOKENS)
+        if len(notes) > 1:
+            self.chunks[video_file] = [note.key for note in notes]
+        self.notes += notes
+
+    def _video_of(self, key: str) -> Optional[str]:
+        """Video file of a chunk key, or None when ``key`` is not a chunk."""
+        video_file = key.rpartition("#")[0]
+        return video_file if key in self.chunks.get(video_file, ()) else None
+
+    def collect(self, key: str, meta: VideoAnalysisMeta) -> None:
+        """Save a note's metadata, or hold a chunk's until all chunks arrive."""
+        video_file = self._video_of(key)
+        if video_file is None:
+            self.save(key, meta)
+            return
+        if video_file in self.rejected:
+            return
+        self.parts[key] = meta
+        keys = self.chunks[video_file]
+        if all(chunk_key in self.parts for chunk_key in keys):
+            self.save(
+                video_file,
+                merge_video_metas(*(self.parts.pop(chunk_key) for chunk_key in keys)),
+            )
+
+    def reject(self, key: str, error: BaseException | str) -> None:
+        """Fail the note ``key`` belongs to; its other chunks are dropped."""
+        video_file = self._video_of(key)
+        if video_file is None:
+            self.fail(key, error)
+            return
+        if video_file in self.rejected:
+            return
+        self.rejected.add(video_file)
+        for chunk_key in self.chunks[video_file]:
+            self.parts.pop(chunk_key, None)
+        self.fail(video_file, error)
+
+    def save(self, video_file: str, meta: VideoAnalysisMeta) -> None:
+        hint = self.hints.pop(video_file, None)
+        if hint is not None:
+            meta = merge_video_metas(meta, hint)
+        self.store.upsert(video_file, meta.model_dump(mode="json"))
+        self.catalogue.mark_done(
+            video_file, PipelineStage.META, self.fingerprints[video_file]
+        )
+        self.built += 1
+        print(f"Saved structured data for {video_file}")
+
+    def fail(self, video_file: str, error: BaseException | str) -> None:
+        self.catalogue.mark_failed(video_file, PipelineStage.META, error)
+        self.failed += 1
+        print(f"Failed to process {video_file}: {error}")
+
+
+def collect_notes(
+    video_files: List[str],
+    catalogue: VideoCatalogue,
+    store: MetaStore,
+    analysis_dir: Path = ANALYSIS_DIR,
+) -> MetaRun:
+    """Read the notes of ``video_files`` that need their metadata rebuilt.
+
+    The note's SHA-256 is recorded as the META stage input, so a note that
+    was rewritten with identical content is marked done without a request,
+    as is a note whose record was imported without a fingerprint.
+    With LOCAL_RULES, notes the rules cover confidently are saved right away
+    and only the rest are returned for the LLM.
+    """
+    run = MetaRun(catalogue=catalogue, store=store)
+    for video_file in video_files:
+        txt_file = analysis_dir / Path(video_file).with_suffix(".txt").name
+        try:
+            fingerprint = sha256_file(txt_file)
+            raw_text = txt_file.read_text(encoding="utf-8")
+        except (OSError, UnicodeDecodeError) as e:
+            run.fail(video_file, e)
+            continue
+
+        # No recorded fingerprint means the record was imported from legacy
+        # JSON files built from this note, so it is adopted as well
+        recorded = catalogue.input_hash(video_file, PipelineStage.META)
+        if recorded in (fingerprint, None) and video_file in store:
+            catalogue.mark_done(video_file, PipelineStage.META, fingerprint)
+            print(f"Unchanged: {txt_file}")
+            run.built += 1
+            continue
+
+        catalogue.mark_started(video_file, PipelineStage.META)
+        run.fingerprints[video_file] = fingerprint
+        if LOCAL_RULES:
+            local = extract_local_meta(raw_text)
+            if local.confidence >= LOCAL_CONFIDENCE_THRESHOLD and local.has_free_text:
+                run.save(video_file, local_video_meta(local))
+                run.local += 1
+                continue
+            run.hints[video_file] = local_video_meta(local)
+        run.add(video_file, raw_text)
+    if run.local:
+        print(f"Filled {run.local} notes locally without a request")
+    return run
+
+
+def build_video_metas(
+    video_files: List[str],
+    catalogue: VideoCatalogue,
+    llm_client: LLMClient,
+    store: MetaStore,
+    analysis_dir: Path = ANALYSIS_DIR,
+) -> tuple[int, int]:
+    """Extract and save metadata for videos whose note changed.
+
+    With BATCH_MODE the notes share requests (see ``scripts.meta_batches``)
+    and each record is upserted into ``store`` as soon as its batch returns.
+
+    Returns:
+        Tuple of (videos with up-to-date metadata, failed videos)
+    """
+    run = collect_notes(video_files, catalogue, store, analysis_dir)
+    if run.notes:
+        requests = run_batches(
+            run.batches,
+            lambda batch: extract_video_metas(batch, llm_client),
+            run.collect,
+            run.reject,
+            max_workers=SYNC_WORKERS,
+        )
+        print(f"Extracted {len(run.notes)} notes and chunks in {requests} requests")
+    return run.built, run.failed
+
+
+async def build_video_metas_async(
+    video_files: List[str],
+    catalogue: VideoCatalogue,
+    client: AsyncLLMClient,
+    store: MetaStore,
+    analysis_dir: Path = ANALYSIS_DIR,
+) -> tuple[int, int]:
+    """``build_video_metas`` with concurrent, rate-limited requests.
+
+    Returns:
+        Tuple of (videos with up-to-date metadata, failed videos)
+    """
+    run = collect_notes(video_files, catalogue, store, analysis_dir)
+    if run.notes:
+        limiter = RateLimiter(REQUESTS_PER_MINUTE, TOKENS_PER_MINUTE)
+        requests = await run_batches_async(
+            run.batches,
+            lambda batch: extract_video_metas_async(batch, client, limiter),
+            run.collect,
+            run.reject,
+            MAX_CONCURRENT_REQUESTS,
+        )
+        print(f"Extracted {len(run.notes)} notes and chunks in {requests} requests")
+    return run.built, run.failed
+
+
+async def _build_async(
+    video_files: List[str], catalogue: VideoCatalogue, store: MetaStore
+) -> tuple[int, int]:
+    client = AsyncLLMClient.from_env()
+    try:
+        return await build_video_metas_async(video_files, catalogue, client, store)
+    finally:
+        await client.close()
 
 
 def main():
     load_dotenv()
-    llm_client = LLMClient.from_env()
-
-    # Directory with analysis files
-    analysis_dir = Path("videos/analysis")
-
-    # Process all .txt files
-    for txt_file in analysis_dir.glob("*.txt"):
-        print(f"Processing {txt_file}...")
-        meta = extract_video_meta_from_file(txt_file, llm_client)
-        if meta:
-            # Save to JSON in videos/analysis/json
-            json_dir = Path("videos/analysis/json")
-            json_dir.mkdir(parents=True, exist_ok=True)
-            output_file = json_dir / txt_file.with_suffix(".json").name
-            output_file.write_text(meta.model_dump_json(), encoding="utf-8")
-            print(f"Saved structured data to {output_file}")
-        else:
-            print(f"Failed to process {txt_file}")
+
+    # Analyses of videos the catalogue has never seen are registered as done,
+    # so it knows every note that needs metadata
+    catalogue = VideoCatalogue(CATALOGUE_PATH)
+    catalogue.recover_interrupted()
+    fingerprints = analysis_fingerprints(ANALYSIS_DIR)
+    for video_file in fingerprints:
+        catalogue.register(video_file, done_stages=[PipelineStage.ANALYSIS])
+
+    # Edited notes invalidate only their own metadata
+    catalogue.invalidate_changed(PipelineStage.META, fingerprints)
+
+    # Process every analysis whose metadata is missing or stale
+    video_files = catalogue.pending(PipelineStage.META, after=PipelineStage.ANALYSIS)
+    store = open_store(META_STORE_DIR, JSON_DIR)
+    if ASYNC_MODE:
+        built, failed = asyncio.run(_build_async(video_files, catalogue, store))
+    else:
+        built, failed = build_video_metas(
+            video_files, catalogue, LLMClient.from_env(), store
+        )
+    store.compact()
+    print(f"Metadata up to date: {built}, failed: {failed}")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,74 @@
+"""Near-duplicate frame filtering with perceptual hashes.
+
+Frames are reduced to a 64-bit difference hash (dHash) computed with NumPy and
+compared by Hamming distance, so looping or static clips do not ship several
+visually identical images to the video model.
+"""
+
+from __future__ import annotations
+
+import math
+from dataclasses import dataclass, field
+
+import cv2
+import numpy as np
+
+HASH_SIZE = 8
+
+# Image tokens billed per 768x768 tile by Gemini models (images with both
+# sides <= 384 px count as a single tile).
+TOKENS_PER_IMAGE_TILE = 258
+IMAGE_TILE_SIZE = 768
+SMALL_IMAGE_SIZE = 384
+
+
+def dhash(frame: np.ndarray, hash_size: int = HASH_SIZE) -> int:
+    """Difference hash of a BGR (or greyscale) frame as an integer."""
+    grey = frame if frame.ndim == 2 else cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+    small = cv2.resize(grey, (hash_size + 1, hash_size), interpolation=cv2.INTER_AREA)
+    bits = small[:, 1:] > small[:, :-1]
+    return int.from_bytes(np.packbits(bits.ravel()).tobytes(), "big")
+
+
+def hamming_distance(a: int, b: int) -> int:
+    """Number of differing bits between two hashes."""
+    return (a ^ b).bit_count()
+
+
+def estimate_image_tokens(width: int, height: int) -> int:
+    """Approximate image tokens the video model charges for one frame."""
+    if width <= SMALL_IMAGE_SIZE and height <= SMALL_IMAGE_SIZE:
+        return TOKENS_PER_IMAGE_TILE
+    tiles = math.ceil(width / IMAGE_TILE_SIZE) * math.ceil(height / IMAGE_TILE_SIZE)
+    return tiles * TOKENS_PER_IMAGE_TILE
+
+
+@dataclass(slots=True)
+class FrameDeduplicator:
+    """Stateful filter that rejects frames close to one already kept.
+
+    Attributes:
+        threshold: Maximum Hamming distance treated as a duplicate
+        dropped: Number of frames rejected so far
+        tokens_saved: Estimated image tokens not sent because of drops
+    """
+
+    threshold: int
+    dropped: int = 0
+    tokens_saved: int = 0
+    _hashes: list[int] = field(default_factory=list)
+
+    def is_duplicate(self, frame: np.ndarray) -> bool:
+        """Check ``frame`` against kept frames and remember it if it is new."""
+        frame_hash = dhash(frame)
+        if any(
+            hamming_distance(frame_hash, kept) <= self.threshold
+            for kept in self._hashes
+        ):
+            height, width = frame.shape[:2]
+            self.dropped += 1
+            self.tokens_saved += estimate_image_tokens(width, height)
+            return True
+
+        self._hashes.append(frame_hash)
+        return False
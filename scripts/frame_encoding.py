@@ -0,0 +1,77 @@
+"""Frame encoding for LLM requests.
+
+Frames are resized with OpenCV and encoded to JPEG exactly once; the same
+bytes feed both the data URI and the optional debug file. JPEG quality is
+lowered step by step until a frame fits the configured byte budget.
+"""
+
+from __future__ import annotations
+
+import base64
+from pathlib import Path
+from typing import Optional
+
+import cv2
+import numpy as np
+
+
+def resize_to_max_edge(frame: np.ndarray, max_edge: Optional[int]) -> np.ndarray:
+    """Downscale ``frame`` so its longest side is at most ``max_edge``."""
+    height, width = frame.shape[:2]
+    longest = max(height, width)
+    if not max_edge or longest <= max_edge:
+        return frame
+    scale = max_edge / longest
+    size = (max(1, round(width * scale)), max(1, round(height * scale)))
+    return cv2.resize(frame, size, interpolation=cv2.INTER_AREA)
+
+
+def encode_jpeg(frame: np.ndarray, quality: int) -> bytes:
+    """Encode a BGR frame to JPEG bytes."""
+    ok, buffer = cv2.imencode(".jpg", frame, [cv2.IMWRITE_JPEG_QUALITY, quality])
+    if not ok:
+        raise ValueError("Could not encode frame as JPEG")
+    return buffer.tobytes()
+
+
+def encode_within_budget(
+    frame: np.ndarray,
+    max_quality: int,
+    min_quality: int,
+    max_bytes: Optional[int],
+) -> tuple[bytes, int]:
+    """Encode at the highest quality in range whose output fits ``max_bytes``.
+
+    Binary-searches the quality; if even ``min_quality`` is over budget the
+    ``min_quality`` encoding is returned.
+
+    Returns:
+        Tuple of (JPEG bytes, quality used)
+    """
+    best = encode_jpeg(frame, max_quality)
+    if not max_bytes or len(best) <= max_bytes:
+        return best, max_quality
+
+    low, high = min_quality, max_quality - 1
+    best, best_quality = b"", min_quality
+    while low <= high:
+        quality = (low + high) // 2
+        data = encode_jpeg(frame, quality)
+        if len(data) <= max_bytes:
+            best, best_quality = data, quality
+            low = quality + 1
+        else:
+            high = quality - 1
+    if not best:
+        best = encode_jpeg(frame, min_quality)
+    return best, best_quality
+
+
+def to_data_uri(jpeg_bytes: bytes) -> str:
+    """Wrap JPEG bytes as a base64 data URI."""
+    return f"data:image/jpeg;base64,{base64.b64encode(jpeg_bytes).decode('utf-8')}"
+
+
+def write_frame(path: Path, jpeg_bytes: bytes) -> None:
+    """Write already encoded JPEG bytes to disk."""
+    path.write_bytes(jpeg_bytes)
@@ -0,0 +1,90 @@
+"""Frame mosaic packing.
+
+Tiles several sampled frames into one labelled grid image, so a request pays
+the per-image overhead once instead of once per frame. The prompt is adjusted
+to explain that labelled grid cells are the frames.
+"""
+
+from __future__ import annotations
+
+import math
+from typing import Optional
+
+import cv2
+import numpy as np
+
+DEFAULT_CELL_SIZE = (512, 288)
+
+MOSAIC_PROMPT_PREFIX = """
+# INPUT FORMAT
+The frames are packed into a single grid image. Each cell is one frame, labelled "Frame N" in its top-left corner, in chronological order reading left-to-right, top-to-bottom. Treat every cell as a separate frame and refer to frames by their label.
+"""
+
+
+def grid_shape(count: int, columns: Optional[int] = None) -> tuple[int, int]:
+    """Rows and columns for ``count`` cells (near-square unless fixed)."""
+    columns = columns or math.ceil(math.sqrt(count))
+    columns = max(1, min(columns, count))
+    return math.ceil(count / columns), columns
+
+
+def _label_cell(cell: np.ndarray, label: str) -> None:
+    """Draw ``label`` on a dark box in the top-left corner of ``cell``."""
+    height = cell.shape[0]
+    scale = max(0.4, height / 360)
+    thickness = max(1, round(scale * 2))
+    (text_w, text_h), baseline = cv2.getTextSize(
+        label, cv2.FONT_HERSHEY_SIMPLEX, scale, thickness
+    )
+    pad = max(2, text_h // 3)
+    cv2.rectangle(
+        cell, (0, 0), (text_w + 2 * pad, text_h + baseline + 2 * pad), (0, 0, 0), -1
+    )
+    cv2.putText(
+        cell,
+        label,
+        (pad, pad + text_h),
+        cv2.FONT_HERSHEY_SIMPLEX,
+        scale,
+        (255, 255, 255),
+        thickness,
+        cv2.LINE_AA,
+    )
+
+
+def build_mosaic(
+    frames: list[np.ndarray],
+    columns: Optional[int] = None,
+    cell_size: tuple[int, int] = DEFAULT_CELL_SIZE,
+) -> np.ndarray:
+    """Tile BGR frames into a labelled grid.
+
+    Args:
+        frames: Frames in chronological order
+        columns: Fixed number of columns (near-square grid if None)
+        cell_size: (width, height) every frame is resized to
+
+    Returns:
+        The grid image as a BGR array
+    """
+    if not frames:
+        raise ValueError("Cannot build a mosaic from zero frames")
+
+    cell_w, cell_h = cell_size
+    rows, cols = grid_shape(len(frames), columns)
+    mosaic = np.zeros((rows * cell_h, cols * cell_w, 3), dtype=np.uint8)
+
+    for i, frame in enumerate(frames):
+        row, col = divmod(i, cols)
+        cell = cv2.resize(frame, (cell_w, cell_h), interpolation=cv2.INTER_AREA)
+        _label_cell(cell, f"Frame {i + 1}")
+        mosaic[row * cell_h : (row + 1) * cell_h, col * cell_w : (col + 1) * cell_w] = (
+            cell
+        )
+
+    return mosaic
+
+
+def mosaic_prompt(prompt: str) -> str:
+    """Prefix ``prompt`` with instructions for reading a frame grid."""
+    return MOSAIC_PROMPT_PREFIX + prompt
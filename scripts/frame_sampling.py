@@ -0,0 +1,97 @@
+"""Single-pass frame sampling for video files.
+
+Walks an open ``cv2.VideoCapture`` forward once, using ``grab()`` to skip
+frames cheaply and ``retrieve()`` to decode only the frames that are kept.
+Seeking is used only when the gap to the next target is larger than the
+measured cost of a seek (expressed in grabbed frames), which approximates the
+keyframe interval of the stream.
+"""
+
+from __future__ import annotations
+
+import time
+from typing import Iterable, Iterator
+
+import cv2
+import numpy as np
+
+# Gaps shorter than this are always grabbed through; measuring a seek is only
+# worth it once the clip is long enough for seeking to possibly pay off.
+MIN_SEEK_GAP = 48
+
+# Number of grab() timings used before the per-frame cost is trusted.
+MIN_GRAB_SAMPLES = 4
+
+
+def uniform_frame_indices(total_frames: int, num_frames: int) -> list[int]:
+    """Return ``num_frames`` evenly spaced, unique frame indices."""
+    if total_frames <= 0 or num_frames <= 0:
+        return []
+    indices = np.linspace(0, total_frames - 1, num_frames, dtype=int)
+    return sorted(set(int(i) for i in indices))
+
+
+def iter_sampled_frames(
+    cap: cv2.VideoCapture, frame_indices: Iterable[int]
+) -> Iterator[tuple[int, np.ndarray]]:
+    """Yield ``(frame_index, bgr_frame)`` for each requested index, in order.
+
+    The capture is expected to be freshly opened (positioned at frame 0).
+    Indices are deduplicated and visited in ascending order. A first target
+    far from the start is reached with a single seek, so sampling a window
+    late in a long video does not decode everything before it. Iteration
+    stops early if the stream ends before a target is reached.
+
+    Args:
+        cap: Open video capture
+        frame_indices: Frame indices to decode
+
+    Yields:
+        Tuples of the frame index and the decoded BGR frame
+    """
+    targets = sorted(set(int(i) for i in frame_indices if i >= 0))
+
+    position = 0
+    grab_time = 0.0
+    grab_count = 0
+    # Break-even gap (in frames) above which seeking beats grabbing through.
+    seek_threshold: float | None = None
+
+    for target in targets:
+        gap = target - position
+
+        should_seek = gap >= MIN_SEEK_GAP and (
+            seek_threshold is None or gap > seek_threshold
+        )
+        # Nothing is known about grab cost yet, so a leading jump is not timed
+        leading_jump = position == 0 and grab_count == 0
+        if should_seek and (grab_count >= MIN_GRAB_SAMPLES or leading_jump):
+            started = time.perf_counter()
+            cap.set(cv2.CAP_PROP_POS_FRAMES, target)
+            grabbed = cap.grab()
+            seek_time = time.perf_counter() - started
+
+            if seek_threshold is None and not leading_jump:
+                per_grab = grab_time / grab_count
+                seek_threshold = max(seek_time / per_grab, float(MIN_SEEK_GAP))
+        else:
+            grabbed = True
+            while grabbed and position < target:
+                started = time.perf_counter()
+                grabbed = cap.grab()
+                grab_time += time.perf_counter() - started
+                grab_count += 1
+                position += 1
+            if grabbed:
+                started = time.perf_counter()
+                grabbed = cap.grab()
+                grab_time += time.perf_counter() - started
+                grab_count += 1
+
+        if not grabbed:
+            return
+
+        position = target + 1
+        ok, frame = cap.retrieve()
+        if ok and frame is not None:
+            yield target, frame
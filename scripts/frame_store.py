@@ -0,0 +1,130 @@
+"""Persistent store of sampled, downscaled frames.
+
+Each entry is one ``.npy`` array of shape (N, H, W, 3) plus a small JSON
+sidecar with the source video and frame indices. Arrays are loaded with
+``mmap_mode="r"``, so prompt experiments reuse frames without touching the
+decoder or copying pixel data. Entries are evicted least-recently-used once
+the store exceeds ``max_bytes``.
+
+Every entry is self-contained (no shared index file), which keeps the store
+safe to use from the decode worker processes of the batch runner.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Optional
+
+import numpy as np
+
+from scripts.result_cache import sha256_text
+
+
+@dataclass(frozen=True, slots=True)
+class StoredFrames:
+    """Frames loaded from the store."""
+
+    frame_indices: list[int]
+    frames: np.ndarray
+
+
+@dataclass(frozen=True, slots=True)
+class FrameStore:
+    """Size-bounded on-disk store of decoded frames."""
+
+    root: Path
+    max_bytes: int
+
+    def key_for(self, video_path: Path, params: dict[str, Any]) -> str:
+        """Entry key from the video's path, size and mtime plus ``params``."""
+        stat = video_path.stat()
+        material = {
+            "video": str(video_path.resolve()),
+            "size": stat.st_size,
+            "mtime_ns": stat.st_mtime_ns,
+            **params,
+        }
+        return sha256_text(json.dumps(material, sort_keys=True, default=str))
+
+    def _array_path(self, key: str) -> Path:
+        return self.root / f"{key}.npy"
+
+    def _meta_path(self, key: str) -> Path:
+        return self.root / f"{key}.json"
+
+    def load(self, key: str) -> Optional[StoredFrames]:
+        """Memory-map the frames for ``key``, or return None on a miss."""
+        array_path, meta_path = self._array_path(key), self._meta_path(key)
+        try:
+            meta = json.loads(meta_path.read_text(encoding="utf-8"))
+            frames = np.load(array_path, mmap_mode="r")
+        except (OSError, ValueError):
+            return None
+
+        # Access time drives LRU eviction
+        os.utime(meta_path)
+        return StoredFrames(frame_indices=meta["frame_indices"], frames=frames)
+
+    def save(
+        self,
+        key: str,
+        video_path: Path,
+        frame_indices: list[int],
+        frames: list[np.ndarray],
+    ) -> None:
+        """Store frames for ``key`` and evict old entries if over budget."""
+        if not frames:
+            return
+
+        self.root.mkdir(parents=True, exist_ok=True)
+        array = np.ascontiguousarray(np.stack(frames))
+        array_path = self._array_path(key)
+
+        tmp_array = array_path.with_suffix(".tmp.npy")
+        np.save(tmp_array, array)
+        os.replace(tmp_array, array_path)
+
+        meta = {
+            "video": video_path.name,
+            "frame_indices": frame_indices,
+            "shape": list(array.shape),
+            "bytes": array_path.stat().st_size,
+            "created": time.time(),
+        }
+        meta_path = self._meta_path(key)
+        tmp_meta = meta_path.with_suffix(".tmp")
+        tmp_meta.write_text(json.dumps(meta), encoding="utf-8")
+        os.replace(tmp_meta, meta_path)
+
+        self.evict()
+
+    def evict(self) -> int:
+        """Remove least-recently-used entries until under ``max_bytes``.
+
+        Returns:
+            Number of entries removed
+        """
+        entries = []
+        for meta_path in self.root.glob("*.json"):
+            array_path = meta_path.with_suffix(".npy")
+            try:
+                size = array_path.stat().st_size
+                accessed = meta_path.stat().st_mtime
+            except OSError:
+                continue
+            entries.append((accessed, size, meta_path, array_path))
+
+        total = sum(size for _, size, _, _ in entries)
+        removed = 0
+        for _, size, meta_path, array_path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            meta_path.unlink(missing_ok=True)
+            array_path.unlink(missing_ok=True)
+            total -= size
+            removed += 1
+        return removed
@@ -0,0 +1,105 @@
+"""Guards against runaway video analysis generations.
+
+Vision models occasionally fall into a repetition loop (e.g. the same table
+row emitted thousands of times) and keep going until ``max_tokens``. Output is
+capped with a ``max_tokens`` budget that scales with the number of frames and
+is enforced by the provider, whose reported usage tells whether a response
+hit it. A streamed response is watched for repeated n-gram windows so it can
+be aborted early.
+"""
+
+from __future__ import annotations
+
+import re
+from collections import Counter, deque
+from dataclasses import dataclass, field
+
+# Rough characters-per-token ratio, only good enough for sizing batches;
+# output budgets are judged by the provider's token counts instead
+CHARS_PER_TOKEN = 4
+
+NGRAM_SIZE = 8
+WINDOW_WORDS = 300
+REPEAT_RATIO = 0.8
+
+_WORD_RE = re.compile(r"\S+")
+
+
+class RunawayGenerationError(RuntimeError):
+    """Raised when an analysis was cut short by the generation guard.
+
+    The partial output has already been written next to the analysis file
+    with a ``.truncated`` suffix; the video is left uncached so that the next
+    run retries it.
+    """
+
+    def __init__(self, reason: str) -> None:
+        super().__init__(f"Generation truncated: {reason}")
+        self.reason = reason
+
+
+def output_token_budget(
+    frame_count: int, base: int, per_frame: int, cap: int
+) -> int:
+    """Output tokens allowed for an analysis of ``frame_count`` frames."""
+    return min(cap, base + per_frame * max(1, frame_count))
+
+
+@dataclass(slots=True)
+class RepetitionDetector:
+    """Incremental detector of degenerate repetition in generated text.
+
+    Keeps the last ``window`` word n-grams and the number of them that already
+    occurred earlier in the window. When that share exceeds ``ratio`` the text
+    is looping.
+    """
+
+    ngram_size: int = NGRAM_SIZE
+    window: int = WINDOW_WORDS
+    ratio: float = REPEAT_RATIO
+    _words: deque[str] = field(default_factory=deque)
+    _ngrams: deque[tuple[str, ...]] = field(default_factory=deque)
+    _counts: Counter[tuple[str, ...]] = field(default_factory=Counter)
+    _repeated: int = 0
+    _tail: str = ""
+
+    def feed(self, text: str) -> bool:
+        """Consume a chunk of text; return True once repetition is detected."""
+        # A word may be split across chunks, so hold back the trailing token
+        text = self._tail + text
+        words = _WORD_RE.findall(text)
+        if words and not text[-1].isspace():
+            self._tail = words.pop()
+        else:
+            self._tail = ""
+
+        looping = False
+        for word in words:
+            self._words.append(word)
+            if len(self._words) > self.ngram_size:
+                self._words.popleft()
+            if len(self._words) == self.ngram_size:
+                self._push(tuple(self._words))
+                looping = looping or self.is_looping
+        return looping
+
+    def _push(self, ngram: tuple[str, ...]) -> None:
+        if self._counts[ngram]:
+            self._repeated += 1
+        self._counts[ngram] += 1
+        self._ngrams.append(ngram)
+
+        if len(self._ngrams) > self.window:
+            old = self._ngrams.popleft()
+            self._counts[old] -= 1
+            if self._counts[old]:
+                self._repeated -= 1
+            else:
+                del self._counts[old]
+
+    @property
+    def is_looping(self) -> bool:
+        return (
+            len(self._ngrams) >= self.window
+            and self._repeated / len(self._ngrams) > self.ratio
+        )
@@ -0,0 +1,189 @@
+"""Content-aware keyframe selection.
+
+Samples a clip at a low analysis rate into small thumbnails, computes colour
+histogram and frame-difference signals with vectorised NumPy, and turns them
+into shot boundaries and motion peaks. The number of frames picked per video
+follows the amount of visual change, bounded by ``min_frames``/``max_frames``.
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass
+from enum import Enum
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+from scripts.frame_sampling import iter_sampled_frames
+
+ANALYSIS_FPS = 4.0
+ANALYSIS_SIZE = (64, 36)
+HIST_BINS = 4
+
+# Half L1 distance between consecutive colour histograms (0..1) above which a
+# transition is treated as a cut.
+SHOT_THRESHOLD = 0.4
+# Mean absolute grey-level difference (0..1) a motion peak must exceed.
+MOTION_THRESHOLD = 0.02
+# Average motion that earns one extra frame on top of one frame per shot.
+MOTION_PER_FRAME = 0.02
+
+
+class FrameStrategy(str, Enum):
+    """How frames are chosen from a video before analysis."""
+
+    UNIFORM = "uniform"
+    KEYFRAMES = "keyframes"
+
+
+@dataclass(frozen=True, slots=True)
+class KeyframeSelection:
+    """Frames picked for a video together with the signals behind them."""
+
+    frame_indices: list[int]
+    shot_count: int
+    motion_peak_count: int
+
+
+def sample_thumbnails(
+    video_path: Path, analysis_fps: float = ANALYSIS_FPS
+) -> tuple[np.ndarray, np.ndarray]:
+    """Decode a clip at ``analysis_fps`` into downscaled BGR thumbnails.
+
+    Returns:
+        Tuple of (frame indices, thumbnails with shape (N, H, W, 3))
+    """
+    cap = cv2.VideoCapture(str(video_path))
+    try:
+        total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        fps = cap.get(cv2.CAP_PROP_FPS) or 25.0
+        stride = max(1, int(round(fps / analysis_fps)))
+
+        indices: list[int] = []
+        thumbnails: list[np.ndarray] = []
+        for idx, frame in iter_sampled_frames(cap, range(0, total_frames, stride)):
+            indices.append(idx)
+            thumbnails.append(
+                cv2.resize(frame, ANALYSIS_SIZE, interpolation=cv2.INTER_AREA)
+            )
+    finally:
+        cap.release()
+
+    if not thumbnails:
+        width, height = ANALYSIS_SIZE
+        return np.empty(0, dtype=int), np.empty((0, height, width, 3), np.uint8)
+    return np.asarray(indices), np.stack(thumbnails)
+
+
+def colour_histograms(thumbnails: np.ndarray, bins: int = HIST_BINS) -> np.ndarray:
+    """Normalised joint colour histograms, one row per thumbnail."""
+    count = len(thumbnails)
+    quantised = (thumbnails.astype(np.uint16) * bins) >> 8
+    codes = (quantised[..., 0] * bins + quantised[..., 1]) * bins + quantised[..., 2]
+    offsets = np.arange(count)[:, None] * bins**3
+    flat = (codes.reshape(count, -1) + offsets).ravel()
+    hist = np.bincount(flat, minlength=count * bins**3).reshape(count, bins**3)
+    return hist / hist.sum(axis=1, keepdims=True)
+
+
+def change_signals(thumbnails: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """Per-transition histogram distance and mean grey-level difference.
+
+    Both arrays have ``len(thumbnails) - 1`` entries scaled to 0..1; entry
+    ``i`` describes the change from thumbnail ``i`` to ``i + 1``.
+    """
+    hists = colour_histograms(thumbnails)
+    hist_delta = 0.5 * np.abs(np.diff(hists, axis=0)).sum(axis=1)
+
+    grey = thumbnails.astype(np.float32).mean(axis=3)
+    motion = np.abs(np.diff(grey, axis=0)).mean(axis=(1, 2)) / 255.0
+    return hist_delta, motion
+
+
+def _motion_peaks(motion: np.ndarray, threshold: float) -> np.ndarray:
+    """Indices of local maxima in ``motion`` above ``threshold``."""
+    if motion.size == 0:
+        return np.empty(0, dtype=int)
+    padded = np.concatenate(([-np.inf], motion, [-np.inf]))
+    is_peak = (motion > padded[:-2]) & (motion >= padded[2:]) & (motion > threshold)
+    return np.flatnonzero(is_peak)
+
+
+def _spread_fill(chosen: list[int], count: int, budget: int) -> list[int]:
+    """Add samples farthest from the already chosen ones until ``budget``."""
+    positions = np.arange(count)
+    chosen = list(chosen)
+    while len(chosen) < min(budget, count):
+        if chosen:
+            distance = np.abs(positions[:, None] - np.asarray(chosen)[None, :])
+            nearest = distance.min(axis=1)
+        else:
+            nearest = np.minimum(positions, count - 1 - positions)
+        chosen.append(int(np.argmax(nearest)))
+    return chosen
+
+
+def select_keyframes(
+    video_path: Path,
+    min_frames: int,
+    max_frames: int,
+    shot_threshold: float = SHOT_THRESHOLD,
+    motion_threshold: float = MOTION_THRESHOLD,
+) -> KeyframeSelection:
+    """Pick a content-dependent set of frame indices for ``video_path``.
+
+    One frame is kept from the middle of every shot, followed by the
+    strongest motion peaks. The frame budget grows with average motion and is
+    clamped to ``[min_frames, max_frames]``; static clips get ``min_frames``
+    spread across the clip.
+
+    Args:
+        video_path: Path to the video file
+        min_frames: Lower bound of frames to select
+        max_frames: Upper bound of frames to select
+        shot_threshold: Histogram distance that marks a cut
+        motion_threshold: Minimal frame difference for a motion peak
+
+    Returns:
+        KeyframeSelection with frame indices in ascending order
+    """
+    sample_indices, thumbnails = sample_thumbnails(video_path)
+    count = len(sample_indices)
+    if count == 0:
+        return KeyframeSelection(frame_indices=[], shot_count=0, motion_peak_count=0)
+
+    hist_delta, motion = change_signals(thumbnails)
+
+    # Shots are runs of samples between cuts
+    cuts = np.flatnonzero(hist_delta > shot_threshold) + 1
+    bounds = np.concatenate(([0], cuts, [count]))
+    starts, ends = bounds[:-1], bounds[1:]
+    shot_order = np.argsort(-(ends - starts), kind="stable")
+    shot_reps = [int((starts[i] + ends[i] - 1) // 2) for i in shot_order]
+
+    # Motion peaks inside shots; a cut is not motion
+    within_shot = hist_delta <= shot_threshold
+    peaks = _motion_peaks(np.where(within_shot, motion, 0.0), motion_threshold)
+    peak_order = peaks[np.argsort(-motion[peaks], kind="stable")]
+    peak_samples = [int(p) + 1 for p in peak_order]
+
+    activity = float(motion[within_shot].mean()) if within_shot.any() else 0.0
+    budget = len(shot_reps) + int(np.ceil(activity / MOTION_PER_FRAME))
+    budget = max(min_frames, min(max_frames, budget))
+
+    # Keep picks apart so peaks of one movement do not crowd out the rest
+    min_gap = max(1, count // (2 * budget))
+    chosen: list[int] = []
+    for sample in shot_reps + peak_samples:
+        if len(chosen) >= budget:
+            break
+        if all(abs(sample - other) >= min_gap for other in chosen):
+            chosen.append(sample)
+    chosen = _spread_fill(chosen, count, budget)
+
+    return KeyframeSelection(
+        frame_indices=sorted(int(sample_indices[s]) for s in chosen),
+        shot_count=len(shot_reps),
+        motion_peak_count=len(peak_samples),
+    )
@@ -0,0 +1,269 @@
+"""BM25 index over video metadata records, for shortlisting match candidates.
+
+Each record's ``summary_text``, tags and themes form one document. Postings
+are kept as three parallel NumPy arrays (term id, document id, term
+frequency) sorted by term, i.e. a CSR matrix with terms as rows, so scoring
+a query touches only the postings of its terms. Added or removed documents
+mark the index dirty; the arrays are re-sorted once, on the next search or
+save, without re-tokenising the documents already indexed.
+
+The index is persisted as ``postings.npz`` plus ``documents.json`` and is
+brought up to date against a ``MetaStore`` by comparing record digests.
+"""
+
+from __future__ import annotations
+
+import heapq
+import json
+import math
+import os
+import re
+from collections import Counter
+from pathlib import Path
+from typing import Any, Collection, Optional
+
+import numpy as np
+
+from scripts.meta_store import MetaStore
+
+K1 = 1.2
+B = 0.75
+# Above this many changed records, sync decodes the whole store at once
+BULK_SYNC_RECORDS = 256
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+_STOPWORDS = frozenset(
+    "a an and are as at be by for from has have in is it its of on or that the "
+    "their there this to was were which while with".split()
+)
+
+
+def tokenize(text: str) -> list[str]:
+    """Lowercased word tokens without stopwords, plural "s" stripped."""
+    tokens = []
+    for token in _TOKEN_RE.findall(text.lower()):
+        if token in _STOPWORDS:
+            continue
+        if len(token) > 3 and token.endswith("s") and not token.endswith("ss"):
+            token = token[:-1]
+        tokens.append(token)
+    return tokens
+
+
+def document_text(record: dict[str, Any]) -> str:
+    """Text indexed for a metadata record: summary, tags and themes."""
+    tags = [
+        tag.replace("_", " ").replace("-", " ")
+        for name in ("themes", "actions", "semantic_tags", "currencies")
+        for tag in record.get(name) or []
+    ]
+    return " ".join([record.get("summary_text") or "", *tags])
+
+
+class LexicalIndex:
+    """BM25 index of documents keyed by video filename."""
+
+    def __init__(self) -> None:
+        self.vocab: dict[str, int] = {}
+        self.filenames: list[str] = []
+        self.digests: list[str] = []
+        self._live: list[bool] = []
+        self._rows: dict[str, int] = {}
+        self._lengths: list[int] = []
+        # Postings sorted by term, plus batches added since the last sort
+        self._terms = np.zeros(0, dtype=np.int32)
+        self._docs = np.zeros(0, dtype=np.int32)
+        self._tfs = np.zeros(0, dtype=np.float32)
+        self._offsets = np.zeros(1, dtype=np.int64)
+        self._added: list[tuple[np.ndarray, np.ndarray, np.ndarray]] = []
+        self._dirty = False
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    def __contains__(self, filename: object) -> bool:
+        return filename in self._rows
+
+    def digest(self, filename: str) -> Optional[str]:
+        row = self._rows.get(filename)
+        return None if row is None else self.digests[row]
+
+    def add(self, filename: str, text: str, digest: str = "") -> None:
+        """Index ``text`` under ``filename``, replacing any earlier document."""
+        self.remove(filename)
+        counts = Counter(tokenize(text))
+        row = len(self.filenames)
+        self.filenames.append(filename)
+        self.digests.append(digest)
+        self._live.append(True)
+        self._lengths.append(sum(counts.values()))
+        self._rows[filename] = row
+
+        term_ids = [self.vocab.setdefault(term, len(self.vocab)) for term in counts]
+        self._added.append(
+            (
+                np.asarray(term_ids, dtype=np.int32),
+                np.full(len(term_ids), row, dtype=np.int32),
+                np.asarray(list(counts.values()), dtype=np.float32),
+            )
+        )
+        self._dirty = True
+
+    def remove(self, filename: str) -> bool:
+        row = self._rows.pop(filename, None)
+        if row is None:
+            return False
+        self._live[row] = False
+        self._dirty = True
+        return True
+
+    def _rebuild(self) -> None:
+        """Sort pending postings in and drop removed documents."""
+        if not self._dirty:
+            return
+        terms = np.concatenate([self._terms, *(t for t, _, _ in self._added)])
+        docs = np.concatenate([self._docs, *(d for _, d, _ in self._added)])
+        tfs = np.concatenate([self._tfs, *(f for _, _, f in self._added)])
+
+        # Renumber documents so only live ones remain
+        live = np.asarray(self._live, dtype=bool)
+        new_ids = np.cumsum(live, dtype=np.int64) - 1
+        keep = live[docs]
+        terms, docs, tfs = terms[keep], new_ids[docs[keep]].astype(np.int32), tfs[keep]
+        rows = np.flatnonzero(live)
+        self.filenames = [self.filenames[i] for i in rows]
+        self.digests = [self.digests[i] for i in rows]
+        self._lengths = [self._lengths[i] for i in rows]
+        self._live = [True] * len(rows)
+        self._rows = {name: row for row, name in enumerate(self.filenames)}
+
+        order = np.argsort(terms, kind="stable")
+        self._terms, self._docs, self._tfs = terms[order], docs[order], tfs[order]
+        self._offsets = np.zeros(len(self.vocab) + 1, dtype=np.int64)
+        np.cumsum(
+            np.bincount(self._terms, minlength=len(self.vocab)),
+            out=self._offsets[1:],
+        )
+        self._added = []
+        self._dirty = False
+
+    def search(
+        self, text: str, top_k: int, only: Optional[Collection[str]] = None
+    ) -> list[tuple[str, float]]:
+        """The ``top_k`` best documents for ``text`` with their BM25 scores.
+
+        Documents sharing no term with ``text`` are never returned, nor are
+        documents outside ``only`` when it is given.
+        """
+        self._rebuild()
+        term_ids = {self.vocab[t] for t in tokenize(text) if t in self.vocab}
+        if not term_ids or not self.filenames:
+            return []
+
+        lengths = np.asarray(self._lengths, dtype=np.float32)
+        length_norm = K1 * (1 - B + B * lengths / max(lengths.mean(), 1.0))
+        scores = np.zeros(len(self.filenames), dtype=np.float32)
+        for term_id in term_ids:
+            start, end = self._offsets[term_id], self._offsets[term_id + 1]
+            if start == end:
+                continue
+            docs, tfs = self._docs[start:end], self._tfs[start:end]
+            df = end - start
+            idf = math.log(1 + (len(self.filenames) - df + 0.5) / (df + 0.5))
+            scores[docs] += idf * tfs * (K1 + 1) / (tfs + length_norm[docs])
+        if only is not None:
+            allowed = np.zeros(len(scores), dtype=bool)
+            allowed[[self._rows[name] for name in only if name in self._rows]] = True
+            scores[~allowed] = 0
+
+        k = min(top_k, int(np.count_nonzero(scores)))
+        if k <= 0:
+            return []
+        # Ties at the cut-off are broken by filename, so the shortlist of a
+        # text only changes when scores do (cached matches depend on it)
+        cutoff = np.partition(scores, len(scores) - k)[len(scores) - k]
+        above = np.flatnonzero(scores > cutoff)
+        above = above[np.argsort(-scores[above], kind="stable")].tolist()
+        tied = heapq.nsmallest(
+            k - len(above),
+            np.flatnonzero(scores == cutoff).tolist(),
+            key=self.filenames.__getitem__,
+        )
+        top = above + tied
+        return [(self.filenames[i], float(scores[i])) for i in top]
+
+    def sync(self, store: MetaStore) -> int:
+        """Re-index records of ``store`` that are new or changed, drop the rest.
+
+        Returns:
+            Number of documents added, replaced or removed
+        """
+        digests = store.digests()
+        removed = [name for name in self._rows if name not in digests]
+        for filename in removed:
+            self.remove(filename)
+
+        changed = [
+            name for name, digest in digests.items() if self.digest(name) != digest
+        ]
+        if len(changed) > BULK_SYNC_RECORDS:
+            records = {r["filename"]: r for r in store.records()}
+            get = records.get
+        else:
+            get = store.get
+        for filename in changed:
+            record = get(filename)
+            if record is not None:
+                self.add(filename, document_text(record), digests[filename])
+        return len(removed) + len(changed)
+
+    def save(self, root: Path) -> None:
+        self._rebuild()
+        root.mkdir(parents=True, exist_ok=True)
+        tmp_postings = root / "postings.tmp.npz"
+        np.savez(
+            tmp_postings,
+            terms=self._terms,
+            docs=self._docs,
+            tfs=self._tfs,
+            lengths=np.asarray(self._lengths, dtype=np.int32),
+        )
+        tmp_documents = root / "documents.json.tmp"
+        tmp_documents.write_text(
+            json.dumps(
+                {
+                    "vocab": list(self.vocab),
+                    "filenames": self.filenames,
+                    "digests": self.digests,
+                }
+            ),
+            encoding="utf-8",
+        )
+        os.replace(tmp_postings, root / "postings.npz")
+        os.replace(tmp_documents, root / "documents.json")
+
+    @classmethod
+    def load(cls, root: Path) -> "LexicalIndex":
+        """Load the index saved at ``root``; a missing index loads empty."""
+        index = cls()
+        try:
+            documents = json.loads((root / "documents.json").read_text(encoding="utf-8"))
+            postings = np.load(root / "postings.npz")
+        except (OSError, ValueError):
+            return index
+
+        index.vocab = {term: i for i, term in enumerate(documents["vocab"])}
+        index.filenames = documents["filenames"]
+        index.digests = documents["digests"]
+        index._live = [True] * len(index.filenames)
+        index._rows = {name: row for row, name in enumerate(index.filenames)}
+        index._lengths = postings["lengths"].tolist()
+        index._terms = postings["terms"]
+        index._docs = postings["docs"]
+        index._tfs = postings["tfs"]
+        index._offsets = np.zeros(len(index.vocab) + 1, dtype=np.int64)
+        np.cumsum(
+            np.bincount(index._terms, minlength=len(index.vocab)),
+            out=index._offsets[1:],
+        )
+        return index
@@ -0,0 +1,147 @@
+"""Persistent cache of transcript matches.
+
+An entry is keyed by the normalised transcript, the model and the shortlist
+settings, and records the catalogue version it was last valid for plus the
+candidates (filename and record digest) that were sent to the model. While
+the catalogue is unchanged a lookup is a hash and a dict access. After the
+catalogue changed, an entry is only re-run if its candidate set differs:
+the caller recomputes the shortlist and the entry is revalidated when the
+same records come back.
+
+Entries are evicted least recently used beyond ``MAX_ENTRIES`` and expire
+``TTL_SECONDS`` after they were matched. The cache is one JSON file written
+by ``flush``.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import re
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Optional
+
+from scripts.result_cache import sha256_text
+
+MAX_ENTRIES = 10_000
+TTL_SECONDS = 30 * 24 * 3600
+
+_WHITESPACE_RE = re.compile(r"\s+")
+
+
+def normalise_transcript(transcript: str) -> str:
+    """Casefolded transcript with Unicode and whitespace normalised."""
+    text = unicodedata.normalize("NFKC", transcript).casefold()
+    return _WHITESPACE_RE.sub(" ", text).strip()
+
+
+class MatchCache:
+    """LRU cache of match results with a time to live, safe across threads."""
+
+    def __init__(
+        self,
+        root: Path,
+        max_entries: int = MAX_ENTRIES,
+        ttl_seconds: float = TTL_SECONDS,
+    ) -> None:
+        self.root = root
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries: OrderedDict[str, dict[str, Any]] = OrderedDict()
+        self._lock = threading.Lock()
+        self._dirty = False
+        try:
+            stored = json.loads(self._path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            stored = {}
+        # Stored least recently used first
+        self._entries.update(stored)
+
+    @property
+    def _path(self) -> Path:
+        return self.root / "matches.json"
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @staticmethod
+    def key_for(transcript: str, model: str, **params: Any) -> str:
+        material = {"transcript": normalise_transcript(transcript), "model": model}
+        return sha256_text(json.dumps({**material, **params}, sort_keys=True))
+
+    def _live(self, key: str) -> Optional[dict[str, Any]]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if time.time() - entry["created"] > self.ttl_seconds:
+            del self._entries[key]
+            self._dirty = True
+            return None
+        self._entries.move_to_end(key)
+        self._dirty = True
+        return entry
+
+    def get(self, key: str, version: str) -> Optional[list[dict[str, Any]]]:
+        """Matches cached for ``key`` if the catalogue is still at ``version``."""
+        with self._lock:
+            entry = self._live(key)
+            if entry is None or entry["version"] != version:
+                return None
+            return entry["matches"]
+
+    def revalidate(
+        self, key: str, version: str, candidates: dict[str, str]
+    ) -> Optional[list[dict[str, Any]]]:
+        """Matches cached for ``key`` if they were made from ``candidates``.
+
+        A hit moves the entry to ``version``; a stale entry is dropped.
+        """
+        with self._lock:
+            entry = self._live(key)
+            if entry is None:
+                return None
+            if entry["candidates"] != candidates:
+                del self._entries[key]
+                return None
+            entry["version"] = version
+            return entry["matches"]
+
+    def put(
+        self,
+        key: str,
+        version: str,
+        candidates: dict[str, str],
+        matches: list[dict[str, Any]],
+    ) -> None:
+        with self._lock:
+            self._entries[key] = {
+                "created": time.time(),
+                "version": version,
+                "candidates": candidates,
+                "matches": matches,
+            }
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+            self._dirty = True
+
+    def flush(self) -> None:
+        """Persist the cache if it changed since it was loaded or flushed."""
+        with self._lock:
+            if not self._dirty:
+                return
+            now = time.time()
+            entries = {
+                key: entry
+                for key, entry in self._entries.items()
+                if now - entry["created"] <= self.ttl_seconds
+            }
+            self.root.mkdir(parents=True, exist_ok=True)
+            tmp_path = self._path.with_suffix(".json.tmp")
+            tmp_path.write_text(json.dumps(entries), encoding="utf-8")
+            os.replace(tmp_path, self._path)
+            self._dirty = False
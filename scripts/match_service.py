@@ -0,0 +1,258 @@
+"""Local HTTP service answering match requests from a warm process.
+
+The service loads the metadata store, the BM25 and tag indexes and one LLM
+client (whose HTTP connections are reused) once, then serves requests on a
+thread each, so a request costs only retrieval plus the LLM call. Results
+go through the persistent match cache (``scripts.match_cache``).
+
+A watcher thread polls the store directory. When a metadata run changed
+it, the store is reopened, the BM25 index is synced with the changed
+records only, the tag index is rebuilt, and the new catalogue replaces the
+old one for later requests; requests in flight finish on the catalogue
+they started with.
+
+Endpoints:
+    POST /match   {"transcript": "...", "tag_query": "theme=crisis"}  (tag_query optional)
+    GET  /health
+
+``/match`` answers 400 for an invalid request or tag query, 502 when the LLM
+call failed and 500 for any other error, so an empty ``matches`` list with
+200 always means nothing matched.
+
+Usage:
+    python -m scripts.match_service [port]
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import sys
+import threading
+from dataclasses import dataclass
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Any, Optional
+
+from dotenv import load_dotenv
+
+from scripts.lexical_index import LexicalIndex
+from scripts.match_cache import MatchCache
+from scripts.match_videos import load_lexical_index, match_transcript
+from scripts.meta_store import MetaStore, open_store
+from scripts.paths import JSON_DIR, LEXICAL_INDEX_DIR, MATCH_CACHE_DIR, META_STORE_DIR
+from scripts.tag_index import TagIndex, TagQueryError
+from src.llm import LLMCallError
+from src.llm.client import LLMClient
+
+HOST = "127.0.0.1"
+PORT = 8765
+RELOAD_INTERVAL_SECONDS = 2.0
+# LLM calls in flight at once; further requests wait their turn
+MAX_CONCURRENT_CALLS = 8
+MAX_BODY_BYTES = 1 << 20
+
+
+def store_signature(root: Path) -> frozenset[tuple[str, int, int]]:
+    """Name, mtime and size of the store's files; changes with any write."""
+    try:
+        with os.scandir(root) as entries:
+            return frozenset(
+                (entry.name, entry.stat().st_mtime_ns, entry.stat().st_size)
+                for entry in entries
+                if entry.is_file()
+            )
+    except FileNotFoundError:
+        return frozenset()
+
+
+@dataclass(frozen=True, slots=True)
+class Catalogue:
+    """One consistent version of the store with indexes built for it."""
+
+    store: MetaStore
+    lexical_index: LexicalIndex
+    tag_index: TagIndex
+    signature: frozenset[tuple[str, int, int]]
+
+
+@dataclass(frozen=True, slots=True)
+class _BoundedClient:
+    """``LLMClient`` letting at most ``MAX_CONCURRENT_CALLS`` calls through."""
+
+    client: LLMClient
+    calls: threading.BoundedSemaphore
+
+    @property
+    def config(self) -> Any:
+        return self.client.config
+
+    def invoke(self, **kwargs: Any) -> Any:
+        with self.calls:
+            return self.client.invoke(**kwargs)
+
+
+class MatchService:
+    """Warm catalogue, cache and LLM client shared by all request threads."""
+
+    def __init__(
+        self,
+        llm_client: LLMClient,
+        store_dir: Path = META_STORE_DIR,
+        index_dir: Path = LEXICAL_INDEX_DIR,
+        cache_dir: Path = MATCH_CACHE_DIR,
+    ) -> None:
+        # Cache hits never wait for a free LLM call
+        self.llm_client = _BoundedClient(
+            llm_client, threading.BoundedSemaphore(MAX_CONCURRENT_CALLS)
+        )
+        self.store_dir = store_dir
+        self.index_dir = index_dir
+        self.cache = MatchCache(cache_dir)
+        self.catalogue = self._load(open_store(store_dir, JSON_DIR))
+        self._stopped = threading.Event()
+
+    def _load(
+        self, store: MetaStore, lexical_index: Optional[LexicalIndex] = None
+    ) -> Catalogue:
+        signature = store_signature(self.store_dir)
+        if lexical_index is None:
+            lexical_index = load_lexical_index(store, self.index_dir)
+        elif lexical_index.sync(store):
+            lexical_index.save(self.index_dir)
+        return Catalogue(store, lexical_index, TagIndex.from_store(store), signature)
+
+    def reload_if_changed(self) -> bool:
+        """Swap in a new catalogue if the store changed on disk."""
+        if store_signature(self.store_dir) == self.catalogue.signature:
+            return False
+        # The live index is being searched, so sync a fresh copy of it
+        index = LexicalIndex.load(self.index_dir)
+        self.catalogue = self._load(MetaStore(self.store_dir), index)
+        print(f"Reloaded catalogue: {len(self.catalogue.store)} videos")
+        return True
+
+    def watch(self) -> None:
+        """Reload changed metadata and persist the cache until stopped."""
+        while not self._stopped.wait(RELOAD_INTERVAL_SECONDS):
+            try:
+                self.reload_if_changed()
+            except Exception as e:
+                # Most likely a metadata run writing right now; retry next poll
+                print(f"Reload failed: {e!r}")
+            self.cache.flush()
+
+    def stop(self) -> None:
+        self._stopped.set()
+        self.cache.flush()
+
+    def match(self, transcript: str, tag_query: Optional[str]) -> dict[str, Any]:
+        catalogue = self.catalogue
+        matches = match_transcript(
+            transcript,
+            catalogue.store,
+            self.llm_client,
+            self.cache,
+            tag_query,
+            lexical_index=catalogue.lexical_index,
+            tag_index=catalogue.tag_index,
+        )
+        return {
+            "matches": [m.model_dump() for m in matches],
+            "catalogue": catalogue.store.version(),
+        }
+
+    def health(self) -> dict[str, Any]:
+        catalogue = self.catalogue
+        return {
+            "videos": len(catalogue.store),
+            "catalogue": catalogue.store.version(),
+            "cached_matches": len(self.cache),
+        }
+
+
+class _Handler(BaseHTTPRequestHandler):
+    service: MatchService
+
+    def _reply(self, status: HTTPStatus, body: dict[str, Any]) -> None:
+        data = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self) -> None:
+        if self.path == "/health":
+            self._reply(HTTPStatus.OK, self.service.health())
+        else:
+            self._reply(HTTPStatus.NOT_FOUND, {"error": f"Unknown path {self.path}"})
+
+    def do_POST(self) -> None:
+        if self.path != "/match":
+            self._reply(HTTPStatus.NOT_FOUND, {"error": f"Unknown path {self.path}"})
+            return
+        try:
+            length = int(self.headers.get("Content-Length") or 0)
+            if length > MAX_BODY_BYTES:
+                raise ValueError("body too large")
+            request = json.loads(self.rfile.read(length) or b"{}")
+            transcript = request["transcript"]
+            tag_query = request.get("tag_query")
+            if not isinstance(transcript, str) or not transcript.strip():
+                raise ValueError("'transcript' must be a non-empty string")
+            if tag_query is not None and not isinstance(tag_query, str):
+                raise ValueError("'tag_query' must be a string")
+        except (KeyError, TypeError, ValueError, AttributeError) as e:
+            self._reply(HTTPStatus.BAD_REQUEST, {"error": f"Invalid request: {e}"})
+            return
+        try:
+            body = self.service.match(transcript, tag_query)
+        except TagQueryError as e:
+            self._reply(HTTPStatus.BAD_REQUEST, {"error": f"Invalid tag query: {e}"})
+        except LLMCallError as e:
+            # Distinguishable from a successful match that found nothing
+            self._reply(HTTPStatus.BAD_GATEWAY, {"error": f"LLM call failed: {e}"})
+        except Exception as e:
+            print(f"Error matching {transcript[:80]!r}: {e!r}")
+            self._reply(
+                HTTPStatus.INTERNAL_SERVER_ERROR, {"error": f"Matching failed: {e}"}
+            )
+        else:
+            self._reply(HTTPStatus.OK, body)
+
+    def log_message(self, format: str, *args: Any) -> None:
+        # One line per request instead of the default stderr format
+        print(f"{self.command} {self.path} -> {args[1] if len(args) > 1 else ''}")
+
+
+def serve(service: MatchService, host: str = HOST, port: int = PORT) -> None:
+    handler = type("Handler", (_Handler,), {"service": service})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    watcher = threading.Thread(target=service.watch, daemon=True)
+    watcher.start()
+    print(f"Serving {len(service.catalogue.store)} videos on http://{host}:{port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        service.stop()
+
+
+def main() -> None:
+    port = int(sys.argv[1]) if len(sys.argv) > 1 else PORT
+
+    load_dotenv()
+    service = MatchService(LLMClient.from_env())
+    if not len(service.catalogue.store):
+        print("No video metadata found.")
+        return
+    serve(service, port=port)
+
+
+if __name__ == "__main__":
+    main()
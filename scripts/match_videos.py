@@ -3,13 +3,34 @@ from __future__ import annotations
 import json
 import sys
 from pathlib import Path
-from typing import List
+from typing import Iterable, List, Optional
 
 from dotenv import load_dotenv
 from pydantic import BaseModel, Field
 
+from scripts.compact_catalogue import (
+    ENCODING_VERSION,
+    CompactCatalogue,
+    encode_catalogue,
+)
+from scripts.lexical_index import LexicalIndex
+from scripts.match_cache import MatchCache
+from scripts.meta_store import MetaStore, open_store
+from scripts.paths import JSON_DIR, LEXICAL_INDEX_DIR, MATCH_CACHE_DIR, META_STORE_DIR
+from scripts.result_cache import sha256_text
+from scripts.sharded_matching import (
+    ANCHORS_PER_SHARD,
+    SHARD_INPUT_TOKENS,
+    catalogue_tokens,
+    match_sharded,
+)
+from scripts.tag_index import TagIndex
+from src.llm import LLMCallError
 from src.llm.client import LLMClient
 
+# Only the PREFILTER_TOP_K best BM25 candidates are sent to the LLM
+PREFILTER_TOP_K = 40
+
 
 class Match(BaseModel):
     """Individual video match entry."""
@@ -18,43 +39,23 @@ class Match(BaseModel):
     score: int = Field(..., description="Relevance score from 1 to 100.")
 
 
+class ClipMatch(BaseModel):
+    """Match entry as returned by the model, by catalogue clip id."""
+
+    id: int = Field(..., description="Id of the matched clip in the catalogue.")
+    score: int = Field(..., description="Relevance score from 1 to 100.")
+
+
 class VideoMatch(BaseModel):
     """Result of matching videos to a transcript."""
 
-    matches: List[Match] = Field(
+    matches: List[ClipMatch] = Field(
         default_factory=list,
-        description="List of matched videos with 'filename' and 'score' (1-100).",
+        description="List of matched clips with 'id' and 'score' (1-100).",
     )
 
 
-def load_video_metas(json_dir: Path) -> List[dict]:
-    """Load all video metadata JSON files and add filename field."""
-    metas = []
-    for json_file in json_dir.glob("*.json"):
-        try:
-            data = json.loads(json_file.read_text(encoding="utf-8"))
-            data["filename"] = json_file.name  # Add filename field
-            metas.append(data)
-        except Exception as e:
-            print(f"Error loading {json_file}: {e}")
-    return metas
-
-
-def match_videos_for_transcript(
-    transcript: str,
-    video_metas: List[dict],
-    llm_client: LLMClient,
-) -> List[Match]:
-    """Use LLM to find best matching videos for the transcript."""
-    # Prepare the prompt
-    videos_summary = "\n".join(
-        [
-            f"- {meta['filename']}: Summary: {meta.get('summary_text', '')} | Themes: {', '.join(meta.get('themes', []))} | Actions: {', '.join(meta.get('actions', []))} | Currencies: {', '.join(meta.get('currencies', []))} | Spatial Tags: {', '.join(meta.get('spatial_tags', []))} | Motion: {meta.get('motion_summary', '')} | Semantic Tags: {', '.join(meta.get('semantic_tags', []))}"
-            for meta in video_metas
-        ]
-    )
-
-    prompt = f"""
+MATCH_PROMPT = """
 You are an expert at matching video clips to text scripts/transcripts.
 
 Given the following transcript for a video script, select the best matching video clips from the list below. You can select multiple if they fit well, or none if none match.
@@ -63,38 +64,246 @@ Transcript:
 {transcript}
 
 Available videos:
-{videos_summary}
+{catalogue}
 
-Output a JSON object with a list of matches, each as a dict with 'filename' and 'score' (1-100, where 100 is perfect match).
+Output a JSON object with a list of matches, each as a dict with 'id' (the clip id) and 'score' (1-100, where 100 is perfect match).
 Only include videos with score >= 50. Sort by score descending.
 """
+# Part of every match cache key: prompt, answer schema and catalogue encoding
+PROMPT_VERSION = sha256_text(
+    json.dumps(
+        [MATCH_PROMPT, VideoMatch.model_json_schema(), ENCODING_VERSION],
+        sort_keys=True,
+    )
+)[:16]
+
+
+def load_video_metas(store_dir: Path = META_STORE_DIR) -> List[dict]:
+    """Load every video metadata record, each with its video filename."""
+    return open_store(store_dir, JSON_DIR).records()
+
+
+def load_lexical_index(
+    store: MetaStore, index_dir: Path = LEXICAL_INDEX_DIR
+) -> LexicalIndex:
+    """The BM25 index at ``index_dir``, brought up to date with ``store``."""
+    index = LexicalIndex.load(index_dir)
+    if index.sync(store):
+        index.save(index_dir)
+    return index
+
+
+def shortlist_video_metas(
+    transcript: str,
+    store: MetaStore,
+    top_k: int = PREFILTER_TOP_K,
+    index_dir: Path = LEXICAL_INDEX_DIR,
+    tag_query: Optional[str] = None,
+    lexical_index: Optional[LexicalIndex] = None,
+    tag_index: Optional[TagIndex] = None,
+) -> List[dict]:
+    """Metadata of the videos worth scoring for ``transcript``.
+
+    ``tag_query`` (see ``scripts.tag_index``) first restricts the candidates
+    to the matching videos. If more than ``top_k`` remain they are ranked
+    with the BM25 index, which is first brought up to date with ``store``;
+    when fewer than ``top_k`` share a term with the transcript, the rest of
+    the shortlist is filled with other candidates in store order. Indexes
+    already built for ``store`` can be passed in instead.
+    """
+    allowed = None
+    if tag_query:
+        tag_index = tag_index or TagIndex.from_store(store)
+        allowed = tag_index.query(tag_query)
+        if len(allowed) <= top_k:
+            return [meta for filename in allowed if (meta := store.get(filename))]
+    elif len(store) <= top_k:
+        return store.records()
+
+    lexical_index = lexical_index or load_lexical_index(store, index_dir)
+    hits = lexical_index.search(transcript, top_k, only=allowed)
+    filenames = [filename for filename, _ in hits]
+    if len(filenames) < top_k:
+        # Few shared terms (a paraphrase, another language) say nothing about
+        # relevance; fill up with other candidates so the LLM still sees them
+        shortlisted = set(filenames)
+        others = allowed if allowed is not None else store.filenames()
+        padding = [f for f in others if f not in shortlisted]
+        filenames += padding[: top_k - len(filenames)]
+    print(f"Shortlisted {len(filenames)} of {len(store)} videos, {len(hits)} by BM25")
+    return [meta for filename in filenames if (meta := store.get(filename))]
+
+
+def resolve_matches(
+    catalogue: CompactCatalogue, clip_matches: Iterable[ClipMatch]
+) -> List[Match]:
+    """Matches by filename, best first; unknown and repeated ids are dropped."""
+    best: dict[str, int] = {}
+    for clip_match in clip_matches:
+        filename = catalogue.filename(clip_match.id)
+        if filename is not None and clip_match.score > best.get(filename, 0):
+            best[filename] = clip_match.score
+    matches = [Match(filename=name, score=score) for name, score in best.items()]
+    return sorted(matches, key=lambda x: x.score, reverse=True)
+
+
+def request_matches(
+    transcript: str,
+    video_metas: List[dict],
+    llm_client: LLMClient,
+) -> List[Match]:
+    """Ask the LLM for the videos matching ``transcript``; errors propagate."""
+    catalogue = encode_catalogue(video_metas)
+    prompt = MATCH_PROMPT.format(transcript=transcript, catalogue=catalogue.text)
+    result = llm_client.invoke(prompt=prompt, output_model=VideoMatch)
+    return resolve_matches(catalogue, result.matches)
 
+
+def match_videos_for_transcript(
+    transcript: str,
+    video_metas: List[dict],
+    llm_client: LLMClient,
+) -> List[Match]:
+    """Use LLM to find best matching videos for the transcript."""
     try:
-        result = llm_client.invoke(prompt=prompt, output_model=VideoMatch)
-        return sorted(result.matches, key=lambda x: x.score, reverse=True)
+        return request_matches(transcript, video_metas, llm_client)
     except Exception as e:
         print(f"Error calling LLM: {e}")
         return []
 
 
+def score_candidates(
+    transcript: str,
+    video_metas: List[dict],
+    llm_client: LLMClient,
+    store: MetaStore,
+    lexical_index: Optional[LexicalIndex] = None,
+    rerank: bool = False,
+) -> tuple[List[Match], bool]:
+    """Matches among ``video_metas``, in shards if they do not fit one prompt.
+
+    The best BM25 hits among the candidates are the shards' anchors (see
+    ``scripts.sharded_matching``). ``rerank`` only applies to shards.
+
+    Returns:
+        Tuple of (matches, whether every request succeeded)
+    """
+    if catalogue_tokens(video_metas) <= SHARD_INPUT_TOKENS:
+        return request_matches(transcript, video_metas, llm_client), True
+
+    lexical_index = lexical_index or load_lexical_index(store)
+    candidates = [meta["filename"] for meta in video_metas]
+    hits = lexical_index.search(transcript, ANCHORS_PER_SHARD, only=set(candidates))
+    anchors = [filename for filename, _ in hits] or candidates[:ANCHORS_PER_SHARD]
+
+    def score_shard(shard: list[dict]) -> list[tuple[str, int]]:
+        matches = request_matches(transcript, shard, llm_client)
+        return [(m.filename, m.score) for m in matches]
+
+    scored = match_sharded(video_metas, score_shard, anchors, rerank=rerank)
+    matches = [
+        Match(filename=filename, score=score) for filename, score in scored.scores
+    ]
+    return matches, scored.complete
+
+
+def match_transcript(
+    transcript: str,
+    store: MetaStore,
+    llm_client: LLMClient,
+    cache: MatchCache,
+    tag_query: Optional[str] = None,
+    lexical_index: Optional[LexicalIndex] = None,
+    tag_index: Optional[TagIndex] = None,
+    top_k: Optional[int] = PREFILTER_TOP_K,
+    rerank: bool = False,
+) -> List[Match]:
+    """Shortlist and match ``transcript``, reusing cached results.
+
+    ``top_k=None`` scores every video. A shortlist too large for one prompt
+    is scored in shards. A cached result is reused while the catalogue is
+    unchanged, or after a change when the shortlist still holds the same
+    records.
+
+    Results missing a failed shard or rerank are returned but not cached.
+
+    Raises:
+        LLMCallError: If the match request failed; nothing is cached
+    """
+    key = cache.key_for(
+        transcript,
+        llm_client.config.model,
+        prompt=PROMPT_VERSION,
+        top_k=top_k,
+        tag_query=tag_query,
+        rerank=rerank,
+    )
+    version = store.version()
+    cached = cache.get(key, version)
+    if cached is None:
+        video_metas = shortlist_video_metas(
+            transcript,
+            store,
+            len(store) if top_k is None else top_k,
+            tag_query=tag_query,
+            lexical_index=lexical_index,
+            tag_index=tag_index,
+        )
+        if not video_metas:
+            print("No video passes the filters.")
+            return []
+        digests = store.digests()
+        candidates = {meta["filename"]: digests[meta["filename"]] for meta in video_metas}
+        cached = cache.revalidate(key, version, candidates)
+        if cached is None:
+            matches, complete = score_candidates(
+                transcript, video_metas, llm_client, store, lexical_index, rerank
+            )
+            if complete:
+                cache.put(key, version, candidates, [m.model_dump() for m in matches])
+            return matches
+    return [Match.model_validate(m) for m in cached]
+
+
 def main():
-    if len(sys.argv) < 2:
-        print("Usage: python match_videos.py 'your transcript here'")
+    flags = {"--all", "--rerank"}
+    args = [arg for arg in sys.argv[1:] if arg not in flags]
+    if not args:
+        print(
+            "Usage: python match_videos.py 'your transcript here' ['tag query']"
+            " [--all] [--rerank]"
+        )
         sys.exit(1)
 
-    transcript = sys.argv[1]
+    transcript = args[0]
+    tag_query = args[1] if len(args) > 1 else None
 
     load_dotenv()
     llm_client = LLMClient.from_env()
 
-    json_dir = Path("videos/analysis/json")
-    video_metas = load_video_metas(json_dir)
-
-    if not video_metas:
+    store = open_store(META_STORE_DIR, JSON_DIR)
+    if not len(store):
         print("No video metadata found.")
         return
 
-    matched = match_videos_for_transcript(transcript, video_metas, llm_client)
+    # --all scores every video instead of the BM25 shortlist, in shards
+    top_k = None if "--all" in sys.argv[1:] else PREFILTER_TOP_K
+    cache = MatchCache(MATCH_CACHE_DIR)
+    try:
+        matched = match_transcript(
+            transcript,
+            store,
+            llm_client,
+            cache,
+            tag_query,
+            top_k=top_k,
+            rerank="--rerank" in sys.argv[1:],
+        )
+    except LLMCallError as e:
+        print(f"Error calling LLM: {e}")
+        return
+    finally:
+        cache.flush()
 
     print("Matched videos (sorted by relevance):")
     for match in matched:
@@ -0,0 +1,235 @@
+"""Token-budgeted batching of analysis notes into shared LLM requests.
+
+Notes are packed greedily, in order, into batches that fit an input token
+budget, so the fixed instruction overhead and round trip are paid once per
+batch instead of once per note. A batch whose response fails validation is
+split in half and retried; notes missing from an otherwise valid response
+are retried on their own batch. A note that fails alone is reported as a
+failure. ``run_batches_async`` does the same with many requests in flight.
+
+Notes larger than the budget are split with ``split_note`` on section
+boundaries into chunks that are extracted separately and merged afterwards.
+"""
+
+from __future__ import annotations
+
+import asyncio
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from dataclasses import dataclass
+from typing import Awaitable, Callable, Optional, Sequence, TypeVar
+
+from scripts.generation_guard import CHARS_PER_TOKEN
+from scripts.note_sections import Section, split_sections
+
+TResult = TypeVar("TResult")
+
+_PART_HEADER = "(Part {} of {} of one analysis note.)\n\n"
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count of ``text`` (see ``CHARS_PER_TOKEN``)."""
+    return len(text) // CHARS_PER_TOKEN + 1
+
+
+@dataclass(frozen=True, slots=True)
+class Note:
+    """One analysis note, identified by ``key`` in batched responses."""
+
+    key: str
+    text: str
+
+    @property
+    def tokens(self) -> int:
+        return estimate_tokens(self.text)
+
+
+def _split_section(section: Section, max_chars: int) -> list[str]:
+    """A section's markdown in pieces of at most ``max_chars``.
+
+    Oversized sections are split between lines; every piece repeats the
+    heading so each chunk still says which part of the note it comes from.
+    """
+    markdown = section.markdown
+    if len(markdown) <= max_chars:
+        return [markdown]
+
+    heading = markdown[: len(markdown) - len(section.text)]
+    room = max(1, max_chars - len(heading))
+    pieces: list[str] = []
+    current = ""
+    for line in section.text.splitlines(keepends=True):
+        # A single runaway line is cut wherever it has to be
+        while len(line) > room:
+            line_piece, line = line[:room], line[room:]
+            if current:
+                pieces.append(current)
+                current = ""
+            pieces.append(line_piece)
+        if current and len(current) + len(line) > room:
+            pieces.append(current)
+            current = ""
+        current += line
+    if current:
+        pieces.append(current)
+    return [heading + piece for piece in pieces]
+
+
+def split_note(note: Note, max_tokens: int) -> list[Note]:
+    """Split a note larger than ``max_tokens`` into chunks within it.
+
+    Whole sections are packed in order into each chunk, so a chunk boundary
+    falls between sections wherever possible. Chunks are keyed
+    ``"<key>#<n>"`` and start with a line saying which part they are.
+    """
+    if note.tokens <= max_tokens:
+        return [note]
+
+    max_chars = max_tokens * CHARS_PER_TOKEN - len(_PART_HEADER.format(999, 999))
+    texts: list[str] = []
+    current = ""
+    for section in split_sections(note.text):
+        for piece in _split_section(section, max_chars):
+            if current and len(current) + len(piece) > max_chars:
+                texts.append(current)
+                current = ""
+            current += piece
+    if current:
+        texts.append(current)
+
+    return [
+        Note(
+            key=f"{note.key}#{i}",
+            text=_PART_HEADER.format(i, len(texts)) + text,
+        )
+        for i, text in enumerate(texts, start=1)
+    ]
+
+
+def pack_batches(
+    notes: Sequence[Note], max_tokens: int, max_items: int
+) -> list[list[Note]]:
+    """Group consecutive notes into batches within ``max_tokens``/``max_items``.
+
+    A note larger than ``max_tokens`` gets a batch of its own.
+    """
+    batches: list[list[Note]] = []
+    current: list[Note] = []
+    current_tokens = 0
+    for note in notes:
+        tokens = note.tokens
+        if current and (
+            current_tokens + tokens > max_tokens or len(current) >= max_items
+        ):
+            batches.append(current)
+            current, current_tokens = [], 0
+        current.append(note)
+        current_tokens += tokens
+    if current:
+        batches.append(current)
+    return batches
+
+
+def _settle(
+    batch: list[Note],
+    results: dict[str, TResult],
+    error: Optional[Exception],
+    on_result: Callable[[str, TResult], None],
+    on_failure: Callable[[str, Exception], None],
+) -> list[list[Note]]:
+    """Report the outcome of one request and return the batches to retry."""
+    missing = []
+    for note in batch:
+        if note.key in results:
+            on_result(note.key, results[note.key])
+        else:
+            missing.append(note)
+
+    if not missing:
+        return []
+    if len(batch) == 1:
+        on_failure(batch[0].key, error or ValueError("note missing from response"))
+        return []
+    if len(missing) < len(batch):
+        return [missing]
+    middle = len(batch) // 2
+    return [batch[:middle], batch[middle:]]
+
+
+def run_batches(
+    batches: Sequence[list[Note]],
+    extract: Callable[[list[Note]], dict[str, TResult]],
+    on_result: Callable[[str, TResult], None],
+    on_failure: Callable[[str, Exception], None],
+    max_workers: int = 1,
+) -> int:
+    """Extract every batch, splitting and retrying the notes that fail.
+
+    Args:
+        batches: Batches from ``pack_batches``
+        extract: Makes one request and returns a result per note key; raises
+            if the response fails validation
+        on_result: Called with each note key and result as soon as it arrives
+        on_failure: Called for notes that still fail on their own
+        max_workers: Requests in flight at once; callbacks always run on the
+            calling thread
+
+    Returns:
+        Number of requests made
+    """
+    requests = 0
+    todo = deque(batches)
+    running: dict[Future[dict[str, TResult]], list[Note]] = {}
+    with ThreadPoolExecutor(max_workers=max(1, max_workers)) as pool:
+        while todo or running:
+            while todo and len(running) < max(1, max_workers):
+                batch = todo.popleft()
+                running[pool.submit(extract, batch)] = batch
+                requests += 1
+
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                batch = running.pop(future)
+                error = future.exception()
+                results = {} if error else future.result()
+                # Retries go first, like the failed batch they came from
+                todo.extendleft(
+                    reversed(
+                        _settle(batch, results, error, on_result, on_failure)  # type: ignore[arg-type]
+                    )
+                )
+    return requests
+
+
+async def run_batches_async(
+    batches: Sequence[list[Note]],
+    extract: Callable[[list[Note]], Awaitable[dict[str, TResult]]],
+    on_result: Callable[[str, TResult], None],
+    on_failure: Callable[[str, Exception], None],
+    concurrency: int,
+) -> int:
+    """Like ``run_batches`` with up to ``concurrency`` requests in flight.
+
+    Callbacks run on the event loop as each request completes, so results
+    are written in completion order.
+
+    Returns:
+        Number of requests made
+    """
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+    requests = 0
+
+    async def run(batch: list[Note]) -> None:
+        nonlocal requests
+        error: Optional[Exception] = None
+        async with semaphore:
+            requests += 1
+            try:
+                results = await extract(batch)
+            except Exception as exc:
+                results, error = {}, exc
+        retries = _settle(batch, results, error, on_result, on_failure)
+        await asyncio.gather(*(run(retry) for retry in retries))
+
+    await asyncio.gather(*(run(batch) for batch in batches))
+    return requests
@@ -0,0 +1,364 @@
+"""Deterministic fast-path extraction of video metadata from analysis notes.
+
+Compiled regexes and keyword lexicons fill the list fields of
+``VideoAnalysisMeta`` (currencies, spatial tags, actions, themes, semantic
+tags). The free-text fields come from the note's own "Final Synthesis" and
+"Cross-Frame Delta Analysis" sections. A confidence score says how much of
+that was found, so only notes the rules cannot cover go to the LLM.
+
+Lexicons are matched against the note's word counts rather than scanned with
+regexes: the note is tokenised once and each distinct word is looked up, so
+a typical note is handled in well under a millisecond.
+"""
+
+from __future__ import annotations
+
+import re
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import Optional
+
+from scripts.note_sections import find_section, plain_text, split_sections
+
+MAX_TAGS = 8
+MAX_MOTION_CHARS = 400
+# A theme must be hit at least this often, and at least THEME_SHARE times as
+# often as the strongest theme, to be reported.
+MIN_THEME_HITS = 2
+THEME_SHARE = 0.25
+
+BANKNOTE_VALUES = {1, 2, 5, 10, 20, 50, 100, 200, 500, 1000}
+
+# Maps every byte except a-z to a space, so ``split()`` yields the words
+_WORD_BYTES = bytes(c if 97 <= c <= 122 else 32 for c in range(256))
+_CURRENCY_CODES_RE = re.compile(r"(USD|EUR|GBP|JPY|CHF|CNY|CAD|AUD|BTC|ETH)\b")
+_CURRENCY_SYMBOLS = {"$": "USD", "€": "EUR", "£": "GBP", "¥": "JPY", "₿": "BTC"}
+_NUMBER_WORDS = {
+    "one": 1,
+    "two": 2,
+    "five": 5,
+    "ten": 10,
+    "twenty": 20,
+    "fifty": 50,
+    "one hundred": 100,
+    "hundred": 100,
+}
+_MONEY_WORDS = ("dollar", "dollars", "euro", "euros", "pound", "pounds")
+_NOTE_WORDS = ("bill", "bills", "note", "notes", "banknote", "banknotes")
+# (pattern, words of which one must occur for the pattern to be worth running)
+_DENOMINATION_RES = [
+    # $100, €50 (not prices such as $100.25 or $1,000,000)
+    (re.compile(r"[$€£]\s?(\d{1,4})\b(?![.,]\d)"), None),
+    # 100-dollar bill, 50 euro notes, 20 denomination
+    (
+        re.compile(
+            r"(\d{1,4})[- ](?:(?:us |u\.s\. )?(?:dollars?|euros?|pounds?)[- ]?)?"
+            r"(?:bills?|notes?|banknotes?|denominations?)\b"
+        ),
+        _NOTE_WORDS + ("denomination", "denominations"),
+    ),
+    # fifty dollars, one hundred dollar bill
+    (
+        re.compile(
+            r"(" + "|".join(sorted(_NUMBER_WORDS, key=len, reverse=True)) + r")"
+            r"[- ](?:dollars?|euros?|pounds?)\b"
+        ),
+        _MONEY_WORDS,
+    ),
+]
+
+_POSITION_RE = re.compile(
+    r"(top|bottom|upper|lower|center|centre|middle)[- ]"
+    r"(left|right|center|centre)\b"
+)
+_CENTER_VALUE_RE = re.compile(
+    r":\s*(?:dead\s+)?(center|centre|left|right)\s*$", re.MULTILINE
+)
+_POSITION_ALIASES = {
+    "upper": "top",
+    "lower": "bottom",
+    "centre": "center",
+    "middle": "center",
+}
+
+
+@dataclass(frozen=True, slots=True)
+class _Words:
+    """Word counts of a lowercased note, plus its words joined by spaces."""
+
+    counts: Counter[str]
+    joined: str
+
+    @classmethod
+    def of(cls, lowered: str) -> "_Words":
+        tokens = lowered.encode().translate(_WORD_BYTES).decode().split()
+        return cls(Counter(tokens), f" {' '.join(tokens)} ")
+
+
+@dataclass(frozen=True, slots=True)
+class _Lexicon:
+    """Keyword lexicon of single words, ``stem*`` prefixes and phrases."""
+
+    words: dict[str, str]
+    prefixes: tuple[tuple[str, str], ...]
+    phrases: tuple[tuple[str, str], ...]
+    _labels: dict[str, Optional[str]] = field(default_factory=dict)
+
+    def _label(self, word: str) -> Optional[str]:
+        # Memoised: the vocabulary of analysis notes is small and repetitive
+        try:
+            return self._labels[word]
+        except KeyError:
+            pass
+        label = self.words.get(word)
+        if label is None:
+            label = next(
+                (label for stem, label in self.prefixes if word.startswith(stem)),
+                None,
+            )
+        self._labels[word] = label
+        return label
+
+    def hits(self, words: _Words) -> Counter[str]:
+        """Number of matching terms per label."""
+        counts: Counter[str] = Counter()
+        for word, n in words.counts.items():
+            label = self._label(word)
+            if label is not None:
+                counts[label] += n
+        for phrase, label in self.phrases:
+            n = words.joined.count(phrase)
+            if n:
+                counts[label] += n
+        return counts
+
+
+def _lexicon(entries: dict[str, str]) -> _Lexicon:
+    """Build a lexicon from ``{label: "word | stem* | two words"}``."""
+    words: dict[str, str] = {}
+    prefixes = []
+    phrases = []
+    for label, terms in entries.items():
+        for term in (t.strip() for t in terms.split("|")):
+            if " " in term:
+                phrases.append((f" {term} ", label))
+            elif term.endswith("*"):
+                prefixes.append((term[:-1], label))
+            else:
+                words[term] = label
+    return _Lexicon(words, tuple(prefixes), tuple(phrases))
+
+
+_CURRENCY_WORDS = _lexicon(
+    {
+        "USD": "dollar | dollars",
+        "EUR": "euro | euros",
+        "GBP": "british pound | british pounds | pound sterling | pounds sterling",
+        "JPY": "yen",
+        "CNY": "yuan | renminbi",
+        "BTC": "bitcoin | bitcoins",
+        "ETH": "ethereum",
+    }
+)
+
+_ACTIONS = _lexicon(
+    {
+        "counting": "counts | counted | counting",
+        "holding": "holds | holding | held",
+        "handing": "hands over | handed over | handing over | hands it "
+        "| handing it | passes the | passing the | passed the",
+        "giving": "gives | giving | gave",
+        "receiving": "receives | received | receiving",
+        "writing": "writes | writing | wrote",
+        "typing": "typing | types on | typed on | types into | typed into",
+        "smoking": "smokes | smoked | smoking",
+        "examining": "examines | examined | examining | inspects | inspected "
+        "| inspecting | checks | checked | checking",
+        "stacking": "stacks | stacked | stacking",
+        "fanning": "fanned | fanning",
+        "pointing": "points at | pointed at | pointing at | points to "
+        "| pointed to | pointing to | pointing toward",
+        "scrolling": "scrolls | scrolled | scrolling",
+        "tapping": "taps | tapped | tapping",
+        "swiping": "swipes | swiped | swiping",
+        "rotating": "rotates | rotated | rotating | rotation",
+        "waving": "waves | waved | waving",
+        "picking_up": "picks up | picked up | picking up",
+        "dropping": "drops | dropped | dropping",
+        "throwing": "throw | throws | throwing | threw | thrown",
+        "calculating": "calculates | calculated | calculating",
+        "distributing": "distributes | distributed | distributing",
+        "demanding": "demands | demanded | demanding",
+        "sorting": "sorts | sorted | sorting",
+        "folding": "folds | folded | folding",
+    }
+)
+
+# Keys are VideoTheme values
+_THEMES = _lexicon(
+    {
+        "crisis": "crisis | crash | crashes | crashing | panic | collaps* "
+        "| bankrupt*",
+        "spending": "spend* | spent | shopping | purchas* | expens*",
+        "waste": "wast* | burn* | discard* | squander*",
+        "grow": "grow* | upward | rising | increas* | profit* | gain | gains",
+        "recession": "recession | declin* | downward | loss | losses | bearish",
+        "wealth": "wealth* | rich | luxur* | abundan* | accumulat* | pile | piles "
+        "| stack of | stacks of",
+        "investment": "invest* | stock | stocks | portfolio | trade | trades "
+        "| trading | trader | forex | crypto* | bitcoin | market",
+        "analysis": "analy* | chart | charts | graph | graphs | dashboard "
+        "| spreadsheet | calculat* | candlestick",
+        "transaction": "transaction* | handing | giving | exchang* | payment "
+        "| transfer* | receiv*",
+        "counting": "count | counts | counted | counting",
+        "smoking": "smok* | cigar*",
+    }
+)
+
+_SEMANTIC_TAGS = _lexicon(
+    {
+        "wealth_display": "wealth | luxur* | stack of cash | stacks of cash "
+        "| stack of money | stacks of money | stacks of bills | pile of cash "
+        "| piles of cash | pile of money | piles of money | piles of bills",
+        "cash_handling": "holding bills | holding cash | holding money "
+        "| holding banknotes | holding coins | counting bills | counting cash "
+        "| counting money | counting banknotes | counting coins "
+        "| hand holding | hands holding",
+        "financial_data": "chart | charts | graph | graphs | dashboard "
+        "| candlestick | ticker | tickers | price data",
+        "cryptocurrency": "crypto* | bitcoin | blockchain | ethereum",
+        "coins": "coin | coins",
+        "banknotes": "bill | bills | banknote | banknotes",
+        "money_machine": "counting machine | bill counter | money counter",
+        "office": "office | desk | laptop | tablet | monitor",
+        "transaction": "transaction | payment | handing over | handing it "
+        "| exchang*",
+    }
+)
+
+
+@dataclass(slots=True)
+class LocalMeta:
+    """Fields extracted without an LLM, plus how complete they are."""
+
+    actions: list[str] = field(default_factory=list)
+    currencies: list[str] = field(default_factory=list)
+    spatial_tags: list[str] = field(default_factory=list)
+    themes: list[str] = field(default_factory=list)
+    semantic_tags: list[str] = field(default_factory=list)
+    motion_summary: Optional[str] = None
+    summary_text: Optional[str] = None
+    confidence: float = 0.0
+
+    @property
+    def has_free_text(self) -> bool:
+        return bool(self.summary_text and self.motion_summary)
+
+
+def _ranked(counts: Counter[str], limit: int = MAX_TAGS) -> list[str]:
+    """Labels that were hit, most frequent first."""
+    return [label for label, n in counts.most_common(limit) if n > 0]
+
+
+def _currencies(text: str, lowered: str, words: _Words) -> list[str]:
+    """Currency codes followed by banknote denominations, e.g. ['USD', '50']."""
+    codes = Counter(_CURRENCY_CODES_RE.findall(text))
+    codes.update(_CURRENCY_WORDS.hits(words))
+    for symbol, code in _CURRENCY_SYMBOLS.items():
+        codes[code] += text.count(symbol)
+
+    values: Counter[str] = Counter()
+    for pattern, required in _DENOMINATION_RES:
+        if required and not any(words.counts[word] for word in required):
+            continue
+        for match in pattern.findall(lowered):
+            value = _NUMBER_WORDS.get(match) or (
+                int(match) if match.isdigit() else None
+            )
+            if value in BANKNOTE_VALUES:
+                values[str(value)] += 1
+    return _ranked(codes, limit=4) + _ranked(values, limit=4)
+
+
+def _normalise_position(vertical: str, horizontal: str) -> str:
+    vertical = _POSITION_ALIASES.get(vertical, vertical)
+    horizontal = _POSITION_ALIASES.get(horizontal, horizontal)
+    # "center-center" is just "center"
+    return vertical if vertical == horizontal else f"{vertical}-{horizontal}"
+
+
+def _spatial_tags(lowered: str, words: _Words) -> list[str]:
+    """Placement tags such as 'top-left', 'center' and 'background'."""
+    tags = Counter(
+        _normalise_position(v, h) for v, h in _POSITION_RE.findall(lowered)
+    )
+    tags.update(
+        _POSITION_ALIASES.get(value, value)
+        for value in _CENTER_VALUE_RE.findall(lowered)
+    )
+    for depth in ("background", "foreground", "midground"):
+        tags[depth] += words.counts[depth]
+    return _ranked(tags)
+
+
+def _themes(words: _Words) -> list[str]:
+    """VideoTheme values with enough lexicon hits, strongest first."""
+    hits = _THEMES.hits(words)
+    top = max(hits.values(), default=0)
+    return [
+        theme
+        for theme, count in hits.most_common()
+        if count >= MIN_THEME_HITS and count >= top * THEME_SHARE
+    ][:MAX_TAGS]
+
+
+def _truncate_sentences(text: str, max_chars: int) -> str:
+    if len(text) <= max_chars:
+        return text
+    cut = text[:max_chars]
+    end = cut.rfind(". ")
+    return cut[: end + 1] if end > 0 else cut.rstrip() + "…"
+
+
+def extract_local_meta(text: str) -> LocalMeta:
+    """Fill metadata fields from ``text`` with rules only.
+
+    The confidence (0-1) weighs the free-text sections found most, then
+    themes, actions and spatial tags, then whether the note follows the
+    expected section layout at all.
+    """
+    sections = split_sections(text)
+    synthesis = find_section(sections, "synthesis", "conclusion")
+    motion = find_section(sections, "delta", "motion")
+
+    lowered = text.lower()
+    words = _Words.of(lowered)
+    meta = LocalMeta(
+        actions=_ranked(_ACTIONS.hits(words)),
+        currencies=_currencies(text, lowered, words),
+        spatial_tags=_spatial_tags(lowered, words),
+        themes=_themes(words),
+        semantic_tags=_ranked(_SEMANTIC_TAGS.hits(words)),
+        motion_summary=(
+            _truncate_sentences(plain_text(motion.text), MAX_MOTION_CHARS) or None
+            if motion
+            else None
+        ),
+        summary_text=(plain_text(synthesis.text) or None) if synthesis else None,
+    )
+
+    known_layout = sum(
+        find_section(sections, keyword) is not None
+        for keyword in ("summary table", "detailed breakdown", "delta", "synthesis")
+    )
+    meta.confidence = round(
+        0.25 * bool(meta.summary_text)
+        + 0.15 * bool(meta.motion_summary)
+        + 0.2 * bool(meta.themes)
+        + 0.15 * bool(meta.actions)
+        + 0.1 * bool(meta.spatial_tags)
+        + 0.15 * (known_layout / 4),
+        3,
+    )
+    return meta
@@ -0,0 +1,451 @@
+"""Consolidated store of per-video metadata records.
+
+All records live in one directory instead of one JSON file per video::
+
+    manifest.json        current generation, record count and tag vocabularies
+    gen-<g>/             columnar snapshot, one .npy file per column
+    gen-<g>.jsonl        upserts appended since that snapshot
+
+The snapshot holds string columns (filename, free text, record digest) as
+one UTF-8 byte array plus offsets, and tag columns (actions, themes, ...)
+dictionary-encoded as int32 ids plus offsets into a per-column vocabulary.
+Arrays are loaded with ``mmap_mode="r"``, so opening a store of 100k records
+costs a few small reads; records are only decoded when asked for.
+
+Upserts append one JSON line to the log and win over the snapshot.
+``compact`` folds the log into a new generation. The store is safe to use
+from several threads of one writer process.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import shutil
+import threading
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Iterable, Optional
+
+import numpy as np
+
+from scripts.result_cache import sha256_text
+
+TEXT_FIELDS = ("summary_text", "motion_summary")
+TAG_FIELDS = ("actions", "currencies", "spatial_tags", "semantic_tags", "themes")
+
+_MANIFEST = "manifest.json"
+
+
+def _load_array(path: Path) -> np.ndarray:
+    return np.load(path, mmap_mode="r")
+
+
+def _save_array(path: Path, array: np.ndarray) -> None:
+    np.save(path, np.ascontiguousarray(array))
+
+
+@dataclass(frozen=True, slots=True)
+class _StringColumn:
+    """Variable-length strings as one UTF-8 byte array plus offsets."""
+
+    data: np.ndarray
+    offsets: np.ndarray
+
+    @classmethod
+    def encode(cls, values: Iterable[str]) -> "_StringColumn":
+        encoded = [value.encode("utf-8") for value in values]
+        offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        np.cumsum([len(b) for b in encoded], out=offsets[1:])
+        return cls(np.frombuffer(b"".join(encoded), dtype=np.uint8), offsets)
+
+    @classmethod
+    def load(cls, directory: Path, name: str) -> "_StringColumn":
+        return cls(
+            _load_array(directory / f"{name}.data.npy"),
+            _load_array(directory / f"{name}.offsets.npy"),
+        )
+
+    def save(self, directory: Path, name: str) -> None:
+        _save_array(directory / f"{name}.data.npy", self.data)
+        _save_array(directory / f"{name}.offsets.npy", self.offsets)
+
+    def __getitem__(self, row: int) -> str:
+        start, end = self.offsets[row], self.offsets[row + 1]
+        return self.data[start:end].tobytes().decode("utf-8")
+
+    def values(self) -> list[str]:
+        data = self.data.tobytes()
+        offsets = self.offsets.tolist()
+        return [
+            data[start:end].decode("utf-8")
+            for start, end in zip(offsets, offsets[1:])
+        ]
+
+
+@dataclass(frozen=True, slots=True)
+class _TagColumn:
+    """Lists of tags as vocabulary ids plus per-row offsets."""
+
+    ids: np.ndarray
+    offsets: np.ndarray
+    vocab: list[str]
+
+    @classmethod
+    def encode(cls, rows: Iterable[list[str]]) -> "_TagColumn":
+        vocab: dict[str, int] = {}
+        ids: list[int] = []
+        offsets = [0]
+        for tags in rows:
+            ids += [vocab.setdefault(tag, len(vocab)) for tag in tags]
+            offsets.append(len(ids))
+        return cls(
+            np.asarray(ids, dtype=np.int32),
+            np.asarray(offsets, dtype=np.int64),
+            list(vocab),
+        )
+
+    @classmethod
+    def load(cls, directory: Path, name: str, vocab: list[str]) -> "_TagColumn":
+        return cls(
+            _load_array(directory / f"{name}.ids.npy"),
+            _load_array(directory / f"{name}.offsets.npy"),
+            vocab,
+        )
+
+    def save(self, directory: Path, name: str) -> None:
+        _save_array(directory / f"{name}.ids.npy", self.ids)
+        _save_array(directory / f"{name}.offsets.npy", self.offsets)
+
+    def __getitem__(self, row: int) -> list[str]:
+        start, end = self.offsets[row], self.offsets[row + 1]
+        return [self.vocab[i] for i in self.ids[start:end].tolist()]
+
+    def values(self) -> list[list[str]]:
+        ids = self.ids.tolist()
+        offsets = self.offsets.tolist()
+        vocab = self.vocab
+        return [
+            [vocab[i] for i in ids[start:end]]
+            for start, end in zip(offsets, offsets[1:])
+        ]
+
+
+@dataclass(frozen=True, slots=True)
+class _Snapshot:
+    """Columns of one compacted generation."""
+
+    filenames: _StringColumn
+    digests: _StringColumn
+    texts: dict[str, _StringColumn]
+    tags: dict[str, _TagColumn]
+
+    def __len__(self) -> int:
+        return len(self.filenames.offsets) - 1
+
+    @classmethod
+    def load(cls, directory: Path, vocab: dict[str, list[str]]) -> "_Snapshot":
+        return cls(
+            filenames=_StringColumn.load(directory, "filename"),
+            digests=_StringColumn.load(directory, "digest"),
+            texts={name: _StringColumn.load(directory, name) for name in TEXT_FIELDS},
+            tags={
+                name: _TagColumn.load(directory, name, vocab.get(name, []))
+                for name in TAG_FIELDS
+            },
+        )
+
+    @classmethod
+    def encode(cls, records: list[dict[str, Any]], digests: list[str]) -> "_Snapshot":
+        return cls(
+            filenames=_StringColumn.encode(r["filename"] for r in records),
+            digests=_StringColumn.encode(digests),
+            texts={
+                name: _StringColumn.encode(r[name] for r in records)
+                for name in TEXT_FIELDS
+            },
+            tags={
+                name: _TagColumn.encode(r[name] for r in records)
+                for name in TAG_FIELDS
+            },
+        )
+
+    def save(self, directory: Path) -> None:
+        directory.mkdir(parents=True, exist_ok=True)
+        self.filenames.save(directory, "filename")
+        self.digests.save(directory, "digest")
+        for name, column in self.texts.items():
+            column.save(directory, name)
+        for name, column in self.tags.items():
+            column.save(directory, name)
+
+    def record(self, row: int) -> dict[str, Any]:
+        record: dict[str, Any] = {"filename": self.filenames[row]}
+        for name, column in self.texts.items():
+            record[name] = column[row]
+        for name, column in self.tags.items():
+            record[name] = column[row]
+        return record
+
+    def records(self) -> list[dict[str, Any]]:
+        columns = {"filename": self.filenames.values()}
+        for name, column in self.texts.items():
+            columns[name] = column.values()
+        for name, column in self.tags.items():
+            columns[name] = column.values()
+        names = list(columns)
+        return [dict(zip(names, values)) for values in zip(*columns.values())]
+
+
+def _normalise(filename: str, record: dict[str, Any]) -> dict[str, Any]:
+    """Record with exactly the stored fields; missing ones become empty."""
+    normalised: dict[str, Any] = {"filename": filename}
+    for name in TEXT_FIELDS:
+        normalised[name] = record.get(name) or ""
+    for name in TAG_FIELDS:
+        tags = (str(tag) for tag in record.get(name) or [])
+        normalised[name] = list(dict.fromkeys(tags))
+    return normalised
+
+
+def _line(record: dict[str, Any]) -> str:
+    return json.dumps(record, sort_keys=True, ensure_ascii=False)
+
+
+class MetaStore:
+    """Metadata records keyed by video filename."""
+
+    def __init__(self, root: Path) -> None:
+        self.root = root
+        self._lock = threading.Lock()
+        self._generation = 0
+        self._snapshot: Optional[_Snapshot] = None
+        self._rows: Optional[dict[str, int]] = None
+        # Upserts since the snapshot, with their digests
+        self._tail: dict[str, dict[str, Any]] = {}
+        self._tail_digests: dict[str, str] = {}
+        self._version: Optional[str] = None
+
+        manifest_path = root / _MANIFEST
+        if manifest_path.exists():
+            manifest = json.loads(manifest_path.read_text(encoding="utf-8"))
+            self._generation = manifest["generation"]
+            self._snapshot = _Snapshot.load(
+                self._snapshot_dir(self._generation), manifest["vocab"]
+            )
+        self._replay_log()
+
+    def _snapshot_dir(self, generation: int) -> Path:
+        return self.root / f"gen-{generation}"
+
+    def _log_path(self, generation: int) -> Path:
+        return self.root / f"gen-{generation}.jsonl"
+
+    def _replay_log(self) -> None:
+        log_path = self._log_path(self._generation)
+        if not log_path.exists():
+            return
+        with open(log_path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue  # a write cut short by a crash
+                self._tail[record["filename"]] = record
+                self._tail_digests[record["filename"]] = sha256_text(line.rstrip("\n"))
+
+    def _row(self, filename: str) -> Optional[int]:
+        if self._snapshot is None:
+            return None
+        if self._rows is None:
+            self._rows = {
+                name: row for row, name in enumerate(self._snapshot.filenames.values())
+            }
+        return self._rows.get(filename)
+
+    def __len__(self) -> int:
+        stored = len(self._snapshot) if self._snapshot else 0
+        return stored + sum(self._row(name) is None for name in self._tail)
+
+    def __contains__(self, filename: object) -> bool:
+        return filename in self._tail or (
+            isinstance(filename, str) and self._row(filename) is not None
+        )
+
+    def filenames(self) -> list[str]:
+        """Every stored filename, snapshot order first."""
+        stored = self._snapshot.filenames.values() if self._snapshot else []
+        return stored + [name for name in self._tail if self._row(name) is None]
+
+    def get(self, filename: str) -> Optional[dict[str, Any]]:
+        """The record of ``filename`` (including a ``filename`` key), or None."""
+        if filename in self._tail:
+            return dict(self._tail[filename])
+        row = self._row(filename)
+        if row is None or self._snapshot is None:
+            return None
+        return self._snapshot.record(row)
+
+    def records(self) -> list[dict[str, Any]]:
+        """Every record, snapshot order first, then new filenames."""
+        records = self._snapshot.records() if self._snapshot else []
+        if not self._tail:
+            return records
+        seen = set()
+        for i, record in enumerate(records):
+            updated = self._tail.get(record["filename"])
+            if updated is not None:
+                records[i] = dict(updated)
+                seen.add(record["filename"])
+        records += [
+            dict(record) for name, record in self._tail.items() if name not in seen
+        ]
+        return records
+
+    def tag_postings(self, name: str) -> dict[str, np.ndarray]:
+        """Sorted rows (positions in ``filenames()``) per tag of column ``name``.
+
+        Snapshot postings come straight from the dictionary-encoded column;
+        only records upserted since the snapshot are decoded.
+        """
+        snapshot_rows = len(self._snapshot) if self._snapshot else 0
+        postings: dict[str, np.ndarray] = {}
+        if self._snapshot is not None:
+            column = self._snapshot.tags[name]
+            ids = np.asarray(column.ids)
+            rows = np.repeat(
+                np.arange(snapshot_rows, dtype=np.int32), np.diff(column.offsets)
+            )
+            replaced = [row for f in self._tail if (row := self._row(f)) is not None]
+            if replaced:
+                keep = ~np.isin(rows, replaced)
+                ids, rows = ids[keep], rows[keep]
+            # A stable sort keeps each tag's rows ascending
+            order = np.argsort(ids, kind="stable")
+            ids, rows = ids[order], rows[order]
+            starts = np.flatnonzero(np.r_[True, ids[1:] != ids[:-1]]) if len(ids) else []
+            for tag_id, tag_rows in zip(ids[starts], np.split(rows, starts[1:])):
+                postings[column.vocab[tag_id]] = tag_rows
+
+        added: dict[str, list[int]] = {}
+        next_row = snapshot_rows
+        for filename, record in self._tail.items():
+            row = self._row(filename)
+            if row is None:
+                row, next_row = next_row, next_row + 1
+            for tag in record[name]:
+                added.setdefault(tag, []).append(row)
+        for tag, rows in added.items():
+            postings[tag] = np.union1d(
+                postings.get(tag, np.zeros(0, dtype=np.int32)),
+                np.asarray(rows, dtype=np.int32),
+            )
+        return postings
+
+    def digests(self) -> dict[str, str]:
+        """SHA-256 of every record's canonical JSON, keyed by filename."""
+        digests = {}
+        if self._snapshot:
+            digests = dict(
+                zip(
+                    self._snapshot.filenames.values(),
+                    self._snapshot.digests.values(),
+                )
+            )
+        digests.update(self._tail_digests)
+        return digests
+
+    def version(self) -> str:
+        """Fingerprint of every record; changes with any upsert that alters one."""
+        with self._lock:
+            if self._version is None:
+                self._version = sha256_text(json.dumps(sorted(self.digests().items())))
+            return self._version
+
+    def upsert(self, filename: str, record: dict[str, Any]) -> None:
+        """Insert or replace the record of ``filename``."""
+        record = _normalise(filename, record)
+        line = _line(record)
+        with self._lock:
+            self.root.mkdir(parents=True, exist_ok=True)
+            with open(self._log_path(self._generation), "a", encoding="utf-8") as f:
+                f.write(line + "\n")
+            self._tail[filename] = record
+            self._tail_digests[filename] = sha256_text(line)
+            self._version = None
+
+    def compact(self) -> bool:
+        """Fold the upsert log into a new snapshot generation.
+
+        Returns:
+            Whether there was anything to compact
+        """
+        with self._lock:
+            if not self._tail:
+                return False
+            records = self.records()
+            digests = self.digests()
+            snapshot = _Snapshot.encode(
+                records, [digests[record["filename"]] for record in records]
+            )
+
+            generation = self._generation + 1
+            snapshot.save(self._snapshot_dir(generation))
+            self._log_path(generation).touch()
+            manifest = {
+                "generation": generation,
+                "count": len(records),
+                "vocab": {name: column.vocab for name, column in snapshot.tags.items()},
+            }
+            tmp_path = self.root / f"{_MANIFEST}.tmp"
+            tmp_path.write_text(json.dumps(manifest), encoding="utf-8")
+            os.replace(tmp_path, self.root / _MANIFEST)
+
+            # Earlier generations, including any left by an interrupted compaction
+            for path in self.root.glob("gen-*"):
+                if path.name not in (f"gen-{generation}", f"gen-{generation}.jsonl"):
+                    if path.is_dir():
+                        shutil.rmtree(path, ignore_errors=True)
+                    else:
+                        path.unlink(missing_ok=True)
+
+            self._generation = generation
+            self._snapshot = _Snapshot.load(
+                self._snapshot_dir(generation), manifest["vocab"]
+            )
+            self._rows = None
+            self._tail.clear()
+            self._tail_digests.clear()
+            return True
+
+    def import_json_dir(self, json_dir: Path) -> int:
+        """Upsert per-video ``<video>.json`` metadata files from ``json_dir``.
+
+        Returns:
+            Number of files imported
+        """
+        imported = 0
+        for json_file in sorted(json_dir.glob("*.json")):
+            try:
+                record = json.loads(json_file.read_text(encoding="utf-8"))
+            except (OSError, ValueError) as e:
+                print(f"Error loading {json_file}: {e}")
+                continue
+            self.upsert(json_file.with_suffix(".mp4").name, record)
+            imported += 1
+        return imported
+
+
+def open_store(root: Path, legacy_json_dir: Optional[Path] = None) -> MetaStore:
+    """Open the store at ``root``, importing per-file JSON metadata once.
+
+    A store that does not exist yet is seeded from ``legacy_json_dir``, the
+    directory of ``<video>.json`` files earlier versions wrote.
+    """
+    store = MetaStore(root)
+    if not len(store) and legacy_json_dir and legacy_json_dir.is_dir():
+        imported = store.import_json_dir(legacy_json_dir)
+        if imported:
+            store.compact()
+            print(f"Imported {imported} metadata files from {legacy_json_dir}")
+    return store
@@ -0,0 +1,78 @@
+"""Markdown section parsing for video analysis notes.
+
+Analysis notes follow the prompt's output structure (Summary Table,
+Detailed Breakdown, Cross-Frame Delta Analysis, Final Synthesis), usually as
+``##`` headings with optional numbering such as ``## 3. Final Synthesis``.
+"""
+
+from __future__ import annotations
+
+import re
+from dataclasses import dataclass
+from typing import Optional, Sequence
+
+_HEADING_RE = re.compile(r"^(#{1,6})\s+(.+?)\s*#*\s*$", re.MULTILINE)
+_NUMBERING_RE = re.compile(r"^\d+[.)]\s*")
+_MARKUP_RE = re.compile(r"[*_`|>#]+")
+_BULLET_RE = re.compile(r"^\s*(?:[-*+]|\d+[.)])\s+", re.MULTILINE)
+_LABEL_RE = re.compile(r"^\s*[^:\n]{1,40}:\s+", re.MULTILINE)
+
+
+@dataclass(frozen=True, slots=True)
+class Section:
+    """A heading and the text under it, up to the next heading of any level."""
+
+    title: str
+    level: int
+    text: str
+
+    @property
+    def markdown(self) -> str:
+        """The section as it appeared in the note, heading included."""
+        if not self.level:
+            return self.text
+        return f"{'#' * self.level} {self.title}\n{self.text}"
+
+
+def split_sections(text: str) -> list[Section]:
+    """Split a note on markdown headings.
+
+    Text before the first heading becomes a section with an empty title and
+    level 0. Heading numbering ("3. ") is stripped from titles.
+    """
+    sections = []
+    matches = list(_HEADING_RE.finditer(text))
+    preamble = text[: matches[0].start()] if matches else text
+    if preamble.strip():
+        sections.append(Section(title="", level=0, text=preamble))
+
+    for i, match in enumerate(matches):
+        end = matches[i + 1].start() if i + 1 < len(matches) else len(text)
+        sections.append(
+            Section(
+                title=_NUMBERING_RE.sub("", match.group(2)).strip(),
+                level=len(match.group(1)),
+                text=text[match.end() + 1 : end],
+            )
+        )
+    return sections
+
+
+def find_section(sections: Sequence[Section], *keywords: str) -> Optional[Section]:
+    """First section whose title contains any of ``keywords`` (case-insensitive)."""
+    for section in sections:
+        title = section.title.lower()
+        if any(keyword in title for keyword in keywords):
+            return section
+    return None
+
+
+def plain_text(markdown: str) -> str:
+    """Collapse markdown to a single line of prose.
+
+    Bullets, emphasis and ``Label:`` prefixes are dropped.
+    """
+    text = _BULLET_RE.sub("", markdown)
+    text = _MARKUP_RE.sub("", text)
+    text = _LABEL_RE.sub("", text)
+    return " ".join(text.split())
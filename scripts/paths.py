@@ -0,0 +1,20 @@
+"""Locations of the video data shared by every script.
+
+Paths are anchored at the repository root, so each entry point reads and
+writes the same files whatever the working directory.
+"""
+
+from __future__ import annotations
+
+from pathlib import Path
+
+VIDEOS_DIR = Path(__file__).resolve().parent.parent / "videos"
+# One catalogue tracks every video and stage across all entry points
+CATALOGUE_PATH = VIDEOS_DIR / "catalogue.sqlite3"
+ANALYSIS_DIR = VIDEOS_DIR / "analysis"
+META_STORE_DIR = ANALYSIS_DIR / "meta_store"
+# Per-video JSON files written by earlier versions, imported into the store
+JSON_DIR = ANALYSIS_DIR / "json"
+LEXICAL_INDEX_DIR = ANALYSIS_DIR / "lexical_index"
+MATCH_CACHE_DIR = ANALYSIS_DIR / "match_cache"
+MATCHES_DIR = ANALYSIS_DIR / "matches"
@@ -0,0 +1,306 @@
+"""Incremental pipeline over video analysis, metadata extraction and matching.
+
+The three scripts form a small DAG tracked in the video catalogue::
+
+    video (.mp4) --analysis--> note (.txt) --meta--> metadata (.json) --match--> matches
+
+Metadata records live in one consolidated store (``scripts.meta_store``).
+Each per-video stage records a fingerprint of its input: the analysis cache
+key (video bytes plus every analysis setting) for ANALYSIS and the note's
+SHA-256 for META. A new or changed video therefore re-runs only its own
+analysis, and an edited note only its own metadata. Items stream between
+stages: a video's metadata is extracted as soon as its note is written while
+other videos are still being analysed. Matching consumes all metadata, so it
+runs once the metadata stage drains; its results are reused from the match
+cache (``scripts.match_cache``) while the transcript's candidates are
+unchanged.
+
+Usage:
+    python -m scripts.pipeline ["transcript to match"]
+"""
+
+from __future__ import annotations
+
+import json
+import queue
+import sys
+import threading
+from dataclasses import dataclass, field
+from typing import Any, Optional
+
+from dotenv import load_dotenv
+
+from scripts.batch_runner import BatchSettings
+from scripts.catalogue import PipelineStage, VideoCatalogue
+from scripts.extract_meta import (
+    BATCH_MAX_ITEMS,
+    analysis_fingerprints,
+    build_video_metas,
+)
+from scripts.match_cache import MatchCache
+from scripts.match_videos import Match, match_transcript
+from scripts.meta_store import MetaStore, open_store
+from scripts.paths import (
+    ANALYSIS_DIR,
+    CATALOGUE_PATH,
+    JSON_DIR,
+    MATCH_CACHE_DIR,
+    MATCHES_DIR,
+    META_STORE_DIR,
+    VIDEOS_DIR,
+)
+from scripts.process_videos import (
+    CACHE_DIR,
+    analysis_params,
+    analysis_path,
+    get_video_files,
+    print_catalogue_summary,
+    restore_cached,
+    run_concurrent,
+    run_segmented,
+    save_result,
+    video_segments,
+)
+from scripts.result_cache import ResultCache, sha256_text
+from src.llm import LLMCallError, LLMClient, LLMUsage, VideoLLMClient
+
+META_WORKERS = 4
+
+_STOP = None
+
+
+@dataclass(slots=True)
+class PipelineReport:
+    """What a pipeline run did per stage."""
+
+    analysed: int = 0
+    analysis_failed: int = 0
+    meta_built: int = 0
+    meta_failed: int = 0
+    matches: Optional[list[Match]] = None
+    _lock: threading.Lock = field(default_factory=threading.Lock)
+
+    def count_meta(self, built: int, failed: int) -> None:
+        with self._lock:
+            self.meta_built += built
+            self.meta_failed += failed
+
+
+def _take_batch(
+    items: queue.Queue[Optional[str]], max_items: int
+) -> tuple[list[str], bool]:
+    """Block for one item, then take whatever else is queued up to ``max_items``.
+
+    Returns:
+        Tuple of (items, whether the stop marker was reached)
+    """
+    batch: list[str] = []
+    item = items.get()
+    while item is not _STOP:
+        batch.append(item)
+        if len(batch) >= max_items:
+            return batch, False
+        try:
+            item = items.get_nowait()
+        except queue.Empty:
+            return batch, False
+    return batch, True
+
+
+def run_match_stage(
+    transcript: str, llm_client: LLMClient, store: MetaStore
+) -> list[Match]:
+    """Match ``transcript`` against all metadata, reusing cached matches."""
+    output_path = MATCHES_DIR / f"{sha256_text(transcript)[:16]}.json"
+    cache = MatchCache(MATCH_CACHE_DIR)
+    try:
+        matches = match_transcript(transcript, store, llm_client, cache)
+    except LLMCallError as e:
+        print(f"Error calling LLM: {e}")
+        return []
+    finally:
+        cache.flush()
+
+    MATCHES_DIR.mkdir(parents=True, exist_ok=True)
+    output_path.write_text(
+        json.dumps(
+            {
+                "transcript": transcript,
+                "matches": [m.model_dump() for m in matches],
+            },
+            indent=2,
+        ),
+        encoding="utf-8",
+    )
+    print(f"Saved matches to {output_path}")
+    return matches
+
+
+def run_pipeline(
+    video_client: VideoLLMClient,
+    llm_client: LLMClient,
+    transcript: Optional[str] = None,
+    settings: Optional[BatchSettings] = None,
+) -> PipelineReport:
+    """Bring every stage up to date, re-running only what changed."""
+    report = PipelineReport()
+    catalogue = VideoCatalogue(CATALOGUE_PATH)
+    interrupted = catalogue.recover_interrupted()
+    if interrupted:
+        print(f"Resuming {interrupted} stages interrupted in a previous run.")
+    catalogue.sync_videos(VIDEOS_DIR)
+    store = open_store(META_STORE_DIR, JSON_DIR)
+
+    # Fingerprint every stage input; only mismatches become pending
+    cache = ResultCache(CACHE_DIR)
+    params = analysis_params(video_client.config.model)
+    cache_keys = {
+        video_file: cache.key_for(VIDEOS_DIR / video_file, params)
+        for video_file in get_video_files()
+    }
+    cache.flush()
+    stale_analyses = catalogue.invalidate_changed(PipelineStage.ANALYSIS, cache_keys)
+
+    notes = analysis_fingerprints(ANALYSIS_DIR)
+    for video_file in notes:
+        catalogue.register(video_file, done_stages=[PipelineStage.ANALYSIS])
+    stale_notes = catalogue.invalidate_changed(PipelineStage.META, notes)
+    print(
+        f"{stale_analyses} analyses and {stale_notes} notes changed since "
+        "their last run."
+    )
+
+    # Metadata workers start right away and consume notes as they appear
+    meta_queue: queue.Queue[Optional[str]] = queue.Queue()
+    for video_file in catalogue.pending(
+        PipelineStage.META, after=PipelineStage.ANALYSIS
+    ):
+        meta_queue.put(video_file)
+
+    def meta_worker() -> None:
+        # Notes that arrived while a worker was busy share its next request
+        stopped = False
+        while not stopped:
+            video_files, stopped = _take_batch(meta_queue, BATCH_MAX_ITEMS)
+            if video_files:
+                report.count_meta(
+                    *build_video_metas(
+                        video_files, catalogue, llm_client, store, ANALYSIS_DIR
+                    )
+                )
+
+    meta_threads = [
+        threading.Thread(target=meta_worker, daemon=True)
+        for _ in range(META_WORKERS)
+    ]
+    for thread in meta_threads:
+        thread.start()
+
+    try:
+        _run_analysis_stage(
+            video_client, catalogue, cache, params, meta_queue, report, settings
+        )
+    finally:
+        for _ in meta_threads:
+            meta_queue.put(_STOP)
+        for thread in meta_threads:
+            thread.join()
+        store.compact()
+
+    if transcript:
+        report.matches = run_match_stage(transcript, llm_client, store)
+
+    print_catalogue_summary(catalogue)
+    catalogue.close()
+    return report
+
+
+def _run_analysis_stage(
+    video_client: VideoLLMClient,
+    catalogue: VideoCatalogue,
+    cache: ResultCache,
+    params: dict[str, Any],
+    meta_queue: queue.Queue,
+    report: PipelineReport,
+    settings: Optional[BatchSettings],
+) -> None:
+    """Analyse pending videos, handing each finished note to ``meta_queue``."""
+    video_files = catalogue.pending(PipelineStage.ANALYSIS)
+    pending_files, cache_keys = restore_cached(cache, video_files, params)
+    for video_file in video_files:
+        if video_file not in pending_files:
+            catalogue.mark_done(
+                video_file, PipelineStage.ANALYSIS, cache_keys[video_file]
+            )
+            meta_queue.put(video_file)
+    if not pending_files:
+        return
+
+    def decoded(video_file: str, error: Optional[Exception]) -> None:
+        if error is None:
+            catalogue.mark_done(video_file, PipelineStage.FRAMES)
+        else:
+            catalogue.mark_failed(video_file, PipelineStage.FRAMES, error)
+
+    def write(video_file: str, result: Any) -> None:
+        # Streamed analyses are already on disk; ``result`` is their usage
+        if isinstance(result, LLMUsage):
+            cache.put_file(cache_keys[video_file], analysis_path(video_file))
+        else:
+            save_result(video_file, result)
+            cache.put(cache_keys[video_file], result.content)
+        catalogue.mark_done(
+            video_file, PipelineStage.ANALYSIS, cache_keys[video_file]
+        )
+        report.analysed += 1
+        meta_queue.put(video_file)
+
+    long_videos = {
+        video_file: segments
+        for video_file in pending_files
+        if (segments := video_segments(video_file))
+    }
+    long_successful, _ = run_segmented(video_client, long_videos, write, catalogue)
+    report.analysis_failed += len(long_videos) - long_successful
+
+    video_files = [f for f in pending_files if f not in long_videos]
+    if not video_files:
+        return
+    for video_file in video_files:
+        catalogue.mark_started(video_file, PipelineStage.FRAMES)
+        catalogue.mark_started(video_file, PipelineStage.ANALYSIS)
+    errors = run_concurrent(
+        video_client,
+        video_files,
+        settings or BatchSettings.from_env(),
+        write,
+        on_decoded=decoded,
+        long_videos=len(long_videos),
+        long_successful=long_successful,
+    )
+    for video_file, error in errors.items():
+        catalogue.mark_failed(video_file, PipelineStage.ANALYSIS, error)
+    report.analysis_failed += len(errors)
+
+
+def main() -> None:
+    transcript = sys.argv[1] if len(sys.argv) > 1 else None
+
+    load_dotenv()
+    report = run_pipeline(
+        VideoLLMClient.from_env(), LLMClient.from_env(), transcript=transcript
+    )
+
+    print("\n" + "=" * 80)
+    print("PIPELINE COMPLETE")
+    print("=" * 80)
+    print(f"Analysed: {report.analysed} ({report.analysis_failed} failed)")
+    print(f"Metadata: {report.meta_built} ({report.meta_failed} failed)")
+    if report.matches is not None:
+        print("Matched videos (sorted by relevance):")
+        for match in report.matches:
+            print(f"- {match.filename}: Score {match.score}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,23 +1,50 @@
 """Video processing script using VideoLLMClient.
 
-Processes videos one by one from the R2 bucket and analyzes them using the video LLM.
+Processes videos from the R2 bucket and analyzes them using the video LLM,
+either one by one or concurrently (see ``BatchSettings``).
 """
 
 from __future__ import annotations
 
-import base64
-import io
 import json
+import os
+import time
 from pathlib import Path
-from typing import Optional
+from typing import Any, Callable, Optional
 
 import cv2
 import numpy as np
 from dotenv import load_dotenv
-from PIL import Image
 from pydantic import BaseModel, Field
 
-from src.llm import VideoLLMClient
+from scripts.batch_runner import BatchRunner, BatchSettings, StageTimings
+from scripts.catalogue import PipelineStage, VideoCatalogue, probe_video
+from scripts.frame_dedup import FrameDeduplicator
+from scripts.frame_encoding import (
+    encode_within_budget,
+    resize_to_max_edge,
+    to_data_uri,
+    write_frame,
+)
+from scripts.frame_mosaic import build_mosaic, mosaic_prompt
+from scripts.frame_sampling import iter_sampled_frames, uniform_frame_indices
+from scripts.frame_store import FrameStore
+from scripts.generation_guard import (
+    RepetitionDetector,
+    RunawayGenerationError,
+    output_token_budget,
+)
+from scripts.keyframes import FrameStrategy, select_keyframes
+from scripts.paths import ANALYSIS_DIR, CATALOGUE_PATH, VIDEOS_DIR
+from scripts.result_cache import ResultCache, sha256_text
+from scripts.segmented_analysis import (
+    VideoSegment,
+    analyze_segments,
+    merge_segment_analyses,
+    plan_segments,
+    segment_prompt,
+)
+from src.llm import LLMCallError, LLMUsage, VideoLLMClient
 
 
 class VideoAnalysisResult(BaseModel):
@@ -29,8 +56,51 @@ class VideoAnalysisResult(BaseModel):
 
 
 # Configuration
-VIDEOS_DIR = Path(__file__).parent / "videos"
+CACHE_DIR = VIDEOS_DIR / ".cache"
 NUM_FRAMES = 3
+# Encoding: frames are downscaled to MAX_FRAME_EDGE pixels on the longest side
+# (768 fits a single Gemini image tile) and JPEG quality is lowered from
+# JPEG_QUALITY towards MIN_JPEG_QUALITY until a frame fits FRAME_BYTE_BUDGET.
+MAX_FRAME_EDGE: Optional[int] = 768
+JPEG_QUALITY = 70
+MIN_JPEG_QUALITY = 40
+FRAME_BYTE_BUDGET: Optional[int] = 60_000
+# Frame selection: UNIFORM uses NUM_FRAMES evenly spaced frames, KEYFRAMES
+# picks between MIN_FRAMES and MAX_FRAMES based on shots and motion.
+FRAME_STRATEGY = FrameStrategy.UNIFORM
+MIN_FRAMES = 2
+MAX_FRAMES = 8
+# Frames whose dHash differs from an already kept frame by at most this many
+# bits are dropped before encoding. Set to None to keep every frame.
+DEDUP_HAMMING_THRESHOLD: Optional[int] = 6
+# Mosaic mode tiles all frames into one labelled grid image (MOSAIC_COLUMNS
+# None picks a near-square layout) to pay the per-image overhead only once.
+MOSAIC_MODE = False
+MOSAIC_COLUMNS: Optional[int] = None
+MOSAIC_CELL_SIZE = (512, 288)
+# Output budget per analysis: OUTPUT_TOKENS_BASE plus OUTPUT_TOKENS_PER_FRAME
+# for every frame, capped at OUTPUT_TOKENS_CAP. Responses that exceed it or
+# loop on repeated text are saved as <name>.txt.truncated and retried next run.
+OUTPUT_TOKENS_BASE = 2000
+OUTPUT_TOKENS_PER_FRAME = 1500
+OUTPUT_TOKENS_CAP = 16000
+# Stream completions straight into the analysis file (written as
+# <name>.txt.partial and renamed when complete) instead of buffering them.
+STREAM_RESPONSES = False
+# Sampled, downscaled frames are kept as memory-mapped arrays so prompt
+# experiments and re-runs skip decoding. Oldest entries are evicted past
+# FRAME_STORE_MAX_BYTES.
+USE_FRAME_STORE = True
+FRAME_STORE_DIR = CACHE_DIR / "frames"
+FRAME_STORE_MAX_BYTES = 2 * 1024**3
+# Videos longer than SEGMENT_MIN_SECONDS are split into SEGMENT_SECONDS
+# windows with SEGMENT_FRAMES uniform frames each. Up to SEGMENT_WORKERS
+# windows are analysed at once and merged into one timestamped document.
+SEGMENTED_MODE = True
+SEGMENT_MIN_SECONDS = 120.0
+SEGMENT_SECONDS = 60.0
+SEGMENT_FRAMES = NUM_FRAMES
+SEGMENT_WORKERS = 4
 
 
 # Default prompt - update this as needed
@@ -65,67 +135,189 @@ Do not use "I see" or "The image shows." Start sentences directly with the data.
 """
 
 
-def extract_frames_from_video(
-    video_path: Path, num_frames: int = 10, save_frames: bool = True
-) -> list[str]:
-    """Extract evenly spaced frames from video and convert to base64 data URIs.
+def frame_sampling_params(
+    num_frames: int, strategy: FrameStrategy
+) -> dict[str, Any]:
+    """Settings that determine which frames are sampled and at what size."""
+    return {
+        "strategy": strategy.value,
+        "num_frames": num_frames,
+        "min_frames": MIN_FRAMES,
+        "max_frames": MAX_FRAMES,
+        "max_frame_edge": MAX_FRAME_EDGE,
+    }
+
+
+def sample_frames(
+    video_path: Path,
+    num_frames: int = 10,
+    strategy: FrameStrategy = FrameStrategy.UNIFORM,
+    segment: Optional[VideoSegment] = None,
+) -> list[np.ndarray]:
+    """Select, decode and downscale frames, reusing the frame store if possible.
 
     Args:
         video_path: Path to the video file
-        num_frames: Number of frames to extract
-        save_frames: Whether to save frames as JPEG files for debugging
+        num_frames: Number of frames to extract (UNIFORM strategy only)
+        strategy: How frames are selected (see ``FrameStrategy``)
+        segment: Only sample inside this time window; always uniform, since
+            keyframe selection needs a pass over the whole video
 
     Returns:
-        List of base64-encoded data URIs (data:image/jpeg;base64,{base64})
+        BGR frames in chronological order (memory-mapped on a store hit)
     """
+    store = (
+        FrameStore(FRAME_STORE_DIR, FRAME_STORE_MAX_BYTES)
+        if USE_FRAME_STORE
+        else None
+    )
+    if segment is not None:
+        strategy = FrameStrategy.UNIFORM
+
+    store_key = None
+    if store is not None:
+        params = frame_sampling_params(num_frames, strategy)
+        if segment is not None:
+            params["segment"] = (segment.start_frame, segment.end_frame)
+        store_key = store.key_for(video_path, params)
+        stored = store.load(store_key)
+        if stored is not None:
+            print(f"Loaded {len(stored.frames)} frames from frame store")
+            return list(stored.frames)
+
     cap = cv2.VideoCapture(str(video_path))
     total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
 
-    if total_frames == 0:
+    if total_frames <= 0:
+        cap.release()
         raise ValueError(f"Could not read frames from {video_path}")
 
+    # Calculate frame indices to extract
+    if segment is not None:
+        frame_indices = segment.frame_indices(num_frames)
+    elif strategy is FrameStrategy.KEYFRAMES:
+        selection = select_keyframes(
+            video_path, min_frames=MIN_FRAMES, max_frames=MAX_FRAMES
+        )
+        frame_indices = selection.frame_indices
+        print(
+            f"Keyframes: {len(frame_indices)} frames "
+            f"({selection.shot_count} shots, "
+            f"{selection.motion_peak_count} motion peaks)"
+        )
+    else:
+        frame_indices = uniform_frame_indices(total_frames, num_frames)
+
+    decoded_indices = []
+    frames = []
+    try:
+        for idx, frame in iter_sampled_frames(cap, frame_indices):
+            # Downscale first: the model would downsample anyway
+            decoded_indices.append(idx)
+            frames.append(resize_to_max_edge(frame, MAX_FRAME_EDGE))
+    finally:
+        cap.release()
+
+    if store is not None and store_key is not None:
+        store.save(store_key, video_path, decoded_indices, frames)
+
+    return frames
+
+
+def extract_frames_from_video(
+    video_path: Path,
+    num_frames: int = 10,
+    save_frames: bool = True,
+    strategy: FrameStrategy = FrameStrategy.UNIFORM,
+    dedup_threshold: Optional[int] = DEDUP_HAMMING_THRESHOLD,
+    mosaic: bool = MOSAIC_MODE,
+    segment: Optional[VideoSegment] = None,
+) -> list[str]:
+    """Extract frames from video and convert to base64 data URIs.
+
+    Frames are decoded in a single forward pass (see ``iter_sampled_frames``)
+    instead of seeking before every read, and kept in the frame store so
+    re-runs skip the decoder entirely.
+
+    Args:
+        video_path: Path to the video file
+        num_frames: Number of frames to extract (UNIFORM strategy only)
+        save_frames: Whether to save frames as JPEG files for debugging
+        strategy: How frames are selected (see ``FrameStrategy``)
+        dedup_threshold: Hamming distance for near-duplicate removal (None disables)
+        mosaic: Pack all frames into a single labelled grid image
+        segment: Only sample inside this time window (see ``sample_frames``)
+
+    Returns:
+        List of base64-encoded data URIs (data:image/jpeg;base64,{base64}),
+        with a single entry in mosaic mode
+    """
+    frames = sample_frames(video_path, num_frames, strategy, segment)
+
     # Create frames directory if saving is enabled
     frames_dir = None
     if save_frames:
         frames_dir = VIDEOS_DIR / "frames" / video_path.stem
+        if segment is not None:
+            frames_dir /= f"segment_{segment.index:03d}"
         frames_dir.mkdir(parents=True, exist_ok=True)
 
-    # Calculate frame indices to extract (evenly spaced)
-    frame_indices = np.linspace(0, total_frames - 1, num_frames, dtype=int)
-
+    dedup = (
+        FrameDeduplicator(threshold=dedup_threshold)
+        if dedup_threshold is not None
+        else None
+    )
     frames_base64 = []
+    mosaic_frames = []
 
-    for frame_num, idx in enumerate(frame_indices):
-        cap.set(cv2.CAP_PROP_POS_FRAMES, idx)
-        ret, frame = cap.read()
-
-        if not ret:
+    frame_num = 0
+    for frame in frames:
+        # Skip near-duplicates before paying for encoding
+        if dedup is not None and dedup.is_duplicate(frame):
             continue
 
-        # Convert BGR to RGB
-        frame_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-
-        # Convert to PIL Image
-        pil_image = Image.fromarray(frame_rgb)
+        # Mosaic cells are encoded together after the loop
+        if mosaic:
+            mosaic_frames.append(frame)
+            continue
 
-        # Convert to JPEG bytes
-        buffer = io.BytesIO()
-        pil_image.save(buffer, format="JPEG", quality=70)
-        img_bytes = buffer.getvalue()
+        # Encode once; the same bytes go to disk and into the data URI
+        img_bytes, _ = encode_within_budget(
+            frame,
+            max_quality=JPEG_QUALITY,
+            min_quality=MIN_JPEG_QUALITY,
+            max_bytes=FRAME_BYTE_BUDGET,
+        )
 
         # Save frame to disk if enabled
         if save_frames and frames_dir:
-            frame_path = frames_dir / f"frame_{frame_num:03d}.jpg"
-            pil_image.save(frame_path, format="JPEG", quality=70)
-
-        # Encode to base64
-        base64_str = base64.b64encode(img_bytes).decode("utf-8")
-
-        # Create data URI
-        data_uri = f"data:image/jpeg;base64,{base64_str}"
-        frames_base64.append(data_uri)
+            write_frame(frames_dir / f"frame_{frame_num:03d}.jpg", img_bytes)
+
+        frames_base64.append(to_data_uri(img_bytes))
+        frame_num += 1
+
+    if mosaic and mosaic_frames:
+        grid = build_mosaic(mosaic_frames, MOSAIC_COLUMNS, MOSAIC_CELL_SIZE)
+        # The grid gets the combined budget of the frames it replaces
+        grid_budget = (
+            FRAME_BYTE_BUDGET * len(mosaic_frames) if FRAME_BYTE_BUDGET else None
+        )
+        img_bytes, _ = encode_within_budget(
+            grid,
+            max_quality=JPEG_QUALITY,
+            min_quality=MIN_JPEG_QUALITY,
+            max_bytes=grid_budget,
+        )
+        if save_frames and frames_dir:
+            write_frame(frames_dir / "mosaic.jpg", img_bytes)
+        frames_base64.append(to_data_uri(img_bytes))
+        print(f"Packed {len(mosaic_frames)} frames into one mosaic")
 
-    cap.release()
+    if dedup is not None and dedup.dropped:
+        print(
+            f"Dropped {dedup.dropped} near-duplicate frames "
+            f"(~{dedup.tokens_saved} image tokens saved)"
+        )
 
     return frames_base64
 
@@ -137,10 +329,158 @@ def get_video_files() -> list[str]:
     return sorted([f.name for f in VIDEOS_DIR.glob("*.mp4")])
 
 
+def decode_video(
+    video_filename: str, strategy: FrameStrategy = FRAME_STRATEGY
+) -> list[str]:
+    """Select, decode and encode the frames of a video as data URIs."""
+    video_path = VIDEOS_DIR / video_filename
+
+    print(f"Extracting frames from {video_filename} ({strategy.value})...")
+    frame_data_uris = extract_frames_from_video(
+        video_path, num_frames=NUM_FRAMES, strategy=strategy
+    )
+    print(f"Extracted {len(frame_data_uris)} frames")
+    return frame_data_uris
+
+
+def analysis_prompt(prompt: Optional[str] = None, mosaic: bool = MOSAIC_MODE) -> str:
+    """Prompt sent with the frames, adjusted for mosaic input if needed."""
+    text = prompt or DEFAULT_PROMPT
+    return mosaic_prompt(text) if mosaic else text
+
+
+def analysis_token_budget(
+    frame_data_uris: list[str], mosaic: bool = MOSAIC_MODE
+) -> int:
+    """Output token budget for analysing the given encoded frames."""
+    frame_count = len(frame_data_uris)
+    if mosaic:
+        # A mosaic is one image but carries up to every sampled frame
+        keyframes = FRAME_STRATEGY is FrameStrategy.KEYFRAMES
+        frame_count = MAX_FRAMES if keyframes else NUM_FRAMES
+    return output_token_budget(
+        frame_count, OUTPUT_TOKENS_BASE, OUTPUT_TOKENS_PER_FRAME, OUTPUT_TOKENS_CAP
+    )
+
+
+def truncated_path(video_filename: str) -> Path:
+    """Where a guarded, cut-short analysis is kept for inspection."""
+    return analysis_path(video_filename).with_suffix(".txt.truncated")
+
+
+def budget_exhausted(usage: LLMUsage, max_tokens: int) -> Optional[str]:
+    """Why a finished response counts as truncated, judged by provider usage."""
+    if usage.finish_reason == "length" or usage.completion_tokens >= max_tokens:
+        return f"output reached {max_tokens} token budget"
+    return None
+
+
+def analyze_frames(
+    client: VideoLLMClient,
+    video_filename: str,
+    frame_data_uris: list[str],
+    prompt: Optional[str] = None,
+    mosaic: bool = MOSAIC_MODE,
+) -> VideoAnalysisResult:
+    """Send encoded frames to the video LLM and return its analysis.
+
+    Raises:
+        RunawayGenerationError: If the response hit the output budget or is a
+            repetition loop; the text is saved to ``truncated_path``
+    """
+    max_tokens = analysis_token_budget(frame_data_uris, mosaic)
+    result, usage = client.invoke_with_media_and_usage(
+        text=analysis_prompt(prompt, mosaic),
+        image_blobs=frame_data_uris,
+        output_model=VideoAnalysisResult,
+        max_tokens=max_tokens,
+    )
+
+    if RepetitionDetector().feed(result.content):
+        reason = "repetition loop detected"
+    else:
+        reason = budget_exhausted(usage, max_tokens)
+    if reason is not None:
+        output_path = truncated_path(video_filename)
+        output_path.parent.mkdir(exist_ok=True)
+        output_path.write_text(result.content, encoding="utf-8")
+        raise RunawayGenerationError(reason)
+
+    return result
+
+
+def stream_analysis(
+    client: VideoLLMClient,
+    video_filename: str,
+    frame_data_uris: list[str],
+    prompt: Optional[str] = None,
+    mosaic: bool = MOSAIC_MODE,
+) -> LLMUsage:
+    """Stream the analysis of encoded frames directly into the analysis file.
+
+    Chunks are flushed to ``<name>.txt.partial`` as they arrive, so memory
+    stays flat and an interrupted generation leaves a partial result. The
+    file is renamed to ``<name>.txt`` once the stream completes. The stream
+    is aborted as soon as the output loops; the provider enforces the token
+    budget and its usage says whether the output was cut off.
+
+    Returns:
+        LLMUsage including time to first token
+
+    Raises:
+        RunawayGenerationError: If the guard aborted the stream; the partial
+            text is kept at ``truncated_path``
+    """
+    output_path = analysis_path(video_filename)
+    output_path.parent.mkdir(exist_ok=True)
+    partial_path = output_path.with_suffix(".txt.partial")
+
+    max_tokens = analysis_token_budget(frame_data_uris, mosaic)
+    detector = RepetitionDetector()
+    stream = client.stream_with_media(
+        text=analysis_prompt(prompt, mosaic),
+        image_blobs=frame_data_uris,
+        max_tokens=max_tokens,
+    )
+
+    reason = None
+    with open(partial_path, "w", encoding="utf-8") as f:
+        for chunk in stream:
+            f.write(chunk)
+            f.flush()
+            if detector.feed(chunk):
+                reason = "repetition loop detected"
+                stream.close()
+                break
+
+    if reason is None:
+        reason = budget_exhausted(stream.usage, max_tokens)
+    if reason is not None:
+        os.replace(partial_path, truncated_path(video_filename))
+        raise RunawayGenerationError(reason)
+
+    if not partial_path.stat().st_size:
+        raise LLMCallError("Video LLM returned empty response")
+    os.replace(partial_path, output_path)
+    print(f"Saved to: {output_path}")
+    return stream.usage
+
+
+def format_stream_stats(usage: LLMUsage) -> str:
+    """One-line summary of a streamed completion."""
+    ttft = usage.time_to_first_token
+    ttft_text = f"{ttft:.2f}s" if ttft is not None else "n/a"
+    return (
+        f"TTFT: {ttft_text}, {usage.completion_tokens} tokens in "
+        f"{usage.latency_seconds:.1f}s ({usage.tokens_per_second:.1f} tok/s)"
+    )
+
+
 def process_video(
     client: VideoLLMClient,
     video_filename: str,
     prompt: Optional[str] = None,
+    strategy: FrameStrategy = FRAME_STRATEGY,
 ) -> VideoAnalysisResult:
     """
     Process a single video by extracting frames and analyzing them.
@@ -149,32 +489,147 @@ def process_video(
         client: VideoLLMClient instance
         video_filename: Name of the video file
         prompt: Custom prompt (uses DEFAULT_PROMPT if not provided)
+        strategy: Frame selection strategy (defaults to FRAME_STRATEGY)
 
     Returns:
         VideoAnalysisResult with the analysis
     """
     video_path = VIDEOS_DIR / video_filename
-    analysis_prompt = prompt or DEFAULT_PROMPT
 
     print(f"\n{'='*80}")
     print(f"Processing: {video_filename}")
     print(f"Path: {video_path}")
     print(f"{'='*80}\n")
 
+    # Long videos are analysed window by window
+    segments = video_segments(video_filename)
+    if segments:
+        return analyze_segmented(client, video_filename, segments, prompt)
+
     # Extract frames from video
-    print(f"Extracting {NUM_FRAMES} frames...")
-    frame_data_uris = extract_frames_from_video(video_path, num_frames=NUM_FRAMES)
-    print(f"Extracted {len(frame_data_uris)} frames")
+    frame_data_uris = decode_video(video_filename, strategy)
 
     # Analyze frames using video LLM
     print("Sending to LLM for analysis...")
-    result = client.invoke_with_media(
-        text=analysis_prompt,
-        image_blobs=frame_data_uris,
-        output_model=VideoAnalysisResult,
+    return analyze_frames(client, video_filename, frame_data_uris, prompt)
+
+
+def video_segments(video_filename: str) -> list[VideoSegment]:
+    """Time windows to analyse separately, or [] for a single-pass video."""
+    if not SEGMENTED_MODE:
+        return []
+    probe = probe_video(VIDEOS_DIR / video_filename)
+    if probe.duration <= SEGMENT_MIN_SECONDS:
+        return []
+    return plan_segments(probe.frame_count, probe.fps, SEGMENT_SECONDS)
+
+
+def segment_filename(video_filename: str, segment: VideoSegment) -> str:
+    """Name used for per-segment outputs such as truncated analyses."""
+    path = Path(video_filename)
+    return f"{path.stem}.segment_{segment.index:03d}{path.suffix}"
+
+
+def analyze_segmented(
+    client: VideoLLMClient,
+    video_filename: str,
+    segments: list[VideoSegment],
+    prompt: Optional[str] = None,
+) -> VideoAnalysisResult:
+    """Analyse every segment of a long video concurrently and merge them.
+
+    Each of up to SEGMENT_WORKERS threads decodes its own window and makes its
+    own LLM call, so both stages overlap across segments.
+
+    Raises:
+        RunawayGenerationError: If any segment was cut short by the guard
+    """
+    video_path = VIDEOS_DIR / video_filename
+    print(
+        f"Segmented analysis of {video_filename}: {len(segments)} segments of "
+        f"{SEGMENT_SECONDS:.0f}s, {SEGMENT_WORKERS} workers"
     )
 
-    return result
+    def analyze(segment: VideoSegment) -> str:
+        frame_data_uris = extract_frames_from_video(
+            video_path, num_frames=SEGMENT_FRAMES, segment=segment
+        )
+        result = analyze_frames(
+            client,
+            segment_filename(video_filename, segment),
+            frame_data_uris,
+            segment_prompt(prompt or DEFAULT_PROMPT, segment, len(segments)),
+        )
+        print(f"  segment {segment.index + 1}/{len(segments)} [{segment.label}] done")
+        return result.content
+
+    analyses = analyze_segments(segments, analyze, SEGMENT_WORKERS)
+    return VideoAnalysisResult(
+        content=merge_segment_analyses(video_filename, segments, analyses)
+    )
+
+
+def analysis_path(video_filename: str) -> Path:
+    """Path of the analysis txt file for a video (replaces .mp4 with .txt)."""
+    return ANALYSIS_DIR / (Path(video_filename).stem + ".txt")
+
+
+def analysis_params(model: str, prompt: Optional[str] = None) -> dict[str, Any]:
+    """Every setting that changes the analysis output, used for cache keys."""
+    return {
+        "prompt": sha256_text(analysis_prompt(prompt)),
+        "model": model,
+        **frame_sampling_params(NUM_FRAMES, FRAME_STRATEGY),
+        "dedup_threshold": DEDUP_HAMMING_THRESHOLD,
+        "jpeg_quality": JPEG_QUALITY,
+        "min_jpeg_quality": MIN_JPEG_QUALITY,
+        "frame_byte_budget": FRAME_BYTE_BUDGET,
+        "mosaic": MOSAIC_MODE,
+        "mosaic_columns": MOSAIC_COLUMNS,
+        "mosaic_cell_size": MOSAIC_CELL_SIZE,
+        "segmented": SEGMENTED_MODE,
+        "segment_min_seconds": SEGMENT_MIN_SECONDS,
+        "segment_seconds": SEGMENT_SECONDS,
+        "segment_frames": SEGMENT_FRAMES,
+    }
+
+
+def restore_cached(
+    cache: ResultCache,
+    video_files: list[str],
+    params: dict[str, Any],
+) -> tuple[list[str], dict[str, str]]:
+    """Split videos into cache misses and compute the cache key of each.
+
+    Cache hits skip decode and the LLM call; their analysis file is rewritten
+    from the cache if it is missing or holds another analysis (say, one made
+    with settings that have since been reverted).
+
+    Returns:
+        Tuple of (videos still to process, cache key per video)
+    """
+    keys = {
+        video_file: cache.key_for(VIDEOS_DIR / video_file, params)
+        for video_file in video_files
+    }
+    cache.flush()
+
+    pending = []
+    for video_file in video_files:
+        cached = cache.get(keys[video_file])
+        if cached is None:
+            pending.append(video_file)
+        elif cached != read_analysis(video_file):
+            save_result(video_file, VideoAnalysisResult(content=cached))
+    return pending, keys
+
+
+def read_analysis(video_filename: str) -> Optional[str]:
+    """Current analysis file of a video, or None if there is none."""
+    try:
+        return analysis_path(video_filename).read_text(encoding="utf-8")
+    except FileNotFoundError:
+        return None
 
 
 def save_result(
@@ -182,13 +637,10 @@ def save_result(
     result: VideoAnalysisResult,
 ) -> None:
     """Save a single video analysis result to a txt file."""
-    # Create analysis directory if it doesn't exist
-    analysis_dir = VIDEOS_DIR / "analysis"
-    analysis_dir.mkdir(exist_ok=True)
+    output_path = analysis_path(video_filename)
 
-    # Create output filename (replace .mp4 with .txt)
-    output_filename = Path(video_filename).stem + ".txt"
-    output_path = analysis_dir / output_filename
+    # Create analysis directory if it doesn't exist
+    output_path.parent.mkdir(exist_ok=True)
 
     # Save content to file
     with open(output_path, "w", encoding="utf-8") as f:
@@ -206,37 +658,279 @@ def main() -> None:
 
     client = VideoLLMClient.from_env()
 
-    # Get list of videos
-    video_files = get_video_files()
+    # Register new or changed videos; unchanged ones cost a single stat
+    catalogue = VideoCatalogue(CATALOGUE_PATH)
+    interrupted = catalogue.recover_interrupted()
+    if interrupted:
+        print(f"Resuming {interrupted} stages interrupted in a previous run.")
+    changed = catalogue.sync_videos(VIDEOS_DIR)
+
+    # Analyses made with other settings (prompt, model, frames) are stale
+    cache = ResultCache(CACHE_DIR)
+    params = analysis_params(client.config.model)
+    current_keys = {
+        video_file: cache.key_for(VIDEOS_DIR / video_file, params)
+        for video_file in get_video_files()
+    }
+    cache.flush()
+    stale = catalogue.invalidate_changed(PipelineStage.ANALYSIS, current_keys)
+    video_files = catalogue.pending(PipelineStage.ANALYSIS)
     if not video_files:
-        print("No video files found in the videos directory.")
+        print("No videos pending analysis.")
+        print_catalogue_summary(catalogue)
         return
 
-    print(f"Found {len(video_files)} videos to process.\n")
+    print(
+        f"{changed} new or changed videos, {stale} analysed with other settings, "
+        f"{len(video_files)} pending analysis."
+    )
+
+    # Skip videos whose inputs are unchanged since their last analysis
+    total_videos = len(video_files)
+    pending_files, cache_keys = restore_cached(cache, video_files, params)
+    for video_file in set(video_files) - set(pending_files):
+        catalogue.mark_done(
+            video_file, PipelineStage.ANALYSIS, cache_keys[video_file]
+        )
+    video_files = pending_files
+    cached = total_videos - len(video_files)
+    print(f"{cached} cached, {len(video_files)} to process.\n")
+
+    def decoded(video_file: str, error: Optional[Exception]) -> None:
+        if error is None:
+            catalogue.mark_done(video_file, PipelineStage.FRAMES)
+        else:
+            catalogue.mark_failed(video_file, PipelineStage.FRAMES, error)
+
+    def store(video_file: str, result: VideoAnalysisResult) -> None:
+        save_result(video_file, result)
+        cache.put(cache_keys[video_file], result.content)
+        catalogue.mark_done(
+            video_file, PipelineStage.ANALYSIS, cache_keys[video_file]
+        )
+
+    def store_streamed(video_file: str, usage: LLMUsage) -> None:
+        print(f"{video_file}: {format_stream_stats(usage)}")
+        cache.put_file(cache_keys[video_file], analysis_path(video_file))
+        catalogue.mark_done(
+            video_file, PipelineStage.ANALYSIS, cache_keys[video_file]
+        )
+
+    # Long videos fan out over segments themselves, so run them one at a time
+    long_videos = {
+        video_file: segments
+        for video_file in video_files
+        if (segments := video_segments(video_file))
+    }
+    long_successful, long_truncated = run_segmented(
+        client, long_videos, store, catalogue
+    )
+    video_files = [f for f in video_files if f not in long_videos]
+
+    settings = BatchSettings.from_env()
+    if not settings.is_sequential:
+        for video_file in video_files:
+            catalogue.mark_started(video_file, PipelineStage.FRAMES)
+            catalogue.mark_started(video_file, PipelineStage.ANALYSIS)
+        write = store_streamed if STREAM_RESPONSES else store
+        errors = run_concurrent(
+            client,
+            video_files,
+            settings,
+            write,
+            cached,
+            on_decoded=decoded,
+            long_videos=len(long_videos),
+            long_successful=long_successful,
+        )
+        for video_file, error in errors.items():
+            catalogue.mark_failed(video_file, PipelineStage.ANALYSIS, error)
+        print_catalogue_summary(catalogue)
+        return
 
     # Process each video
-    successful = 0
-    failed = 0
+    successful = long_successful
+    failed = len(long_videos) - long_successful
+    truncated = list(long_truncated)
+    timings = StageTimings()
+    started = time.perf_counter()
 
     for i, video_file in enumerate(video_files, 1):
         print(f"[{i}/{len(video_files)}] ", end="")
+        catalogue.mark_started(video_file, PipelineStage.ANALYSIS)
         try:
-            result = process_video(client, video_file)
-            save_result(video_file, result)
+            catalogue.mark_started(video_file, PipelineStage.FRAMES)
+            stage_started = time.perf_counter()
+            try:
+                frame_data_uris = decode_video(video_file)
+            except Exception as e:
+                decoded(video_file, e)
+                raise
+            decoded(video_file, None)
+            timings.add("decode", time.perf_counter() - stage_started)
+
+            print("Sending to LLM for analysis...")
+            stage_started = time.perf_counter()
+            try:
+                if STREAM_RESPONSES:
+                    usage = stream_analysis(client, video_file, frame_data_uris)
+                else:
+                    result = analyze_frames(client, video_file, frame_data_uris)
+            finally:
+                timings.add("llm", time.perf_counter() - stage_started)
+
+            stage_started = time.perf_counter()
+            if STREAM_RESPONSES:
+                store_streamed(video_file, usage)
+            else:
+                store(video_file, result)
+            timings.add("write", time.perf_counter() - stage_started)
             successful += 1
             print(f"✓ Success")
-            print(f"Preview: {result.content[:200]}...")
+            if not STREAM_RESPONSES:
+                print(f"Preview: {result.content[:200]}...")
+        except RunawayGenerationError as e:
+            failed += 1
+            truncated.append(video_file)
+            catalogue.mark_failed(video_file, PipelineStage.ANALYSIS, e)
+            print(f"✗ {e}")
         except Exception as e:
             failed += 1
+            catalogue.mark_failed(video_file, PipelineStage.ANALYSIS, e)
             print(f"✗ Error: {e}")
 
     # Print summary
     print("\n" + "=" * 80)
     print("PROCESSING COMPLETE")
     print("=" * 80)
-    print(f"Total videos: {len(video_files)}")
+    print(f"Total videos: {total_videos}")
+    print(f"Cached: {cached}")
     print(f"Successful: {successful}")
     print(f"Failed: {failed}")
+    print_truncated(truncated)
+    print_timings(time.perf_counter() - started, timings)
+    print_catalogue_summary(catalogue)
+
+
+def run_segmented(
+    client: VideoLLMClient,
+    long_videos: dict[str, list[VideoSegment]],
+    write: Callable[[str, VideoAnalysisResult], None],
+    catalogue: VideoCatalogue,
+) -> tuple[int, list[str]]:
+    """Analyse long videos segment by segment, one video at a time.
+
+    Returns:
+        Tuple of (number of successful videos, videos cut short by the guard)
+    """
+    successful = 0
+    truncated = []
+    for i, (video_file, segments) in enumerate(long_videos.items(), 1):
+        print(f"[long {i}/{len(long_videos)}] ", end="")
+        catalogue.mark_started(video_file, PipelineStage.ANALYSIS)
+        try:
+            result = analyze_segmented(client, video_file, segments)
+            # Segments are decoded inside the analysis, so frames finish with it
+            catalogue.mark_done(video_file, PipelineStage.FRAMES)
+            write(video_file, result)
+            successful += 1
+            print("✓ Success")
+        except RunawayGenerationError as e:
+            truncated.append(video_file)
+            catalogue.mark_failed(video_file, PipelineStage.ANALYSIS, e)
+            print(f"✗ {e}")
+        except Exception as e:
+            catalogue.mark_failed(video_file, PipelineStage.ANALYSIS, e)
+            print(f"✗ Error: {e}")
+
+    if long_videos:
+        print(
+            f"Segmented: {successful} successful, "
+            f"{len(long_videos) - successful} failed\n"
+        )
+    return successful, truncated
+
+
+def print_catalogue_summary(catalogue: VideoCatalogue) -> None:
+    """Print video counts per pipeline stage and status."""
+    print("\nCatalogue:")
+    for stage, statuses in catalogue.summary().items():
+        counts = ", ".join(f"{status}: {n}" for status, n in sorted(statuses.items()))
+        print(f"  {stage}: {counts}")
+
+
+def print_truncated(truncated: list[str]) -> None:
+    """List videos whose analysis was cut short and will be retried."""
+    if not truncated:
+        return
+    print(f"Truncated (saved as .txt.truncated, retried on next run): {len(truncated)}")
+    for video_file in truncated:
+        print(f"  - {video_file}")
+
+
+def print_timings(wall_seconds: float, timings: StageTimings) -> None:
+    """Wall time of the run and busy time of every stage."""
+    print(f"Wall time: {wall_seconds:.1f}s")
+    for line in timings.summary_lines():
+        print(f"  {line}")
+
+
+def run_concurrent(
+    client: VideoLLMClient,
+    video_files: list[str],
+    settings: BatchSettings,
+    write: Callable[[str, Any], None] = save_result,
+    cached: int = 0,
+    on_decoded: Optional[Callable[[str, Optional[Exception]], None]] = None,
+    long_videos: int = 0,
+    long_successful: int = 0,
+) -> dict[str, Exception]:
+    """Process videos with separate decode, LLM and writer stages.
+
+    With STREAM_RESPONSES the LLM stage streams into the analysis file itself
+    and ``write`` receives the LLMUsage instead of the result. Long videos
+    already analysed segment by segment are counted in the summary via
+    ``long_videos`` and ``long_successful``.
+
+    Returns:
+        Error per failed video
+    """
+    print(
+        f"Concurrent mode: {settings.decode_workers} decode workers, "
+        f"{settings.max_in_flight} LLM requests in flight\n"
+    )
+
+    def analyze(video_file: str, frames: list[str]) -> Any:
+        if STREAM_RESPONSES:
+            return stream_analysis(client, video_file, frames)
+        return analyze_frames(client, video_file, frames)
+
+    runner: BatchRunner[list[str], Any] = BatchRunner(
+        decode=decode_video,
+        analyze=analyze,
+        write=write,
+        settings=settings,
+        on_decoded=on_decoded,
+    )
+    report = runner.run(video_files)
+
+    # Print summary
+    print("\n" + "=" * 80)
+    print("PROCESSING COMPLETE")
+    print("=" * 80)
+    print(f"Total videos: {len(video_files) + long_videos + cached}")
+    print(f"Cached: {cached}")
+    print(f"Successful: {report.successful + long_successful}")
+    print(f"Failed: {report.failed + long_videos - long_successful}")
+    print_truncated(
+        [
+            video_file
+            for video_file, error in report.errors.items()
+            if isinstance(error, RunawayGenerationError)
+        ]
+    )
+    print_timings(report.wall_seconds, report.timings)
+    return report.errors
 
 
 if __name__ == "__main__":
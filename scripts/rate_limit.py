@@ -0,0 +1,124 @@
+"""Token-bucket rate limiting for concurrent LLM calls.
+
+Providers cap both requests and tokens per minute. ``RateLimiter`` keeps one
+bucket for each and makes a caller wait until both have room for its call.
+When the provider still answers 429, ``call_with_backoff`` pauses the whole
+limiter (not just the failing call) for the ``Retry-After`` delay, or an
+exponential backoff with jitter if none was sent, and retries.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import random
+import time
+from dataclasses import dataclass, field
+from typing import Awaitable, Callable, TypeVar
+
+from src.llm import LLMRateLimitError
+
+T = TypeVar("T")
+
+BACKOFF_BASE_SECONDS = 1.0
+BACKOFF_MAX_SECONDS = 60.0
+
+
+@dataclass(slots=True)
+class TokenBucket:
+    """Bucket refilled continuously at ``rate_per_minute``.
+
+    Holds at most ``capacity`` (0 means one minute's worth). Requests larger
+    than the capacity wait for a full bucket and then proceed.
+    """
+
+    rate_per_minute: float
+    capacity: float = 0.0
+    _level: float = 0.0
+    _updated: float = field(default_factory=time.monotonic)
+
+    def __post_init__(self) -> None:
+        self.capacity = self.capacity or self.rate_per_minute
+        self._level = self.capacity
+
+    def _refill(self, now: float) -> None:
+        elapsed = max(0.0, now - self._updated)
+        self._level = min(
+            self.capacity, self._level + elapsed * self.rate_per_minute / 60
+        )
+        self._updated = now
+
+    def delay_for(self, amount: float, now: float) -> float:
+        """Seconds until ``amount`` can be taken (0 if available now)."""
+        self._refill(now)
+        needed = min(amount, self.capacity) - self._level
+        return max(0.0, needed * 60 / self.rate_per_minute)
+
+    def take(self, amount: float) -> None:
+        self._level -= amount
+
+
+@dataclass(slots=True)
+class RateLimiter:
+    """Requests-per-minute and tokens-per-minute limits shared by all calls."""
+
+    requests_per_minute: float
+    tokens_per_minute: float
+    _requests: TokenBucket = field(init=False)
+    _tokens: TokenBucket = field(init=False)
+    _lock: asyncio.Lock = field(default_factory=asyncio.Lock)
+    _paused_until: float = 0.0
+
+    def __post_init__(self) -> None:
+        self._requests = TokenBucket(self.requests_per_minute)
+        self._tokens = TokenBucket(self.tokens_per_minute)
+
+    async def acquire(self, tokens: int) -> None:
+        """Wait until a call of ``tokens`` tokens fits both limits."""
+        # Waiters queue on the lock, so calls are admitted in arrival order
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                wait = max(
+                    self._paused_until - now,
+                    self._requests.delay_for(1, now),
+                    self._tokens.delay_for(tokens, now),
+                )
+                if wait <= 0:
+                    self._requests.take(1)
+                    self._tokens.take(tokens)
+                    return
+                await asyncio.sleep(wait)
+
+    def pause(self, seconds: float) -> None:
+        """Admit no calls for ``seconds`` (e.g. after a 429)."""
+        self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+
+
+async def call_with_backoff(
+    limiter: RateLimiter,
+    tokens: int,
+    call: Callable[[], Awaitable[T]],
+    max_retries: int = 5,
+) -> T:
+    """Run ``call`` within the rate limits, retrying it on HTTP 429.
+
+    Raises:
+        LLMRateLimitError: If the call is still rate limited after
+            ``max_retries`` retries
+    """
+    attempt = 0
+    while True:
+        await limiter.acquire(tokens)
+        try:
+            return await call()
+        except LLMRateLimitError as exc:
+            if attempt >= max_retries:
+                raise
+            delay = exc.retry_after
+            if delay is None:
+                delay = min(
+                    BACKOFF_MAX_SECONDS, BACKOFF_BASE_SECONDS * 2**attempt
+                ) * random.uniform(0.5, 1.5)
+            print(f"Rate limited, pausing requests for {delay:.1f}s")
+            limiter.pause(delay)
+            attempt += 1
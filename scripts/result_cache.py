@@ -0,0 +1,112 @@
+"""Content-addressed cache of video analysis results.
+
+An entry is keyed by the SHA-256 of the video bytes combined with every input
+that influences the analysis (prompt, model, frame selection and JPEG
+settings). Changing any of them only misses the entries it affects.
+
+Hashing thousands of HD clips on every run would dominate a re-run, so file
+digests are memoised by ``(size, mtime_ns)`` in a small JSON index.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import shutil
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Optional
+
+HASH_CHUNK_SIZE = 1 << 20
+
+
+def sha256_text(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def sha256_file(path: Path) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        while chunk := f.read(HASH_CHUNK_SIZE):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _write_atomic(path: Path, text: str) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_suffix(path.suffix + ".tmp")
+    tmp_path.write_text(text, encoding="utf-8")
+    os.replace(tmp_path, path)
+
+
+@dataclass(slots=True)
+class ResultCache:
+    """On-disk cache mapping analysis inputs to analysis text."""
+
+    root: Path
+    _digests: dict[str, dict[str, Any]] = field(default_factory=dict)
+    _dirty: bool = False
+
+    def __post_init__(self) -> None:
+        index_path = self._index_path
+        if index_path.exists():
+            try:
+                self._digests = json.loads(index_path.read_text(encoding="utf-8"))
+            except (OSError, ValueError):
+                self._digests = {}
+
+    @property
+    def _index_path(self) -> Path:
+        return self.root / "content_hashes.json"
+
+    def content_hash(self, path: Path) -> str:
+        """SHA-256 of ``path``, recomputed only when size or mtime changed."""
+        stat = path.stat()
+        cached = self._digests.get(str(path))
+        if (
+            cached
+            and cached["size"] == stat.st_size
+            and cached["mtime_ns"] == stat.st_mtime_ns
+        ):
+            return cached["sha256"]
+
+        digest = sha256_file(path)
+        self._digests[str(path)] = {
+            "size": stat.st_size,
+            "mtime_ns": stat.st_mtime_ns,
+            "sha256": digest,
+        }
+        self._dirty = True
+        return digest
+
+    def key_for(self, video_path: Path, params: dict[str, Any]) -> str:
+        """Cache key for analysing ``video_path`` with ``params``."""
+        material = {"video": self.content_hash(video_path), **params}
+        return sha256_text(json.dumps(material, sort_keys=True, default=str))
+
+    def _entry_path(self, key: str) -> Path:
+        return self.root / "entries" / key[:2] / f"{key}.txt"
+
+    def get(self, key: str) -> Optional[str]:
+        entry_path = self._entry_path(key)
+        if not entry_path.exists():
+            return None
+        return entry_path.read_text(encoding="utf-8")
+
+    def put(self, key: str, content: str) -> None:
+        _write_atomic(self._entry_path(key), content)
+
+    def put_file(self, key: str, path: Path) -> None:
+        """Store the contents of ``path`` without loading it into memory."""
+        entry_path = self._entry_path(key)
+        entry_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = entry_path.with_suffix(".tmp")
+        shutil.copyfile(path, tmp_path)
+        os.replace(tmp_path, entry_path)
+
+    def flush(self) -> None:
+        """Persist the digest index if new files were hashed."""
+        if self._dirty:
+            _write_atomic(self._index_path, json.dumps(self._digests))
+            self._dirty = False
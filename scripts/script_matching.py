@@ -0,0 +1,269 @@
+"""Match every segment of a full video script against the clip catalogue.
+
+A script is split into segments (one per line, long lines per sentence
+group) and many segments share each request. Every prompt starts with the
+same instructions and catalogue block, and only the trailing list of
+segments varies, so provider-side prompt caching covers most of each
+request. Large catalogues are narrowed once per script to the union of each
+segment's BM25 shortlist, which keeps that block identical across requests.
+
+Segments missing from a response are retried in smaller requests (see
+``scripts.meta_batches``). The result is one JSON timeline.
+
+Usage:
+    python -m scripts.script_matching script.txt [timeline.json]
+"""
+
+from __future__ import annotations
+
+import json
+import re
+import sys
+from dataclasses import dataclass
+from pathlib import Path
+from typing import List
+
+from dotenv import load_dotenv
+from pydantic import BaseModel, Field
+
+from scripts.match_videos import (
+    ClipMatch,
+    Match,
+    load_lexical_index,
+    resolve_matches,
+)
+from scripts.compact_catalogue import CompactCatalogue, encode_catalogue
+from scripts.meta_batches import Note, pack_batches, run_batches
+from scripts.meta_store import MetaStore, open_store
+from scripts.paths import JSON_DIR, LEXICAL_INDEX_DIR, MATCHES_DIR, META_STORE_DIR
+from src.llm.client import LLMClient
+
+# Lines longer than MAX_SEGMENT_CHARS are split into groups of sentences
+MAX_SEGMENT_CHARS = 300
+SEGMENTS_PER_REQUEST = 40
+SEGMENT_INPUT_TOKENS = 4_000
+MATCHES_PER_SEGMENT = 3
+# Output allowance per segment in a batched response
+SEGMENT_OUTPUT_TOKENS = 120
+MATCH_WORKERS = 4
+# Catalogues above MAX_CATALOGUE_VIDEOS are narrowed to the best
+# CANDIDATES_PER_SEGMENT BM25 hits of every segment, up to that many videos
+MAX_CATALOGUE_VIDEOS = 200
+CANDIDATES_PER_SEGMENT = 15
+
+_SENTENCE_END_RE = re.compile(r"(?<=[.!?])\s+")
+
+
+@dataclass(frozen=True, slots=True)
+class ScriptSegment:
+    """One beat of the script, numbered from 1 in script order."""
+
+    index: int
+    line: int
+    text: str
+
+
+class SegmentMatch(BaseModel):
+    """Matches for one script segment."""
+
+    segment: int = Field(..., description="Number of the script segment.")
+    matches: List[ClipMatch] = Field(
+        default_factory=list,
+        description="Matched clips with 'id' and 'score' (1-100), best first.",
+    )
+
+
+class ScriptMatchBatch(BaseModel):
+    """Result of matching several script segments in one request."""
+
+    segments: List[SegmentMatch] = Field(
+        default_factory=list,
+        description="One entry per script segment in the request.",
+    )
+
+
+def _sentence_groups(text: str, max_chars: int) -> list[str]:
+    groups: list[str] = []
+    for sentence in _SENTENCE_END_RE.split(text):
+        if groups and len(groups[-1]) + 1 + len(sentence) <= max_chars:
+            groups[-1] += " " + sentence
+        else:
+            groups.append(sentence)
+    return groups
+
+
+def split_script(text: str, max_chars: int = MAX_SEGMENT_CHARS) -> list[ScriptSegment]:
+    """Split a script into segments: one per non-empty line, long lines per
+    group of sentences. Markdown headings are skipped.
+    """
+    segments: list[ScriptSegment] = []
+    for line_number, line in enumerate(text.splitlines(), start=1):
+        line = line.strip()
+        if not line or line.startswith("#"):
+            continue
+        for part in _sentence_groups(line, max_chars):
+            segments.append(ScriptSegment(len(segments) + 1, line_number, part))
+    return segments
+
+
+def catalogue_metas(
+    segments: list[ScriptSegment],
+    store: MetaStore,
+    index_dir: Path = LEXICAL_INDEX_DIR,
+) -> list[dict]:
+    """Videos offered to the model for the whole script, sorted by filename.
+
+    The whole catalogue when it is small enough, otherwise the videos ranking
+    best for any segment.
+    """
+    if len(store) <= MAX_CATALOGUE_VIDEOS:
+        return sorted(store.records(), key=lambda meta: meta["filename"])
+
+    index = load_lexical_index(store, index_dir)
+    best: dict[str, float] = {}
+    for segment in segments:
+        for filename, score in index.search(segment.text, CANDIDATES_PER_SEGMENT):
+            best[filename] = max(score, best.get(filename, 0.0))
+    chosen = sorted(best, key=lambda name: (-best[name], name))[:MAX_CATALOGUE_VIDEOS]
+    print(f"Offering {len(chosen)} of {len(store)} videos for the script")
+    return [meta for filename in sorted(chosen) if (meta := store.get(filename))]
+
+
+def script_prompt_prefix(catalogue: CompactCatalogue) -> str:
+    """Instructions and catalogue, identical for every request of a script."""
+    return f"""
+You are an expert at matching video clips to the segments of a video script.
+
+For every numbered script segment at the end of this prompt, select the best matching video clips from the list below. You can select several if they fit well, or none if none match.
+Output a JSON object with one entry per segment: 'segment' (the segment number) and 'matches' (a list of dicts with 'id' (the clip id) and 'score' 1-100, where 100 is a perfect match).
+Only include videos with score >= 50, at most {MATCHES_PER_SEGMENT} per segment, sorted by score descending.
+
+Available videos:
+{catalogue.text}
+"""
+
+
+def segments_prompt(prefix: str, notes: List[Note]) -> str:
+    listed = "\n".join(f"[{note.key}] {note.text}" for note in notes)
+    return f"{prefix}\nScript segments:\n{listed}\n"
+
+
+def match_segments(
+    notes: List[Note],
+    prefix: str,
+    catalogue: CompactCatalogue,
+    llm_client: LLMClient,
+) -> dict[str, list[Match]]:
+    """Match one batch of segments in a single request.
+
+    Returns:
+        Matches per segment key; unknown clip ids are dropped
+    """
+    result = llm_client.invoke(
+        prompt=segments_prompt(prefix, notes),
+        output_model=ScriptMatchBatch,
+        max_output_tokens=SEGMENT_OUTPUT_TOKENS * len(notes),
+    )
+    keys = {note.key for note in notes}
+    return {
+        str(item.segment): resolve_matches(catalogue, item.matches)[
+            :MATCHES_PER_SEGMENT
+        ]
+        for item in result.segments
+        if str(item.segment) in keys
+    }
+
+
+def match_script(
+    segments: list[ScriptSegment],
+    video_metas: list[dict],
+    llm_client: LLMClient,
+) -> tuple[dict[int, list[Match]], int]:
+    """Match every segment against ``video_metas``.
+
+    Returns:
+        Tuple of (matches per segment index, number of requests made)
+    """
+    catalogue = encode_catalogue(video_metas)
+    prefix = script_prompt_prefix(catalogue)
+    notes = [Note(key=str(segment.index), text=segment.text) for segment in segments]
+    matches: dict[int, list[Match]] = {}
+
+    def failed(key: str, error: Exception) -> None:
+        print(f"Failed to match segment {key}: {error}")
+
+    requests = run_batches(
+        pack_batches(notes, SEGMENT_INPUT_TOKENS, SEGMENTS_PER_REQUEST),
+        lambda batch: match_segments(batch, prefix, catalogue, llm_client),
+        lambda key, found: matches.__setitem__(int(key), found),
+        failed,
+        max_workers=MATCH_WORKERS,
+    )
+    return matches, requests
+
+
+def build_timeline(
+    script_path: Path,
+    segments: list[ScriptSegment],
+    matches: dict[int, list[Match]],
+    model: str,
+    requests: int,
+) -> dict:
+    return {
+        "script": str(script_path),
+        "model": model,
+        "requests": requests,
+        "segments": [
+            {
+                "index": segment.index,
+                "line": segment.line,
+                "text": segment.text,
+                "matched": segment.index in matches,
+                "matches": [m.model_dump() for m in matches.get(segment.index, [])],
+            }
+            for segment in segments
+        ],
+    }
+
+
+def main() -> None:
+    if len(sys.argv) < 2:
+        print("Usage: python -m scripts.script_matching script.txt [timeline.json]")
+        sys.exit(1)
+
+    script_path = Path(sys.argv[1])
+    output_path = (
+        Path(sys.argv[2])
+        if len(sys.argv) > 2
+        else MATCHES_DIR / f"{script_path.stem}.timeline.json"
+    )
+
+    load_dotenv()
+    llm_client = LLMClient.from_env()
+
+    segments = split_script(script_path.read_text(encoding="utf-8"))
+    if not segments:
+        print("The script has no segments.")
+        return
+
+    store = open_store(META_STORE_DIR, JSON_DIR)
+    if not len(store):
+        print("No video metadata found.")
+        return
+
+    video_metas = catalogue_metas(segments, store)
+    matches, requests = match_script(segments, video_metas, llm_client)
+    timeline = build_timeline(
+        script_path, segments, matches, llm_client.config.model, requests
+    )
+
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    output_path.write_text(json.dumps(timeline, indent=2), encoding="utf-8")
+    print(
+        f"Matched {len(matches)} of {len(segments)} segments in {requests} requests"
+    )
+    print(f"Saved timeline to {output_path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,161 @@
+"""Segmented analysis of long videos.
+
+A long video is split into fixed-length time windows. Every window gets its
+own frame sample and LLM call, the calls run concurrently, and the results
+are merged into one document with the start and end time of each segment.
+Wall-clock time then grows with ``duration / workers`` instead of duration.
+"""
+
+from __future__ import annotations
+
+import math
+import re
+from concurrent.futures import FIRST_EXCEPTION, ThreadPoolExecutor, wait
+from dataclasses import dataclass
+from typing import Callable, Sequence
+
+from scripts.frame_sampling import uniform_frame_indices
+
+# A trailing window shorter than this share of SEGMENT_SECONDS is folded into
+# the previous segment instead of being analysed on its own.
+MIN_TAIL_RATIO = 0.5
+
+SEGMENT_PROMPT_PREFIX = """
+# SEGMENT CONTEXT
+These frames cover segment {number} of {count} of a longer video, from {start} to {end}. Describe only what is visible in this segment; the segments are merged in order afterwards.
+"""
+
+_HEADING_RE = re.compile(r"^(#{1,4})(?=\s)", re.MULTILINE)
+
+
+def format_timestamp(seconds: float) -> str:
+    """``MM:SS``, or ``H:MM:SS`` from one hour on."""
+    total = max(0, int(round(seconds)))
+    hours, rest = divmod(total, 3600)
+    minutes, secs = divmod(rest, 60)
+    if hours:
+        return f"{hours}:{minutes:02d}:{secs:02d}"
+    return f"{minutes:02d}:{secs:02d}"
+
+
+@dataclass(frozen=True, slots=True)
+class VideoSegment:
+    """A time window of a video; ``end_frame`` is exclusive."""
+
+    index: int
+    start_frame: int
+    end_frame: int
+    start_seconds: float
+    end_seconds: float
+
+    @property
+    def label(self) -> str:
+        return (
+            f"{format_timestamp(self.start_seconds)}"
+            f"–{format_timestamp(self.end_seconds)}"
+        )
+
+    def frame_indices(self, num_frames: int) -> list[int]:
+        """``num_frames`` evenly spaced frame indices inside the window."""
+        length = self.end_frame - self.start_frame
+        return [
+            self.start_frame + i for i in uniform_frame_indices(length, num_frames)
+        ]
+
+
+def plan_segments(
+    frame_count: int, fps: float, segment_seconds: float
+) -> list[VideoSegment]:
+    """Split ``frame_count`` frames at ``fps`` into windows of ``segment_seconds``.
+
+    Returns:
+        Segments in chronological order (empty if the container has no
+        usable frame count or frame rate)
+    """
+    if frame_count <= 0 or fps <= 0 or segment_seconds <= 0:
+        return []
+
+    window = max(1, round(segment_seconds * fps))
+    count = math.ceil(frame_count / window)
+    tail = frame_count - (count - 1) * window
+    if count > 1 and tail < window * MIN_TAIL_RATIO:
+        count -= 1
+
+    segments = []
+    for index in range(count):
+        start = index * window
+        end = frame_count if index == count - 1 else start + window
+        segments.append(
+            VideoSegment(
+                index=index,
+                start_frame=start,
+                end_frame=end,
+                start_seconds=start / fps,
+                end_seconds=end / fps,
+            )
+        )
+    return segments
+
+
+def segment_prompt(prompt: str, segment: VideoSegment, segment_count: int) -> str:
+    """Prefix ``prompt`` with where the segment sits in the video."""
+    prefix = SEGMENT_PROMPT_PREFIX.format(
+        number=segment.index + 1,
+        count=segment_count,
+        start=format_timestamp(segment.start_seconds),
+        end=format_timestamp(segment.end_seconds),
+    )
+    return prefix + prompt
+
+
+def analyze_segments(
+    segments: Sequence[VideoSegment],
+    analyze: Callable[[VideoSegment], str],
+    max_workers: int,
+) -> list[str]:
+    """Run ``analyze`` on every segment concurrently.
+
+    The first failure cancels segments that have not started yet and is
+    re-raised once the running ones finish.
+
+    Returns:
+        Analysis text per segment, in segment order
+    """
+    with ThreadPoolExecutor(max_workers=max(1, max_workers)) as pool:
+        futures = [pool.submit(analyze, segment) for segment in segments]
+        done, not_done = wait(futures, return_when=FIRST_EXCEPTION)
+        for future in not_done:
+            future.cancel()
+        for future in futures:
+            if future in done and future.exception() is not None:
+                raise future.exception()  # type: ignore[misc]
+    return [future.result() for future in futures]
+
+
+def _nest_headings(text: str) -> str:
+    """Demote markdown headings so they sit below the segment heading."""
+    return _HEADING_RE.sub(lambda m: "##" + m.group(1), text)
+
+
+def merge_segment_analyses(
+    video_filename: str,
+    segments: Sequence[VideoSegment],
+    analyses: Sequence[str],
+) -> str:
+    """Combine per-segment analyses into one timestamped document."""
+    duration = segments[-1].end_seconds if segments else 0.0
+    lines = [
+        f"# Segmented analysis: {video_filename}",
+        "",
+        f"Duration: {format_timestamp(duration)} in {len(segments)} segments",
+    ]
+    for segment, analysis in zip(segments, analyses):
+        lines += [
+            "",
+            f"## Segment {segment.index + 1}/{len(segments)} [{segment.label}]",
+            "",
+            f"Start: {segment.start_seconds:.1f}s, End: {segment.end_seconds:.1f}s",
+            "",
+            _nest_headings(analysis.strip()),
+        ]
+    return "\n".join(lines) + "\n"
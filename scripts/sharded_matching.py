@@ -0,0 +1,181 @@
+"""Score a candidate set too large for one prompt in shards.
+
+The candidates are split into shards that fit ``SHARD_INPUT_TOKENS`` and
+every shard is scored with the same transcript, concurrently, so latency
+stays near that of one request as long as there are workers for every
+shard.
+
+Scores from different shards are not directly comparable: a model judging a
+shard of weak candidates tends to score its best one higher than the same
+clip would get next to strong ones. A few anchor clips (the best BM25 hits)
+are therefore included in every shard. Each shard's scores are shifted by
+the mean difference between its anchor scores and the anchors' mean across
+shards before the shards are merged into a global top K. An optional
+final request reranks only the merged finalists side by side.
+
+The scoring request itself is passed in, so this module knows nothing of
+prompts; ``scripts.match_videos.match_transcript`` routes oversized
+shortlists here.
+"""
+
+from __future__ import annotations
+
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from statistics import mean
+from typing import Callable, Sequence
+
+from scripts.compact_catalogue import row_tokens
+
+SHARD_INPUT_TOKENS = 12_000
+SHARD_WORKERS = 8
+ANCHORS_PER_SHARD = 2
+FINAL_TOP_K = 10
+# Finalists sent to the optional rerank request
+RERANK_FINALISTS = 30
+
+# Scores the given records, returning (filename, score) pairs
+Scorer = Callable[[list[dict]], list[tuple[str, int]]]
+
+
+@dataclass(frozen=True, slots=True)
+class ShardedScores:
+    """Merged scores and whether every request behind them succeeded.
+
+    An incomplete result misses the clips of a failed shard or fell back to
+    unreranked scores, so it should not be cached.
+    """
+
+    scores: list[tuple[str, int]]
+    complete: bool = True
+
+
+def catalogue_tokens(video_metas: Sequence[dict]) -> int:
+    """Estimated tokens of the rows of ``video_metas`` in one catalogue."""
+    return sum(row_tokens(meta) for meta in video_metas)
+
+
+def shard_metas(
+    video_metas: Sequence[dict], max_tokens: int = SHARD_INPUT_TOKENS
+) -> list[list[dict]]:
+    """Consecutive records grouped into shards within ``max_tokens``.
+
+    A record larger than ``max_tokens`` gets a shard of its own.
+    """
+    shards: list[list[dict]] = []
+    current: list[dict] = []
+    current_tokens = 0
+    for meta in video_metas:
+        tokens = row_tokens(meta)
+        if current and current_tokens + tokens > max_tokens:
+            shards.append(current)
+            current, current_tokens = [], 0
+        current.append(meta)
+        current_tokens += tokens
+    if current:
+        shards.append(current)
+    return shards
+
+
+def calibrate(
+    shard_scores: Sequence[list[tuple[str, int]]], anchors: set[str]
+) -> list[list[tuple[str, float]]]:
+    """Shift every shard's scores so its anchors agree with the other shards.
+
+    Shards that returned no anchor keep their scores.
+    """
+    anchor_scores: dict[str, list[int]] = defaultdict(list)
+    for scores in shard_scores:
+        for filename, score in scores:
+            if filename in anchors:
+                anchor_scores[filename].append(score)
+    reference = {name: mean(scores) for name, scores in anchor_scores.items()}
+
+    calibrated = []
+    for scores in shard_scores:
+        offsets = [
+            reference[filename] - score
+            for filename, score in scores
+            if filename in anchors
+        ]
+        offset = mean(offsets) if offsets else 0.0
+        calibrated.append(
+            [
+                (filename, min(100.0, max(1.0, score + offset)))
+                for filename, score in scores
+            ]
+        )
+    return calibrated
+
+
+def merge_scores(
+    shard_scores: Sequence[list[tuple[str, float]]], top_k: int
+) -> list[tuple[str, int]]:
+    """Global top ``top_k``; a clip scored in several shards gets its mean."""
+    scores: dict[str, list[float]] = defaultdict(list)
+    for pairs in shard_scores:
+        for filename, score in pairs:
+            scores[filename].append(score)
+    merged = [(name, round(mean(values))) for name, values in scores.items()]
+    return sorted(merged, key=lambda x: x[1], reverse=True)[:top_k]
+
+
+def match_sharded(
+    video_metas: Sequence[dict],
+    score: Scorer,
+    anchor_filenames: Sequence[str] = (),
+    top_k: int = FINAL_TOP_K,
+    rerank: bool = False,
+) -> ShardedScores:
+    """Score every shard of ``video_metas`` and merge into a global top K.
+
+    Shards that fail are left out of the merge and mark the result
+    incomplete, as does a failed rerank.
+
+    Args:
+        score: Request scoring one shard
+        anchor_filenames: Clips added to every shard to calibrate scores
+        rerank: Rescore the merged finalists in one more request
+
+    Raises:
+        Exception: The last error from ``score`` if every shard failed
+    """
+    if not video_metas:
+        return ShardedScores([])
+    wanted = set(anchor_filenames)
+    anchors = [meta for meta in video_metas if meta["filename"] in wanted]
+    anchor_names = {meta["filename"] for meta in anchors}
+    rest = [meta for meta in video_metas if meta["filename"] not in anchor_names]
+    # Every prompt carries the anchors, so the rest get what they leave over
+    budget = max(1, SHARD_INPUT_TOKENS - catalogue_tokens(anchors))
+    shards = [anchors + shard for shard in shard_metas(rest, budget)] or [anchors]
+    print(f"Scoring {len(video_metas)} videos in {len(shards)} shards")
+
+    errors: list[Exception] = []
+
+    def score_shard(shard: list[dict]) -> list[tuple[str, int]]:
+        try:
+            return score(shard)
+        except Exception as e:
+            print(f"Error scoring a shard of {len(shard)} videos: {e}")
+            errors.append(e)
+            return []
+
+    with ThreadPoolExecutor(max_workers=SHARD_WORKERS) as pool:
+        shard_scores = list(pool.map(score_shard, shards))
+    if len(errors) == len(shards):
+        raise errors[-1]
+
+    complete = not errors
+    merged = merge_scores(calibrate(shard_scores, anchor_names), RERANK_FINALISTS)
+    if not rerank or len(merged) <= 1:
+        return ShardedScores(merged[:top_k], complete)
+
+    by_name = {meta["filename"]: meta for meta in video_metas}
+    finalists = [by_name[filename] for filename, _ in merged]
+    try:
+        return ShardedScores(score(finalists)[:top_k], complete)
+    except Exception as e:
+        print(f"Error reranking finalists, keeping merged scores: {e}")
+        return ShardedScores(merged[:top_k], complete=False)
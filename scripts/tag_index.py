@@ -0,0 +1,202 @@
+"""Inverted index over the tag fields of video metadata, with boolean queries.
+
+Every tag value maps to a sorted NumPy array of clip ids (rows of the
+metadata store), so queries are set operations on posting lists::
+
+    theme=crisis AND currency=USD NOT action=smoking
+    (action=counting OR action=stacking) AND NOT spatial=background
+
+Terms are ``field=value`` with case-insensitive values. ``AND`` binds
+tighter than ``OR``, adjacent terms are ANDed and ``X NOT Y`` means
+``X AND NOT Y``.
+
+Usage:
+    python -m scripts.tag_index "theme=crisis AND currency=USD"
+    python -m scripts.tag_index            # list tag values per field
+"""
+
+from __future__ import annotations
+
+import re
+import sys
+from dataclasses import dataclass
+from typing import Optional
+
+import numpy as np
+
+from scripts.meta_store import MetaStore, open_store
+from scripts.paths import JSON_DIR, META_STORE_DIR
+
+# Query field names, singular and plural, per stored tag column
+FIELDS = {
+    "theme": "themes",
+    "themes": "themes",
+    "action": "actions",
+    "actions": "actions",
+    "currency": "currencies",
+    "currencies": "currencies",
+    "tag": "semantic_tags",
+    "semantic": "semantic_tags",
+    "semantic_tags": "semantic_tags",
+    "spatial": "spatial_tags",
+    "spatial_tags": "spatial_tags",
+}
+
+_TOKEN_RE = re.compile(r'\(|\)|[^\s()=]+="[^"]*"|[^\s()]+')
+
+
+class TagQueryError(ValueError):
+    """Raised when a tag query cannot be parsed."""
+
+
+@dataclass(frozen=True, slots=True)
+class TagIndex:
+    """Posting lists of clip ids per field and lowercased tag value."""
+
+    filenames: list[str]
+    postings: dict[str, dict[str, np.ndarray]]
+
+    @classmethod
+    def from_store(cls, store: MetaStore) -> "TagIndex":
+        postings: dict[str, dict[str, np.ndarray]] = {}
+        for column in set(FIELDS.values()):
+            by_value: dict[str, np.ndarray] = {}
+            for tag, rows in store.tag_postings(column).items():
+                value = tag.lower()
+                # Tags differing only in case share a posting list
+                by_value[value] = (
+                    np.union1d(by_value[value], rows) if value in by_value else rows
+                )
+            postings[column] = by_value
+        return cls(store.filenames(), postings)
+
+    @property
+    def _all(self) -> np.ndarray:
+        return np.arange(len(self.filenames), dtype=np.int32)
+
+    def lookup(self, field: str, value: str) -> np.ndarray:
+        """Sorted clip ids tagged ``value`` in ``field``."""
+        column = FIELDS.get(field.lower())
+        if column is None:
+            raise TagQueryError(
+                f"Unknown field {field!r}; expected one of {', '.join(sorted(FIELDS))}"
+            )
+        return self.postings[column].get(
+            value.strip('"').lower(), np.zeros(0, dtype=np.int32)
+        )
+
+    def counts(self, field: str) -> dict[str, int]:
+        """Number of clips per value of ``field``, most common first."""
+        by_value = self.postings[FIELDS[field]]
+        return dict(
+            sorted(
+                ((value, len(rows)) for value, rows in by_value.items()),
+                key=lambda item: (-item[1], item[0]),
+            )
+        )
+
+    def rows(self, query: str) -> np.ndarray:
+        """Sorted clip ids matching ``query``."""
+        return _Parser(self, _TOKEN_RE.findall(query)).parse()
+
+    def query(self, query: str) -> list[str]:
+        """Filenames of the clips matching ``query``, in store order."""
+        return [self.filenames[row] for row in self.rows(query).tolist()]
+
+
+class _Parser:
+    """Recursive-descent evaluation of a tokenised query.
+
+    query := and_expr ("OR" and_expr)*
+    and_expr := unary (["AND"] unary | "NOT" unary)*
+    unary := "NOT" unary | "(" query ")" | field=value
+    """
+
+    def __init__(self, index: TagIndex, tokens: list[str]) -> None:
+        self.index = index
+        self.tokens = tokens
+        self.position = 0
+
+    def _peek(self) -> Optional[str]:
+        if self.position < len(self.tokens):
+            return self.tokens[self.position]
+        return None
+
+    def _keyword(self) -> Optional[str]:
+        token = self._peek()
+        upper = token.upper() if token else None
+        return upper if upper in ("AND", "OR", "NOT") else None
+
+    def _next(self) -> str:
+        token = self._peek()
+        if token is None:
+            raise TagQueryError("Unexpected end of query")
+        self.position += 1
+        return token
+
+    def parse(self) -> np.ndarray:
+        if not self.tokens:
+            raise TagQueryError("Empty query")
+        rows = self._or()
+        if self._peek() is not None:
+            raise TagQueryError(f"Unexpected {self._peek()!r}")
+        return rows
+
+    def _or(self) -> np.ndarray:
+        rows = self._and()
+        while self._keyword() == "OR":
+            self._next()
+            rows = np.union1d(rows, self._and())
+        return rows
+
+    def _and(self) -> np.ndarray:
+        rows = self._unary()
+        while self._peek() not in (None, ")") and self._keyword() != "OR":
+            keyword = self._keyword()
+            if keyword == "NOT":
+                self._next()
+                rows = np.setdiff1d(rows, self._unary(), assume_unique=True)
+                continue
+            if keyword == "AND":
+                self._next()
+            rows = np.intersect1d(rows, self._unary(), assume_unique=True)
+        return rows
+
+    def _unary(self) -> np.ndarray:
+        token = self._next()
+        if token.upper() == "NOT":
+            return np.setdiff1d(self.index._all, self._unary(), assume_unique=True)
+        if token == "(":
+            rows = self._or()
+            if self._next() != ")":
+                raise TagQueryError("Missing ')'")
+            return rows
+        field, equals, value = token.partition("=")
+        if not equals or not field or not value:
+            raise TagQueryError(f"Expected field=value, got {token!r}")
+        return self.index.lookup(field, value)
+
+
+def main() -> None:
+    store = open_store(META_STORE_DIR, JSON_DIR)
+    index = TagIndex.from_store(store)
+
+    if len(sys.argv) < 2:
+        for field in ("theme", "action", "currency", "tag", "spatial"):
+            counts = index.counts(field)
+            listed = ", ".join(f"{value} ({n})" for value, n in counts.items())
+            print(f"{field}: {listed}")
+        return
+
+    try:
+        filenames = index.query(" ".join(sys.argv[1:]))
+    except TagQueryError as e:
+        print(f"Invalid query: {e}")
+        sys.exit(1)
+    for filename in filenames:
+        print(filename)
+    print(f"{len(filenames)} of {len(index.filenames)} videos")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,15 +1,21 @@
 """LLM client utilities."""
 
+from .async_client import AsyncLLMClient
 from .client import LLMClient
 from .config import LLMConfig
-from .exceptions import LLMCallError, LLMConfigurationError
-from .video_client import VideoLLMClient, VideoLLMConfig
+from .exceptions import LLMCallError, LLMConfigurationError, LLMRateLimitError
+from .models import LLMUsage
+from .video_client import MediaStream, VideoLLMClient, VideoLLMConfig
 
 __all__ = [
+    "AsyncLLMClient",
     "LLMClient",
     "LLMConfig",
     "LLMCallError",
     "LLMConfigurationError",
+    "LLMRateLimitError",
+    "LLMUsage",
+    "MediaStream",
     "VideoLLMClient",
     "VideoLLMConfig",
 ]
@@ -0,0 +1,75 @@
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import Optional, Type, TypeVar
+
+from openai import AsyncOpenAI, RateLimitError
+from pydantic import BaseModel, ValidationError
+
+from .config import LLMConfig
+from .exceptions import LLMCallError, LLMConfigurationError, LLMRateLimitError
+
+TModel = TypeVar("TModel", bound=BaseModel)
+
+
+@dataclass(slots=True)
+class AsyncLLMClient:
+    """Asyncio counterpart of ``LLMClient`` for running many calls concurrently."""
+
+    config: LLMConfig
+    _client: Optional[AsyncOpenAI] = None
+
+    def __post_init__(self) -> None:
+        if not self.config.api_key:
+            raise LLMConfigurationError("LLMConfig.api_key must be provided")
+        if self._client is None:
+            self._client = AsyncOpenAI(
+                api_key=self.config.api_key, base_url=self.config.base_url
+            )
+
+    @classmethod
+    def from_env(cls) -> "AsyncLLMClient":
+        """Convenience constructor that loads configuration from env variables."""
+
+        return cls(config=LLMConfig.from_env())
+
+    async def invoke(
+        self,
+        *,
+        prompt: str,
+        output_model: Type[TModel],
+        max_output_tokens: Optional[int] = None,
+    ) -> TModel:
+        """Execute the provided prompt and parse it into the expected model.
+
+        Raises:
+            LLMRateLimitError: If the provider answered 429; carries the
+                ``Retry-After`` delay when one was sent
+            LLMCallError: On any other failure
+        """
+
+        try:
+            response = await self._client.responses.parse(  # type: ignore[union-attr]
+                model=self.config.model,
+                input=prompt,
+                temperature=self.config.temperature,
+                max_output_tokens=max_output_tokens or self.config.max_output_tokens,
+                text_format=output_model,
+            )
+        except RateLimitError as exc:  # pragma: no cover - network errors
+            raise LLMRateLimitError.from_headers(
+                "LLM provider rate limit exceeded", exc.response.headers
+            ) from exc
+        except Exception as exc:  # pragma: no cover - network errors
+            print(f"LLM invocation error: {exc}")
+            raise LLMCallError("Failed to execute LLM call") from exc
+
+        payload = response.output_parsed
+        try:
+            return output_model.model_validate(payload)
+        except ValidationError as exc:
+            raise LLMCallError("LLM response failed schema validation") from exc
+
+    async def close(self) -> None:
+        if self._client is not None:
+            await self._client.close()
@@ -3,11 +3,11 @@ from __future__ import annotations
 from dataclasses import dataclass
 from typing import Optional, Type, TypeVar
 
-from openai import OpenAI
+from openai import OpenAI, RateLimitError
 from pydantic import BaseModel, ValidationError
 
 from .config import LLMConfig
-from .exceptions import LLMCallError, LLMConfigurationError
+from .exceptions import LLMCallError, LLMConfigurationError, LLMRateLimitError
 
 TModel = TypeVar("TModel", bound=BaseModel)
 
@@ -33,17 +33,30 @@ class LLMClient:
 
         return cls(config=LLMConfig.from_env())
 
-    def invoke(self, *, prompt: str, output_model: Type[TModel]) -> TModel:
-        """Execute the provided prompt and parse it into the expected model."""
+    def invoke(
+        self,
+        *,
+        prompt: str,
+        output_model: Type[TModel],
+        max_output_tokens: Optional[int] = None,
+    ) -> TModel:
+        """Execute the provided prompt and parse it into the expected model.
+
+        ``max_output_tokens`` overrides the configured limit for this call.
+        """
 
         try:
             response = self._client.responses.parse(  # type: ignore[union-attr]
                 model=self.config.model,
                 input=prompt,
                 temperature=self.config.temperature,
-                max_output_tokens=self.config.max_output_tokens,
+                max_output_tokens=max_output_tokens or self.config.max_output_tokens,
                 text_format=output_model,
             )
+        except RateLimitError as exc:  # pragma: no cover - network errors
+            raise LLMRateLimitError.from_headers(
+                "LLM provider rate limit exceeded", exc.response.headers
+            ) from exc
         except Exception as exc:  # pragma: no cover - network errors
             print(f"LLM invocation error: {exc}")
             raise LLMCallError("Failed to execute LLM call") from exc
@@ -1,9 +1,53 @@
 from __future__ import annotations
 
+import time
+from email.utils import parsedate_to_datetime
+from typing import Mapping, Optional
+
 
 class LLMCallError(RuntimeError):
     """Raised when the LLM client cannot produce or parse a valid response."""
 
 
+class LLMRateLimitError(LLMCallError):
+    """Raised when the provider rejected a call with HTTP 429.
+
+    ``retry_after`` holds the delay in seconds requested by the provider, or
+    None if it did not send one.
+    """
+
+    def __init__(self, message: str, retry_after: Optional[float] = None) -> None:
+        super().__init__(message)
+        self.retry_after = retry_after
+
+    @classmethod
+    def from_headers(
+        cls, message: str, headers: Mapping[str, str]
+    ) -> "LLMRateLimitError":
+        """Build the error from ``Retry-After`` (seconds or HTTP date) headers."""
+        return cls(message, retry_after=_retry_after_seconds(headers))
+
+
+def _retry_after_seconds(headers: Mapping[str, str]) -> Optional[float]:
+    retry_after_ms = headers.get("retry-after-ms")
+    if retry_after_ms:
+        try:
+            return max(0.0, float(retry_after_ms) / 1000)
+        except ValueError:
+            pass
+
+    retry_after = headers.get("retry-after")
+    if not retry_after:
+        return None
+    try:
+        return max(0.0, float(retry_after))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(retry_after).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
 class LLMConfigurationError(ValueError):
     """Raised when essential configuration (like API keys) is missing."""
@@ -0,0 +1,23 @@
+from __future__ import annotations
+
+from typing import Optional
+
+from pydantic import BaseModel
+
+
+class LLMUsage(BaseModel):
+    """Token usage and latency reported for a single LLM call."""
+
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    latency_seconds: float = 0.0
+    time_to_first_token: Optional[float] = None
+    finish_reason: Optional[str] = None
+
+    @property
+    def tokens_per_second(self) -> float:
+        """Output throughput after the first token (0 when unknown)."""
+        generation = self.latency_seconds - (self.time_to_first_token or 0.0)
+        if generation <= 0 or not self.completion_tokens:
+            return 0.0
+        return self.completion_tokens / generation
@@ -1,13 +1,15 @@
 from __future__ import annotations
 
-from dataclasses import dataclass
-from typing import Any, Optional, Type, TypeVar
+import time
+from dataclasses import dataclass, field
+from typing import Any, Iterator, Optional, Type, TypeVar
 
 from openai import OpenAI
 from pydantic import BaseModel, ValidationError
 
 from .config import LLMConfig
 from .exceptions import LLMCallError, LLMConfigurationError
+from .models import LLMUsage
 
 TModel = TypeVar("TModel", bound=BaseModel)
 
@@ -68,6 +70,7 @@ class VideoLLMClient:
         text: str,
         image_blobs: Optional[list[str]] = None,
         output_model: Type[TModel],
+        max_tokens: Optional[int] = None,
     ) -> TModel:
         """
         Execute a prompt with optional image inputs using OpenRouter API.
@@ -75,34 +78,35 @@ class VideoLLMClient:
         Args:
             text: The text prompt/question
             image_blobs: List of base64-encoded images (with or without data URI prefix)
+            max_tokens: Output token limit for this call (defaults to config.max_tokens)
 
         Returns:
             Validated instance of output_model
         """
-        # Build content array with text and images
-        content: list[dict[str, Any]] = [
-            {
-                "type": "text",
-                "text": text,
-            }
-        ]
-
-        # Add images to content array
-        if image_blobs:
-            for blob in image_blobs:
-                content.append({"type": "image_url", "image_url": {"url": blob}})
+        result, _ = self.invoke_with_media_and_usage(
+            text=text,
+            image_blobs=image_blobs,
+            output_model=output_model,
+            max_tokens=max_tokens,
+        )
+        return result
 
+    def invoke_with_media_and_usage(
+        self,
+        *,
+        text: str,
+        image_blobs: Optional[list[str]] = None,
+        output_model: Type[TModel],
+        max_tokens: Optional[int] = None,
+    ) -> tuple[TModel, LLMUsage]:
+        """Same as ``invoke_with_media`` but also returns token usage and latency."""
+        started = time.perf_counter()
         try:
             response = self._client.chat.completions.create(  # type: ignore[union-attr]
                 model=self.config.model,
-                messages=[
-                    {
-                        "role": "user",
-                        "content": content,
-                    }  # type: ignore
-                ],
+                messages=self._build_messages(text, image_blobs),  # type: ignore
                 temperature=self.config.temperature,
-                max_tokens=self.config.max_tokens,
+                max_tokens=max_tokens or self.config.max_tokens,
             )
         except Exception as exc:
             print(f"Video LLM invocation error: {exc}")
@@ -113,9 +117,109 @@ class VideoLLMClient:
             raise LLMCallError("Video LLM returned empty response")
 
         content_text = response.choices[0].message.content
+        usage = LLMUsage(
+            prompt_tokens=getattr(response.usage, "prompt_tokens", 0) or 0,
+            completion_tokens=getattr(response.usage, "completion_tokens", 0) or 0,
+            latency_seconds=time.perf_counter() - started,
+            finish_reason=response.choices[0].finish_reason,
+        )
 
         # Wrap plain text response in expected format for output_model
         try:
-            return output_model.model_validate({"content": content_text})
+            return output_model.model_validate({"content": content_text}), usage
         except ValidationError as exc:
             raise LLMCallError("LLM response failed schema validation") from exc
+
+    def stream_with_media(
+        self,
+        *,
+        text: str,
+        image_blobs: Optional[list[str]] = None,
+        max_tokens: Optional[int] = None,
+    ) -> "MediaStream":
+        """
+        Start a streamed completion for a prompt with optional image inputs.
+
+        Args:
+            text: The text prompt/question
+            image_blobs: List of base64-encoded images (with or without data URI prefix)
+            max_tokens: Output token limit for this call (defaults to config.max_tokens)
+
+        Returns:
+            MediaStream yielding text deltas; usage is available once exhausted
+        """
+        started = time.perf_counter()
+        try:
+            response = self._client.chat.completions.create(  # type: ignore[union-attr]
+                model=self.config.model,
+                messages=self._build_messages(text, image_blobs),  # type: ignore
+                temperature=self.config.temperature,
+                max_tokens=max_tokens or self.config.max_tokens,
+                stream=True,
+                stream_options={"include_usage": True},
+            )
+        except Exception as exc:
+            print(f"Video LLM invocation error: {exc}")
+            raise LLMCallError("Failed to execute video LLM call") from exc
+
+        return MediaStream(_response=response, _started=started)
+
+    @staticmethod
+    def _build_messages(
+        text: str, image_blobs: Optional[list[str]]
+    ) -> list[dict[str, Any]]:
+        """Build the user message with the text prompt followed by images."""
+        # Build content array with text and images
+        content: list[dict[str, Any]] = [
+            {
+                "type": "text",
+                "text": text,
+            }
+        ]
+
+        # Add images to content array
+        if image_blobs:
+            for blob in image_blobs:
+                content.append({"type": "image_url", "image_url": {"url": blob}})
+
+        return [{"role": "user", "content": content}]
+
+
+@dataclass(slots=True)
+class MediaStream:
+    """Iterator over the text deltas of a streamed video LLM completion.
+
+    ``usage`` is filled in as chunks arrive, including time to first token;
+    token counts come from the provider's final usage chunk.
+    """
+
+    _response: Any
+    _started: float
+    usage: LLMUsage = field(default_factory=LLMUsage)
+
+    def __iter__(self) -> Iterator[str]:
+        try:
+            for chunk in self._response:
+                if chunk.usage is not None:
+                    self.usage.prompt_tokens = chunk.usage.prompt_tokens or 0
+                    self.usage.completion_tokens = chunk.usage.completion_tokens or 0
+                if not chunk.choices:
+                    continue
+                if chunk.choices[0].finish_reason:
+                    self.usage.finish_reason = chunk.choices[0].finish_reason
+                delta = chunk.choices[0].delta.content
+                if not delta:
+                    continue
+                if self.usage.time_to_first_token is None:
+                    self.usage.time_to_first_token = (
+                        time.perf_counter() - self._started
+                    )
+                yield delta
+        except Exception as exc:
+            raise LLMCallError("Video LLM stream failed") from exc
+        finally:
+            self.usage.latency_seconds = time.perf_counter() - self._started
+
+    def close(self) -> None:
+        """Abort the stream and release the underlying connection."""
+        self._response.close()
@@ -0,0 +1,89 @@
+import os
+import threading
+
+import pytest
+
+from scripts.batch_runner import BatchReport, BatchRunner, BatchSettings
+
+CRASHING_ITEM = "crash"
+
+
+def decode(item: str) -> str:
+    # Runs in a worker process, so it must be importable at module level
+    if item == CRASHING_ITEM:
+        os._exit(1)
+    if item == "bad":
+        raise ValueError("undecodable")
+    return item.upper()
+
+
+def run(items: list[str], settings: BatchSettings, **kwargs) -> BatchReport:
+    written: dict[str, str] = {}
+    runner = BatchRunner(
+        decode=decode,
+        analyze=kwargs.pop("analyze", lambda item, payload: payload),
+        write=written.__setitem__,
+        settings=settings,
+        **kwargs,
+    )
+    # A hung run fails the test instead of the whole suite
+    reports: list[BatchReport] = []
+    thread = threading.Thread(
+        target=lambda: reports.append(runner.run(items)), daemon=True
+    )
+    thread.start()
+    thread.join(timeout=60)
+    assert not thread.is_alive(), "batch run did not finish"
+    report = reports[0]
+    assert sorted(written) == sorted(
+        item for item in items if item not in report.errors
+    )
+    return report
+
+
+def test_from_env_defaults_to_sequential(monkeypatch: pytest.MonkeyPatch) -> None:
+    for name in ("PROCESS_DECODE_WORKERS", "PROCESS_MAX_IN_FLIGHT"):
+        monkeypatch.delenv(name, raising=False)
+    assert BatchSettings.from_env().is_sequential
+    monkeypatch.setenv("PROCESS_MAX_IN_FLIGHT", "4")
+    assert BatchSettings.from_env() == BatchSettings(max_in_flight=4)
+
+
+def test_every_item_is_written() -> None:
+    items = [f"item{i}" for i in range(10)]
+    report = run(items, BatchSettings(decode_workers=2, max_in_flight=3))
+    assert (report.successful, report.failed) == (10, 0)
+    assert set(report.timings.totals) == {"decode", "llm", "write"}
+
+
+def test_decode_and_analyze_errors_fail_their_item_only() -> None:
+    decoded: dict[str, bool] = {}
+
+    def analyze(item: str, payload: str) -> str:
+        if item == "flaky":
+            raise RuntimeError("LLM down")
+        return payload
+
+    report = run(
+        ["a", "bad", "flaky", "b"],
+        BatchSettings(decode_workers=2, max_in_flight=2),
+        analyze=analyze,
+        on_decoded=lambda item, error: decoded.__setitem__(item, error is None),
+    )
+    assert (report.successful, report.failed) == (2, 2)
+    assert sorted(report.errors) == ["bad", "flaky"]
+    assert decoded == {"a": True, "bad": False, "flaky": True, "b": True}
+
+
+def test_worker_crash_fails_remaining_items_instead_of_hanging() -> None:
+    items = ["a", "b", CRASHING_ITEM] + [f"item{i}" for i in range(10)]
+    failed_decodes: list[str] = []
+    # One worker keeps at most two items submitted, so most never are
+    report = run(
+        items,
+        BatchSettings(decode_workers=1, max_in_flight=2),
+        on_decoded=lambda item, error: error and failed_decodes.append(item),
+    )
+    assert report.successful + report.failed == len(items)
+    assert set(items[items.index(CRASHING_ITEM) :]) <= set(report.errors)
+    assert sorted(failed_decodes) == sorted(report.errors)
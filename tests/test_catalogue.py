@@ -0,0 +1,141 @@
+import os
+import sqlite3
+from pathlib import Path
+
+import pytest
+
+from scripts.catalogue import (
+    MAX_ATTEMPTS,
+    PipelineStage,
+    StageStatus,
+    VideoCatalogue,
+)
+
+ANALYSIS = PipelineStage.ANALYSIS
+META = PipelineStage.META
+
+
+@pytest.fixture
+def videos_dir(tmp_path: Path) -> Path:
+    directory = tmp_path / "videos"
+    directory.mkdir()
+    # Not decodable; the probe records zeros, which is all these tests need
+    (directory / "a.mp4").write_bytes(b"a")
+    (directory / "b.mp4").write_bytes(b"b")
+    return directory
+
+
+@pytest.fixture
+def catalogue(tmp_path: Path, videos_dir: Path) -> VideoCatalogue:
+    catalogue = VideoCatalogue(tmp_path / "catalogue.sqlite3")
+    catalogue.sync_videos(videos_dir)
+    yield catalogue
+    catalogue.close()
+
+
+def status(catalogue: VideoCatalogue, filename: str, stage: PipelineStage) -> str:
+    with sqlite3.connect(catalogue.db_path) as conn:
+        return conn.execute(
+            "SELECT status FROM stages WHERE filename = ? AND stage = ?",
+            (filename, stage.value),
+        ).fetchone()[0]
+
+
+def rewrite(path: Path, data: bytes) -> None:
+    stat = path.stat()
+    path.write_bytes(data)
+    # Writes within the filesystem's mtime resolution must still look changed
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000))
+
+
+def test_new_videos_are_pending(catalogue: VideoCatalogue) -> None:
+    assert catalogue.pending(ANALYSIS) == ["a.mp4", "b.mp4"]
+    assert catalogue.pending(META, after=ANALYSIS) == []
+
+
+def test_unchanged_videos_are_not_resynced(
+    catalogue: VideoCatalogue, videos_dir: Path
+) -> None:
+    assert catalogue.sync_videos(videos_dir) == 0
+    rewrite(videos_dir / "a.mp4", b"changed")
+    assert catalogue.sync_videos(videos_dir) == 1
+
+
+def test_done_stage_unblocks_the_next(catalogue: VideoCatalogue) -> None:
+    catalogue.mark_done("a.mp4", ANALYSIS, "key")
+    assert catalogue.pending(ANALYSIS) == ["b.mp4"]
+    assert catalogue.pending(META, after=ANALYSIS) == ["a.mp4"]
+
+
+def test_redone_stage_makes_later_stages_stale(catalogue: VideoCatalogue) -> None:
+    catalogue.mark_done("a.mp4", ANALYSIS, "key")
+    catalogue.mark_done("a.mp4", META, "note")
+    catalogue.mark_done("a.mp4", ANALYSIS, "other key")
+    assert status(catalogue, "a.mp4", META) == StageStatus.PENDING
+
+
+def test_failures_are_committed_and_retried_until_max_attempts(
+    catalogue: VideoCatalogue,
+) -> None:
+    for _ in range(MAX_ATTEMPTS):
+        assert "a.mp4" in catalogue.pending(ANALYSIS)
+        catalogue.mark_started("a.mp4", ANALYSIS)
+        catalogue.mark_failed("a.mp4", ANALYSIS, "boom")
+        # Visible to another connection, i.e. committed
+        assert status(catalogue, "a.mp4", ANALYSIS) == StageStatus.FAILED
+    assert catalogue.pending(ANALYSIS) == ["b.mp4"]
+
+
+def test_interrupted_stages_resume(catalogue: VideoCatalogue) -> None:
+    catalogue.mark_started("a.mp4", ANALYSIS)
+    assert catalogue.recover_interrupted() == 1
+    assert status(catalogue, "a.mp4", ANALYSIS) == StageStatus.PENDING
+
+
+def test_changed_fingerprint_invalidates_done_stage(
+    catalogue: VideoCatalogue,
+) -> None:
+    catalogue.mark_done("a.mp4", ANALYSIS, "key")
+    catalogue.mark_done("b.mp4", ANALYSIS, "key")
+    invalidated = catalogue.invalidate_changed(
+        ANALYSIS, {"a.mp4": "new key", "b.mp4": "key"}
+    )
+    assert invalidated == 1
+    assert catalogue.pending(ANALYSIS) == ["a.mp4"]
+
+
+def test_done_stage_without_fingerprint_adopts_it(
+    catalogue: VideoCatalogue,
+) -> None:
+    catalogue.mark_done("a.mp4", ANALYSIS)
+    assert catalogue.invalidate_changed(ANALYSIS, {"a.mp4": "key"}) == 0
+    assert catalogue.input_hash("a.mp4", ANALYSIS) == "key"
+
+
+def test_register_marks_unknown_videos_done(catalogue: VideoCatalogue) -> None:
+    catalogue.register("legacy.mp4", done_stages=[ANALYSIS])
+    assert status(catalogue, "legacy.mp4", ANALYSIS) == StageStatus.DONE
+    assert "legacy.mp4" in catalogue.pending(META, after=ANALYSIS)
+
+
+def test_register_keeps_reset_stage_of_changed_video(
+    catalogue: VideoCatalogue, videos_dir: Path
+) -> None:
+    catalogue.mark_done("a.mp4", ANALYSIS, "key")
+    rewrite(videos_dir / "a.mp4", b"changed")
+    catalogue.sync_videos(videos_dir)
+
+    # The old note is still on disk when the next run registers it
+    catalogue.register("a.mp4", done_stages=[ANALYSIS])
+    catalogue.invalidate_changed(ANALYSIS, {"a.mp4": "new key"})
+    assert "a.mp4" in catalogue.pending(ANALYSIS)
+
+
+def test_reset_keeps_last_fingerprint(
+    catalogue: VideoCatalogue, videos_dir: Path
+) -> None:
+    catalogue.mark_done("a.mp4", ANALYSIS, "key")
+    rewrite(videos_dir / "a.mp4", b"changed")
+    catalogue.sync_videos(videos_dir)
+    assert status(catalogue, "a.mp4", ANALYSIS) == StageStatus.PENDING
+    assert catalogue.input_hash("a.mp4", ANALYSIS) == "key"
@@ -0,0 +1,26 @@
+from scripts.generation_guard import RepetitionDetector, output_token_budget
+
+
+def test_output_token_budget_scales_with_frames_up_to_cap() -> None:
+    assert output_token_budget(0, 2000, 1500, 16000) == 3500
+    assert output_token_budget(3, 2000, 1500, 16000) == 6500
+    assert output_token_budget(20, 2000, 1500, 16000) == 16000
+
+
+def test_varied_text_is_not_a_loop() -> None:
+    text = " ".join(
+        f"Frame {i} shows object {i * 7} at position {i * 3}." for i in range(200)
+    )
+    assert not RepetitionDetector().feed(text)
+
+
+def test_repeated_rows_are_a_loop() -> None:
+    text = "| Banknote | green | paper | center |\n" * 200
+    assert RepetitionDetector().feed(text)
+
+
+def test_loop_is_detected_across_chunk_boundaries() -> None:
+    detector = RepetitionDetector()
+    text = "| Banknote | green | paper | center |\n" * 200
+    chunks = [text[i : i + 7] for i in range(0, len(text), 7)]
+    assert any(detector.feed(chunk) for chunk in chunks)
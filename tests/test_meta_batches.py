@@ -0,0 +1,42 @@
+from scripts.meta_batches import Note, estimate_tokens, pack_batches
+
+
+def note(key: str, tokens: int) -> Note:
+    # estimate_tokens counts one token per CHARS_PER_TOKEN characters, plus one
+    text = "x" * 4 * (tokens - 1)
+    assert estimate_tokens(text) == tokens
+    return Note(key=key, text=text)
+
+
+def keys(batches: list[list[Note]]) -> list[list[str]]:
+    return [[n.key for n in batch] for batch in batches]
+
+
+def test_batches_respect_token_budget() -> None:
+    notes = [note("a", 40), note("b", 40), note("c", 40)]
+    assert keys(pack_batches(notes, max_tokens=100, max_items=10)) == [
+        ["a", "b"],
+        ["c"],
+    ]
+
+
+def test_batches_respect_item_limit() -> None:
+    notes = [note(str(i), 5) for i in range(5)]
+    assert keys(pack_batches(notes, max_tokens=1000, max_items=2)) == [
+        ["0", "1"],
+        ["2", "3"],
+        ["4"],
+    ]
+
+
+def test_oversized_note_gets_its_own_batch() -> None:
+    notes = [note("a", 10), note("big", 500), note("b", 10)]
+    assert keys(pack_batches(notes, max_tokens=100, max_items=10)) == [
+        ["a"],
+        ["big"],
+        ["b"],
+    ]
+
+
+def test_no_notes_no_batches() -> None:
+    assert pack_batches([], max_tokens=100, max_items=10) == []
@@ -0,0 +1,161 @@
+import re
+import threading
+from pathlib import Path
+
+import pytest
+
+import scripts.match_videos as match_videos
+import scripts.sharded_matching as sharded_matching
+from scripts.compact_catalogue import row_tokens
+from scripts.lexical_index import LexicalIndex
+from scripts.match_cache import MatchCache
+from scripts.meta_store import MetaStore
+from scripts.sharded_matching import calibrate, match_sharded, merge_scores
+from src.llm import LLMCallError
+
+SHARD_TOKENS = 600
+
+
+def meta(i: int) -> dict:
+    return {
+        "filename": f"clip{i:02d}.mp4",
+        "summary_text": f"Clip {i} shows banknotes counted on a wooden desk. " * 4,
+        "themes": ["money", f"theme{i}"],
+    }
+
+
+@pytest.fixture(autouse=True)
+def small_shards(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(sharded_matching, "SHARD_INPUT_TOKENS", SHARD_TOKENS)
+    monkeypatch.setattr(match_videos, "SHARD_INPUT_TOKENS", SHARD_TOKENS)
+
+
+class FakeClient:
+    """Scores the first clips of every prompt; fails the calls listed."""
+
+    class config:
+        model = "fake"
+
+    def __init__(self, fail_calls: tuple[int, ...] = ()) -> None:
+        self.fail_calls = fail_calls
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def invoke(self, prompt: str, output_model: type) -> object:
+        with self._lock:
+            self.calls += 1
+            call = self.calls
+        if call in self.fail_calls:
+            raise LLMCallError("rate limited")
+        ids = [int(clip_id) for clip_id in re.findall(r"^(\d+)\|", prompt, re.M)]
+        return output_model(
+            matches=[match_videos.ClipMatch(id=i, score=60) for i in ids[:3]]
+        )
+
+
+def test_merge_scores_averages_repeated_clips() -> None:
+    merged = merge_scores([[("a", 80.0), ("b", 60.0)], [("a", 70.0), ("c", 90.0)]], 2)
+    assert merged == [("c", 90), ("a", 75)]
+
+
+def test_calibrate_shifts_shards_by_their_anchor_offset() -> None:
+    shard_scores = [[("anchor", 90), ("x", 80)], [("anchor", 70), ("y", 80)]]
+    calibrated = calibrate(shard_scores, {"anchor"})
+    assert calibrated == [
+        [("anchor", 80.0), ("x", 70.0)],
+        [("anchor", 80.0), ("y", 90.0)],
+    ]
+
+
+def test_shards_with_anchors_fit_the_budget() -> None:
+    metas = [meta(i) for i in range(40)]
+    anchors = [m["filename"] for m in metas[:2]]
+    shards: list[list[dict]] = []
+
+    def score(shard: list[dict]) -> list[tuple[str, int]]:
+        shards.append(shard)
+        return []
+
+    match_sharded(metas, score, anchors)
+    assert len(shards) > 1
+    for shard in shards:
+        assert {m["filename"] for m in shard} >= set(anchors)
+        assert sum(row_tokens(m) for m in shard) <= SHARD_TOKENS
+
+
+def test_partial_failure_is_incomplete() -> None:
+    metas = [meta(i) for i in range(40)]
+    calls = 0
+
+    def score(shard: list[dict]) -> list[tuple[str, int]]:
+        nonlocal calls
+        calls += 1
+        if calls == 1:
+            raise LLMCallError("timeout")
+        return [(shard[-1]["filename"], 70)]
+
+    result = match_sharded(metas, score)
+    assert result.scores and not result.complete
+
+
+def test_failed_rerank_is_incomplete() -> None:
+    metas = [meta(i) for i in range(40)]
+    shards = 0
+
+    def score(shard: list[dict]) -> list[tuple[str, int]]:
+        nonlocal shards
+        # Only the rerank request goes without the anchor
+        if shard[0]["filename"] != "clip00.mp4":
+            raise LLMCallError("rerank failed")
+        shards += 1
+        return [(shard[-1]["filename"], 70)]
+
+    result = match_sharded(metas, score, ["clip00.mp4"], rerank=True)
+    assert shards > 1
+    assert result.scores and not result.complete
+
+
+def test_every_shard_failing_raises() -> None:
+    def score(shard: list[dict]) -> list[tuple[str, int]]:
+        raise LLMCallError("down")
+
+    with pytest.raises(LLMCallError):
+        match_sharded([meta(i) for i in range(40)], score)
+
+
+@pytest.fixture
+def store(tmp_path: Path) -> MetaStore:
+    store = MetaStore(tmp_path / "meta_store")
+    for i in range(40):
+        record = meta(i)
+        store.upsert(record.pop("filename"), record)
+    return store
+
+
+def match(store: MetaStore, client: FakeClient, cache: MatchCache, tmp_path: Path):
+    index = LexicalIndex.load(tmp_path / "lexical_index")
+    index.sync(store)
+    return match_videos.match_transcript(
+        "banknotes counted", store, client, cache, lexical_index=index, top_k=None
+    )
+
+
+def test_complete_sharded_result_is_cached(store: MetaStore, tmp_path: Path) -> None:
+    cache = MatchCache(tmp_path / "match_cache")
+    first = match(store, FakeClient(), cache, tmp_path)
+    client = FakeClient()
+    assert match(store, client, cache, tmp_path) == first
+    assert client.calls == 0
+
+
+def test_partial_sharded_result_is_not_cached(
+    store: MetaStore, tmp_path: Path
+) -> None:
+    cache = MatchCache(tmp_path / "match_cache")
+    assert match(store, FakeClient(fail_calls=(1,)), cache, tmp_path)
+    assert len(cache) == 0
+
+    client = FakeClient()
+    match(store, client, cache, tmp_path)
+    assert client.calls > 1
+    assert len(cache) == 1
@@ -0,0 +1,57 @@
+import numpy as np
+import pytest
+
+from scripts.tag_index import TagIndex, TagQueryError
+
+
+def rows(*ids: int) -> np.ndarray:
+    return np.array(ids, dtype=np.int32)
+
+
+@pytest.fixture
+def index() -> TagIndex:
+    filenames = ["cash.mp4", "crash.mp4", "coins.mp4", "chart.mp4"]
+    postings = {
+        "themes": {"crisis": rows(1, 3), "wealth": rows(0, 2)},
+        "actions": {"counting": rows(0, 2), "smoking": rows(2)},
+        "currencies": {"usd": rows(0, 1, 3)},
+        "semantic_tags": {"stock market": rows(3)},
+        "spatial_tags": {},
+    }
+    return TagIndex(filenames, postings)
+
+
+@pytest.mark.parametrize(
+    ("query", "expected"),
+    [
+        ("theme=crisis", ["crash.mp4", "chart.mp4"]),
+        ("THEME=Crisis", ["crash.mp4", "chart.mp4"]),
+        ("theme=crisis AND currency=USD", ["crash.mp4", "chart.mp4"]),
+        ("theme=wealth currency=usd", ["cash.mp4"]),
+        ("action=counting NOT action=smoking", ["cash.mp4"]),
+        ("NOT currency=usd", ["coins.mp4"]),
+        ("theme=crisis OR action=smoking", ["crash.mp4", "coins.mp4", "chart.mp4"]),
+        # AND binds tighter than OR
+        (
+            "action=smoking OR theme=crisis AND currency=usd",
+            ["crash.mp4", "coins.mp4", "chart.mp4"],
+        ),
+        (
+            "(action=smoking OR theme=crisis) AND currency=usd",
+            ["crash.mp4", "chart.mp4"],
+        ),
+        ('tag="stock market"', ["chart.mp4"]),
+        ("theme=unknown", []),
+    ],
+)
+def test_query(index: TagIndex, query: str, expected: list[str]) -> None:
+    assert index.query(query) == expected
+
+
+@pytest.mark.parametrize(
+    "query",
+    ["", "colour=red", "theme=crisis AND", "(theme=crisis", "theme=crisis )", "crisis"],
+)
+def test_invalid_query(index: TagIndex, query: str) -> None:
+    with pytest.raises(TagQueryError):
+        index.query(query)